@@ -0,0 +1,76 @@
+from typing import Hashable
+
+SKETCH_DEPTH = 4 # number of rows (i.e. hash functions) of the count-min sketch
+SKETCH_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5) # odd multipliers deriving one hash per row from the hash of the key
+MAX_COUNT = 15 # counters saturate at 15, as 4 bit counters would
+WIDTH_FACTOR = 8 # each row of the sketch has 8 counters per key that the cache can hold, to keep hash collisions rare
+SAMPLE_FACTOR = 10 # the sketch is aged after 10 times its width in recorded accesses
+
+class AdmissionPolicy:
+    '''
+    The admission policy of a LRUCache decides whether a new key put in a full cache is worth evicting the LRU key for.
+    The LRUCache records every access of its caller to a key (each get, whether it hits or misses, and each put) with the policy, but not the values put by misses, background refreshes or updates published by the origin server, which the caller did not access again, and when a new key would cause an eviction, asks the policy whether to admit the new key (the candidate) in place of the LRU key (the victim).
+
+    This base policy admits every candidate, so that a LRUCache with this policy behaves as a plain LRU cache.
+    '''
+    def record(self, key : Hashable):
+        pass
+
+    def admit(self, candidate_key : Hashable, victim_key : Hashable) -> bool:
+        return True
+
+class CountMinSketch:
+    '''
+    A count-min sketch estimating how many times each key was recorded, in a fixed amount of memory regardless of the number of distinct keys.
+
+    The sketch sized for a capacity tracks the frequency of about that many hot keys accurately.
+    The sketch is a table of small saturating counters with one row per hash function, where recording a key increments one counter per row, and the estimate for a key is the minimum of its counters (collisions can only overestimate the count).
+    Once the number of recorded keys reaches the sample size, every counter is halved, so the estimates reflect recent frequency rather than frequency since the start.
+    '''
+    def __init__(self, capacity : int):
+        width = 1
+        while (width < WIDTH_FACTOR * capacity): # the width of each row is a power of 2, so an index is a bit mask of the hash
+            width *= 2
+
+        self.mask = width - 1
+        self.rows = [bytearray(width) for _ in range(SKETCH_DEPTH)]
+        self.sample_size = SAMPLE_FACTOR * width
+        self.recorded = 0
+
+    def _indexes(self, key : Hashable):
+        key_hash = hash(key)
+        return [((key_hash * seed) >> 32) & self.mask for seed in SKETCH_SEEDS]
+
+    def increment(self, key : Hashable):
+        for row, index in zip(self.rows, self._indexes(key)):
+            if (row[index] < MAX_COUNT):
+                row[index] += 1
+
+        self.recorded += 1
+        if (self.recorded >= self.sample_size):
+            self._age()
+
+    def estimate(self, key : Hashable) -> int:
+        return min(row[index] for row, index in zip(self.rows, self._indexes(key)))
+
+    def _age(self):
+        for row in self.rows:
+            row[:] = bytes(count >> 1 for count in row)
+        self.recorded //= 2
+
+class TinyLFU(AdmissionPolicy):
+    '''
+    The TinyLFU admission policy admits a candidate key only if it was accessed more frequently than the victim key, as estimated by a count-min sketch of recent accesses.
+
+    This makes the LRUCache scan resistant: keys accessed once by a scan through the keyspace are estimated less frequent than the hot keys at the LRU end of the DLL, so they are rejected instead of flushing the hot keys out of the cache,
+        while a new key that becomes hot is admitted as soon as it has been accessed more often than the victim.
+    Unlike W-TinyLFU, there is no admission window in front of the sketch: a new key competes with the victim from its first put, so a key that is accessed in a short burst is only admitted once its accesses outnumber those of the victim.
+    '''
+    def __init__(self, capacity : int):
+        self.sketch = CountMinSketch(capacity)
+
+    def record(self, key : Hashable):
+        self.sketch.increment(key)
+
+    def admit(self, candidate_key : Hashable, victim_key : Hashable) -> bool:
+        return self.sketch.estimate(candidate_key) > self.sketch.estimate(victim_key)
@@ -0,0 +1,158 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Hashable, Any, Dict, Iterable, List
+
+from LRUCache import LRUCache
+from utils import serialized_size
+from AdmissionPolicy import AdmissionPolicy
+from Clock import Clock
+
+RETRIEVAL_CANCELLED = object() # the result of a coalesced retrieval whose caller was cancelled, upon which the callers awaiting it retry the miss rather than being cancelled too
+
+class AsyncLRUCache(LRUCache):
+    """
+    Implementation of the Least Recently Used Cache for proxies running on an asyncio event loop, where the miss_callback (and bulk_miss_callback) are coroutine functions, and get and get_many are coroutines.
+
+    The AsyncLRUCache has the same DLL, hash map, expiry and cache performance info as the LRUCache, and its put and put_many methods are the same (they do no I/O).
+    A get method call that hits the cache returns the value without ever suspending, so that cache hits are served within a single step of the event loop, and only a cache miss suspends the caller while the value is awaited from the miss_callback.
+    Thus thousands of concurrent client requests may share one event loop, since a slow retrieval from the origin server only suspends the requests waiting on it.
+
+    Stale nodes (see the stale-while-revalidate window of the LRUCache) are refreshed by a task on the event loop rather than by a background thread, and the task puts the refreshed value in the cache itself (unless the node was replaced or removed meanwhile).
+    The revalidate_callback, if supplied, is also a coroutine function.
+    Concurrent misses on the same key are coalesced, so that only the first caller awaits the miss_callback while the other callers await the same future (which holds either the value or the error raised).
+    If the first caller is cancelled (e.g. its client disconnected), the first of the other callers to resume retrieves the key in its place, and the others await it instead.
+    No locking is needed, since the DLL and hash map are only modified between suspension points of the single event loop thread.
+    """
+    def __init__(self, max_size : int = 1000, max_age : int = 86400, miss_callback : Callable[[Hashable], Awaitable[Any]] = None, sweep_expired : bool = False, max_bytes : int = None, weigher : Callable[[Any], int] = serialized_size,
+                 admission_policy : AdmissionPolicy = None, stale_while_revalidate : float = 0, clock : Clock = None):
+        super().__init__(max_size, max_age, sweep_expired=sweep_expired, max_bytes=max_bytes, weigher=weigher, admission_policy=admission_policy, stale_while_revalidate=stale_while_revalidate, clock=clock)
+        self.in_flight = dict() # of the form {key: future, ...} for the keys currently being retrieved by the miss_callback
+        self.refresh_tasks = set() # references to the tasks refreshing stale nodes, so they are not garbage collected before completing
+        self.coalesced = 0
+
+        if (miss_callback is not None):
+            self.set_miss_callback(miss_callback)
+
+    async def get(self, key : Hashable):
+        if (self.expiry_wheel is not None):
+            self.sweep()
+
+        try:
+            return self._get_cached(key) # a cache hit returns without suspending
+        except KeyError:
+            if (self.miss_callback is None):
+                raise
+        expired_node = self._pop_expired(key)
+
+        future = self.in_flight.get(key)
+        if (future is not None): # another caller is already retrieving this key
+            self.coalesced += 1
+        while (future is not None):
+            value = await asyncio.shield(future) # a cancelled waiter must not cancel the retrieval shared with the other callers
+            if (value is not RETRIEVAL_CANCELLED):
+                return value
+            future = self.in_flight.get(key) # retrieved by this caller if it is the first to resume
+
+        future = self.in_flight[key] = asyncio.get_running_loop().create_future()
+        tombstone = self.tombstones.get(key) # the latest update of the key published before the miss
+        start = time.perf_counter()
+        try:
+            if (self.revalidate_callback is not None):
+                result = await self._revalidate(key, expired_node)
+                value = result[1]
+            else:
+                value = await self.miss_callback(key)
+        except asyncio.CancelledError:
+            future.set_result(RETRIEVAL_CANCELLED) # rather than cancelling the callers awaiting the future, which were not cancelled themselves
+            raise
+        except Exception as e:
+            if (isinstance(e, TypeError)): # callback did not have the right signature
+                e = KeyError(key)
+            future.set_exception(e)
+            future.exception() # the error is raised to this caller, so it is retrieved even if no other caller is waiting
+            raise e
+        else:
+            future.set_result(value)
+            if (self.revalidate_callback is not None):
+                return self._put_revalidated(key, result, expired_node, tombstone)
+            self._put_fetched(key, value, tombstone=tombstone)
+            return value
+        finally:
+            del self.in_flight[key]
+            self.fetch_latency.record(time.perf_counter() - start) # only the callers that awaited the callbacks themselves, not the coalesced ones
+
+    async def get_many(self, keys : Iterable[Hashable]) -> Dict[Hashable, Any]:
+        '''
+        Returns a dict of each of the given keys to its value as in the LRUCache, awaiting the values of all the keys missed by the cache from a single call to the bulk_miss_callback (or from the miss_callback for each key concurrently, if no bulk callback was supplied).
+        '''
+        if (self.expiry_wheel is not None):
+            self.sweep()
+
+        values = dict()
+        missed_keys = []
+        for key in keys:
+            try:
+                values[key] = self._get_cached(key)
+            except KeyError:
+                missed_keys.append(key)
+
+        if (len(missed_keys) > 0):
+            tombstones = {key: self.tombstones.get(key) for key in missed_keys}
+            start = time.perf_counter()
+            fetched_values = await self._fetch_many(missed_keys)
+            self.fetch_latency.record(time.perf_counter() - start)
+            for key, value in fetched_values.items():
+                self._put_fetched(key, value, tombstone=tombstones.get(key))
+            values.update(fetched_values)
+        return values
+
+    def cache_info(self):
+        return super().cache_info()._replace(coalesced=self.coalesced)
+
+    def _refresh_in_background(self, node):
+        if (node.key in self.refreshing):
+            return
+        self.refreshing.add(node.key)
+        task = asyncio.get_running_loop().create_task(self._refresh(node))
+        self.refresh_tasks.add(task)
+        task.add_done_callback(self.refresh_tasks.discard)
+
+    async def _revalidate(self, key : Hashable, expired_node):
+        version = expired_node.version if expired_node is not None else 0
+        result = await self.revalidate_callback(key, version)
+        if (not result[0]):
+            try:
+                result = (False, self._load(expired_node)) + tuple(result[2:]) # with the version (and time to live) returned
+            except KeyError: # the expired value could not be loaded, so the current value is retrieved in full
+                result = await self.revalidate_callback(key, 0)
+        return result
+
+    async def _refresh(self, node):
+        try:
+            if (self.revalidate_callback is not None):
+                result = await self._revalidate(node.key, node) # so that the refreshed value keeps its version
+            else:
+                result = (True, await self.miss_callback(node.key), 0)
+        except Exception: # the stale node keeps being served until it can no longer be, and is then retrieved by a regular miss
+            pass
+        else:
+            if (self.hash_map.get(node.key) is node): # a node replaced or removed while it was refreshed is not overwritten by the refreshed value
+                self.refreshes += 1
+                self._put(node.key, result[1], result[3] if len(result) > 3 else node.max_age, result[2])
+        finally:
+            self.refreshing.discard(node.key)
+
+    async def _fetch_many(self, keys : List[Hashable]):
+        if (self.bulk_miss_callback is not None):
+            return dict(await self.bulk_miss_callback(keys))
+
+        values = dict()
+        if (self.miss_callback is not None):
+            results = await asyncio.gather(*(self.miss_callback(key) for key in keys), return_exceptions=True)
+            for key, result in zip(keys, results):
+                if (isinstance(result, (KeyError, TypeError))): # the key could not be produced, or the callback did not have the right signature
+                    continue
+                if (isinstance(result, BaseException)):
+                    raise result
+                values[key] = result
+        return values
@@ -0,0 +1,56 @@
+import threading
+import time
+
+COARSE_CLOCK_RESOLUTION = 0.005 # seconds between two updates of the time of a CoarseClock
+
+class Clock:
+    '''
+    The source of the time of a LRUCache (and of the RateMeter of its cache rates), read once by each get and put to stamp and age its Nodes.
+    The time is in seconds, and only the differences between two times are meaningful (as for time.monotonic).
+
+    This base clock reads time.monotonic, so that a LRUCache with this clock behaves as one without a clock.
+    '''
+    now = staticmethod(time.monotonic) # the bound method is the builtin itself, without a Python call in between
+
+class CoarseClock(Clock):
+    '''
+    A clock whose time is updated every resolution seconds by a daemon thread (the ticker), so that reading it is an attribute lookup rather than a call to time.monotonic.
+    The time read lags the time of time.monotonic by up to the resolution (or longer while the ticker waits for the GIL held by a busy thread), so the Nodes of a cache with this clock may expire up to that much later than their max age.
+    A single CoarseClock is meant to be shared by every cache of a process, so that they share its ticker, which runs until the stop method is called.
+    '''
+    def __init__(self, resolution : float = COARSE_CLOCK_RESOLUTION):
+        if (resolution <= 0):
+            raise ValueError(resolution)
+        self.resolution = resolution
+        self.time = time.monotonic()
+        self.stopped = threading.Event()
+        self.ticker = threading.Thread(target=self._tick, daemon=True)
+        self.ticker.start()
+
+    def now(self) -> float:
+        return self.time
+
+    def stop(self):
+        self.stopped.set()
+        self.ticker.join()
+
+    def _tick(self):
+        while not self.stopped.wait(self.resolution):
+            self.time = time.monotonic()
+
+class ManualClock(Clock):
+    '''
+    A clock whose time only moves when it is advanced, e.g. so that tests and simulations (see Simulator) expire Nodes after hours of their time without waiting for them.
+    '''
+    def __init__(self, start : float = 0.0):
+        self.time = start
+
+    def now(self) -> float:
+        return self.time
+
+    def advance(self, seconds : float):
+        if (seconds < 0): # the time of a clock never goes back
+            raise ValueError(seconds)
+        self.time += seconds
+
+REAL_CLOCK = Clock() # the default clock of the caches
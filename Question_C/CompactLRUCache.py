@@ -0,0 +1,179 @@
+from array import array
+from typing import Callable, Hashable, Any
+
+from LRUCache import LRUCache, LazyValue
+from Clock import Clock
+
+SENTINEL = 0 # index of the dummy slot that plays the role of both the head and tail dummy nodes of the circular DLL
+NO_SLOT = -1 # marks the end of the free list
+MAX_SLOTS = 2**31 - 1 # largest slot index representable in the signed 32 bit link arrays
+
+class CompactLRUCache(LRUCache):
+    """
+    Implementation of the Least Recently Used Cache with the same get, get_many, peek, put, put_many, receive, snapshot_items and cache_info interface as the LRUCache, but storing its entries in parallel arrays rather than in Node objects.
+    The options of the LRUCache that need more state than a slot holds (a max bytes, an admission policy, a stale-while-revalidate window and sweeping expired entries) are not supported, so its constructor does not take them.
+    Since a slot is freed as soon as it is found expired, a revalidate_callback is always asked for the value in full (as for a key never held), rather than whether an expired value was modified.
+    The versioned updates received from the origin server are applied to the slots as the LRUCache applies them to its Nodes.
+
+    Each entry occupies a slot, identified by an integer index that is the same in every array: the key and value are held in two lists, and the previous and next links of the DLL, the expiry time and the version are held in typed arrays of machine integers and doubles.
+    So a cached entry costs a few machine words plus its item in the hash map, instead of a Node object with its own instance __dict__ and a boxed float timestamp.
+
+    The DLL is circular around the dummy slot 0, so that the next link of slot 0 is the LRU slot and the previous link of slot 0 is the MRU slot (slot 0 acts as both the head and tail dummy nodes of the LRUCache).
+    Slots freed by evictions and expiries are chained in a free list (through their next link) and reused by subsequent puts, so the arrays only ever grow up to the maximum size of the cache plus the dummy slot.
+
+    The hash map indexes the DLL by mapping each key to the index of its slot, so get and put operations remain O(1).
+    """
+    def __init__(self, max_size : int = 1000, max_age : int = 86400, miss_callback : Callable[[Hashable], Any] = None, clock : Clock = None):
+        if (max_size >= MAX_SLOTS):
+            raise ValueError(max_size)
+        super().__init__(max_size, max_age, miss_callback, clock=clock)
+
+        del self.head, self.tail # the dummy Node objects are replaced by the dummy slot
+        self.keys = [None] # slot 0 is the dummy slot
+        self.values = [None]
+        self.prev = array('i', [SENTINEL]) # connect the dummy slot to itself at the start since the DLL is empty
+        self.next = array('i', [SENTINEL])
+        self.expires_at = array('d', [0.0]) # the time after which each slot has expired, i.e. its last refresh plus its time to live
+        self.versions = array('q', [0]) # the version of the value of each slot, or 0 if unknown
+        self.free = NO_SLOT # head of the free list
+
+    def _get_cached(self, key : Hashable):
+        if (len(self.published) > 0):
+            self._apply_published()
+
+        if key in self.hash_map:
+            slot = self.hash_map[key]
+            self._remove(slot)
+
+            if (self.clock.now() < self.expires_at[slot]): # if the slot has not yet expired
+                try:
+                    value = self._load_slot(slot)
+                except KeyError: # the lazy value of the slot could not be loaded, so the slot is dropped and the key missed
+                    del self.hash_map[key]
+                    self._release(slot)
+                else:
+                    self.hits += 1
+                    self._add(slot) # back to the DLL as MRU, without refreshing the timestamp
+                    return value
+            else: # slot expired
+                self.expiries += 1
+                del self.hash_map[key]
+                self._release(slot)
+
+        self.misses += 1 # misses include expiries
+        raise KeyError(key)
+
+    def peek(self, key : Hashable):
+        slot = self.hash_map.get(key)
+        now = self.clock.now()
+        if (slot is None or now >= self.expires_at[slot]):
+            raise KeyError(key)
+        return self._load_slot(slot), self.versions[slot], self.expires_at[slot] - now
+
+    def put(self, key : Hashable, value : Any, ttl : float = None, version : int = 0):
+        if (ttl is not None and ttl <= 0):
+            raise ValueError(ttl)
+        if (len(self.published) > 0):
+            self._apply_published()
+        if (version != 0 and version < self.tombstones.get(key, 0)): # older than an update of the key published meanwhile
+            self.invalidations += 1
+            return
+
+        if (key in self.hash_map): # update the slot in place and move it to the DLL tail (MRU)
+            slot = self.hash_map[key]
+            self._remove(slot)
+        else:
+            if (len(self.hash_map) >= self.max_size): # CompactLRUCache has reached its maximum size, evict before inserting so the freed slot is reused by the new entry
+                self.evictions += 1
+                slot = self.next[SENTINEL] # LRU slot is adjacent to the dummy slot
+                self._remove(slot)
+                del self.hash_map[self.keys[slot]]
+                self._release(slot)
+            slot = self._acquire()
+            self.keys[slot] = key
+            self.hash_map[key] = slot
+        self.values[slot] = value
+        self.expires_at[slot] = self.clock.now() + (ttl if ttl is not None else self.max_age)
+        self.versions[slot] = version
+        self._add(slot)
+
+    def snapshot_items(self):
+        '''
+        Returns a list of (key, value, remaining time to live) tuples for every slot that has not expired, in the order of the DLL from LRU to MRU, as the LRUCache does.
+        '''
+        items = []
+        now = self.clock.now()
+        slot = self.next[SENTINEL]
+        for _ in range(len(self.hash_map)):
+            if (slot == SENTINEL):
+                break
+            remaining_ttl = self.expires_at[slot] - now
+            if (remaining_ttl > 0):
+                items.append((self.keys[slot], self.values[slot], remaining_ttl))
+            slot = self.next[slot]
+        return items
+
+    def _load_slot(self, slot : int):
+        value = self.values[slot]
+        if (isinstance(value, LazyValue)): # loaded the first time the slot is read
+            try:
+                value = self.values[slot] = value.load()
+            except ValueError:
+                raise KeyError(self.keys[slot])
+        return value
+
+    def _apply_published(self):
+        while (len(self.published) > 0):
+            update = self.published.popleft()
+            self._remember_tombstone(update.key, update.version)
+            slot = self.hash_map.get(update.key)
+            if (slot is None): # only the keys held by this cache are updated, the others are retrieved on a miss
+                continue
+            if (update.version <= self.versions[slot]):
+                self.stale_updates += 1
+                continue
+
+            self.invalidations += 1
+            if (update.invalidate):
+                self._remove(slot)
+                del self.hash_map[update.key]
+                self._release(slot)
+            else: # the new value keeps the time to live of the slot
+                self.values[slot] = update.value
+                self.versions[slot] = update.version
+                self._remove(slot)
+                self._add(slot)
+
+    def _acquire(self):
+        if (self.free == NO_SLOT): # no slot to reuse, grow the arrays by one slot
+            self.keys.append(None)
+            self.values.append(None)
+            self.prev.append(NO_SLOT)
+            self.next.append(NO_SLOT)
+            self.expires_at.append(0.0)
+            self.versions.append(0)
+            return len(self.keys) - 1
+        slot = self.free
+        self.free = self.next[slot] # pop the slot off the free list
+        return slot
+
+    def _release(self, slot : int):
+        self.keys[slot] = None # drop the references so the key and value can be garbage collected
+        self.values[slot] = None
+        self.next[slot] = self.free # push the slot onto the free list
+        self.free = slot
+
+    def _remove(self, slot : int):
+        prev_slot = self.prev[slot]
+        next_slot = self.next[slot]
+
+        self.next[prev_slot] = next_slot
+        self.prev[next_slot] = prev_slot
+
+    def _add(self, slot : int):
+        most_recent_slot = self.prev[SENTINEL]
+
+        self.next[most_recent_slot] = slot
+        self.prev[SENTINEL] = slot
+        self.prev[slot] = most_recent_slot
+        self.next[slot] = SENTINEL
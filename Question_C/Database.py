@@ -15,4 +15,25 @@ class Database:
         '''
         Translates to a database insert if the key is not already in the database, or a database update if the key is already in the database.
         '''
-        pass
\ No newline at end of file
+        pass
+
+    def get_many(self, keys):
+        '''
+        Translates to a single query where the key is any of the given keys, returning a dict of each of the keys found in the database to its value.
+        Implementations should override this method with a single bulk query, since by default the keys are queried one at a time with the get method.
+        '''
+        values = dict()
+        for key in keys:
+            try:
+                values[key] = self.get(key)
+            except KeyError:
+                pass
+        return values
+
+    def put_many(self, items):
+        '''
+        Translates to a single batch of inserts or updates of the given items (a dict, or an iterable of key-value pairs).
+        Implementations should override this method with a single bulk write, since by default the items are put one at a time with the put method.
+        '''
+        for key, value in (items.items() if isinstance(items, dict) else items):
+            self.put(key, value)
\ No newline at end of file
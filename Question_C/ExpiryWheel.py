@@ -0,0 +1,63 @@
+from typing import Hashable, List
+
+class ExpiryWheel:
+    '''
+    Implementation of a hashed timing wheel that keeps track of when keys expire, so that expired keys can be found without scanning every key.
+
+    Time is divided into ticks of a fixed resolution, and the wheel is a circular array of slots where the slot at index (tick % number of slots) holds the keys expiring during that tick (as a dict of each key to its expiry time).
+    Scheduling or cancelling a key is O(1), and advancing the wheel visits each elapsed slot once, so every scheduled key is visited about once per rotation of the wheel, and removing expired keys costs amortized O(1) per key.
+    A key expiring more than one rotation in the future shares its slot with keys of earlier rotations, and is simply left in its slot until a rotation where its expiry time has actually passed.
+
+    Keys are reported as expired once the tick in which they expire has fully elapsed, so up to one resolution after their expiry time.
+    '''
+    def __init__(self, resolution : float, num_slots : int, start : float):
+        if (resolution <= 0):
+            raise ValueError(resolution)
+        if (num_slots <= 0):
+            raise ValueError(num_slots)
+
+        self.resolution = resolution
+        self.slots = [dict() for _ in range(num_slots)] # each slot is a dict of the form {key: expires_at, ...}
+        self.slot_of_key = dict() # lookup table of the slot index holding each key, for O(1) cancelling
+        self.current_tick = self._tick(start) # the earliest tick that has not yet fully elapsed
+
+    def __len__(self):
+        return len(self.slot_of_key)
+
+    def _tick(self, time : float):
+        return int(time // self.resolution)
+
+    def schedule(self, key : Hashable, expires_at : float):
+        '''
+        Schedules the key to expire at the given time, replacing any previously scheduled expiry time of the key.
+        '''
+        self.cancel(key)
+        slot_index = max(self._tick(expires_at), self.current_tick) % len(self.slots) # keys that already expired are placed in the current slot, to be reported at the next tick
+        self.slots[slot_index][key] = expires_at
+        self.slot_of_key[key] = slot_index
+
+    def cancel(self, key : Hashable):
+        '''
+        Stops tracking the key, if it was scheduled.
+        '''
+        slot_index = self.slot_of_key.pop(key, None)
+        if (slot_index is not None):
+            del self.slots[slot_index][key]
+
+    def advance(self, now : float) -> List[Hashable]:
+        '''
+        Advances the wheel to the given time, and returns the keys whose expiry time has passed in the ticks that elapsed since the last call (the returned keys are no longer tracked by the wheel).
+        '''
+        expired = []
+        now_tick = self._tick(now)
+        elapsed_ticks = min(now_tick - self.current_tick, len(self.slots)) # a long idle period only requires visiting every slot once
+
+        for tick in range(self.current_tick, self.current_tick + elapsed_ticks):
+            slot = self.slots[tick % len(self.slots)]
+            for key in [key for key, expires_at in slot.items() if expires_at <= now]:
+                del slot[key]
+                del self.slot_of_key[key]
+                expired.append(key)
+
+        self.current_tick = max(now_tick, self.current_tick)
+        return expired
@@ -0,0 +1,166 @@
+import threading
+from collections import namedtuple
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+from typing import Any, Callable, Hashable, List
+
+MAX_BATCH_SIZE = 256 # number of keys updated after which a batch is delivered without waiting for the batch interval
+BATCH_INTERVAL = 0.01 # seconds during which the updates are batched before being delivered
+
+Update = namedtuple('Update', 'key version value invalidate') # a new version of the value of a key put in the origin server, carrying the value itself unless it only invalidates the older versions
+
+class InvalidationBus:
+    '''
+    An in-process bus on which the origin server publishes a versioned update for every put, delivered to every subscriber (e.g. the receive method of the LRUCache of every proxy) so that other proxies stop serving the older versions long before they expire.
+
+    Publishing only queues the update, so a put is not slowed down by the number of proxies: a daemon thread delivers the queued updates in batches to every subscriber, once max batch size keys were updated or every batch interval seconds.
+    Only the newest update of each key is kept in a batch, since it supersedes the older ones.
+    An update either invalidates the older versions of the value (so that proxies retrieve the new version on their next miss), or carries the new value to replace them (replication).
+    '''
+    def __init__(self, max_batch_size : int = MAX_BATCH_SIZE, batch_interval : float = BATCH_INTERVAL):
+        self.max_batch_size = max_batch_size
+        self.batch_interval = batch_interval
+        self.lock = threading.Lock()
+        self.subscribers = [] # replaced rather than modified, so that batches are delivered without holding the lock
+        self.pending = dict() # of the form {key: update, ...} for the newest update of each key waiting to be delivered
+        self.published, self.batches = 0, 0
+
+        self.batch_ready = threading.Event()
+        self.closed = threading.Event()
+        self.deliverer = threading.Thread(target=self._deliver_periodically, daemon=True)
+        self.deliverer.start()
+
+    def subscribe(self, callback : Callable[[List[Update]], Any]):
+        with self.lock:
+            self.subscribers = self.subscribers + [callback]
+
+    def unsubscribe(self, callback : Callable[[List[Update]], Any]):
+        with self.lock:
+            self.subscribers = [subscriber for subscriber in self.subscribers if subscriber != callback]
+
+    def publish(self, key : Hashable, version : int, value : Any = None, invalidate : bool = True):
+        update = Update(key, version, value, invalidate)
+        with self.lock:
+            queued_update = self.pending.get(key)
+            if (queued_update is None or queued_update.version < version):
+                self.pending[key] = update
+            self.published += 1
+            is_full = len(self.pending) >= self.max_batch_size
+
+        if (is_full):
+            self.batch_ready.set()
+
+    def flush(self):
+        '''
+        Delivers the queued updates right away.
+        '''
+        with self.lock:
+            batch, self.pending = list(self.pending.values()), dict()
+            subscribers = self.subscribers
+        if (len(batch) == 0):
+            return
+
+        self.batches += 1
+        for callback in subscribers:
+            try:
+                callback(batch)
+            except Exception: # a failing subscriber must not keep the others from being updated
+                pass
+
+    def close(self):
+        self.closed.set()
+        self.batch_ready.set()
+        self.deliverer.join()
+        self.flush()
+
+    def _deliver_periodically(self):
+        while not self.closed.is_set():
+            self.batch_ready.wait(self.batch_interval)
+            self.batch_ready.clear()
+            self.flush()
+
+class BusListener:
+    '''
+    The origin server's end of the local socket transport of an InvalidationBus, forwarding every batch delivered by the bus to the proxies running in other processes on the same host, that are connected with a BusConnection.
+    The address is a path for a Unix domain socket, or a (host, port) tuple for a TCP socket (a port of 0 picks a free port, and the address attribute holds the address actually bound).
+    The batches are pickled, so the authkey is required: only the BusConnections with the same authkey are accepted, and a peer that fails the authentication is disconnected before anything is sent or received.
+    '''
+    def __init__(self, bus : InvalidationBus, address, authkey : bytes):
+        if (not authkey):
+            raise ValueError(authkey)
+
+        self.bus = bus
+        self.authkey = authkey
+        self.listener = Listener(address, authkey=authkey)
+        self.address = self.listener.address
+        self.lock = threading.Lock()
+        self.connections = []
+        self.closed = False
+
+        self.acceptor = threading.Thread(target=self._accept, daemon=True)
+        self.acceptor.start()
+        bus.subscribe(self.send)
+
+    def send(self, batch : List[Update]):
+        with self.lock:
+            connections = list(self.connections)
+        for connection in connections:
+            try:
+                connection.send(batch)
+            except OSError: # the proxy disconnected
+                self._disconnect(connection)
+
+    def close(self):
+        self.bus.unsubscribe(self.send)
+        self.closed = True
+        try:
+            Client(self.address, authkey=self.authkey).close() # wakes up the acceptor thread blocked in accept
+        except OSError:
+            pass
+        self.acceptor.join()
+        self.listener.close()
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for connection in connections:
+            connection.close()
+
+    def _accept(self):
+        while True:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError, AuthenticationError): # including a peer without the authkey
+                if (self.closed):
+                    return
+                continue
+            if (self.closed):
+                connection.close()
+                return
+            with self.lock:
+                self.connections.append(connection)
+
+    def _disconnect(self, connection):
+        with self.lock:
+            if (connection in self.connections):
+                self.connections.remove(connection)
+        connection.close()
+
+class BusConnection:
+    '''
+    A proxy's end of the local socket transport of an InvalidationBus, connected to the BusListener at the address with its authkey, and passing every batch received to the callback (e.g. the receive method of the proxy's LRUCache) on a daemon thread.
+    '''
+    def __init__(self, address, callback : Callable[[List[Update]], Any], authkey : bytes):
+        self.connection = Client(address, authkey=authkey)
+        self.callback = callback
+        self.receiver = threading.Thread(target=self._receive, daemon=True)
+        self.receiver.start()
+
+    def close(self):
+        self.connection.close()
+
+    def _receive(self):
+        while True:
+            try:
+                batch = self.connection.recv()
+            except (EOFError, OSError): # the origin server or this end closed the connection
+                return
+            self.callback(batch)
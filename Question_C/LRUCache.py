@@ -1,28 +1,72 @@
 import time
-from collections import namedtuple
-from typing import Callable, Hashable, Any
+from abc import ABC, abstractmethod
+from collections import namedtuple, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Any, Dict, Iterable, List, Tuple, Union
+
+from ExpiryWheel import ExpiryWheel
+from SingleFlight import SingleFlight
+from utils import serialized_size
+from AdmissionPolicy import AdmissionPolicy
+from Metrics import LatencyHistogram, RateMeter, CacheRates
+from Clock import Clock, REAL_CLOCK
+
+EXPIRY_WHEEL_SLOTS = 256 # number of slots of the expiry wheel, each covering 1/256th of the max age
+REFRESH_WORKERS = 4 # number of threads refreshing stale nodes in the background
+MAX_TOMBSTONES = 1024 # versions of the latest updates published for the keys, remembered so that a miss in flight (or a put) does not cache a value older than them
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses max_age expiries curr_size max_size evictions coalesced curr_bytes max_bytes rejections stale_hits refreshes invalidations stale_updates revalidations saved_bytes')
+
+def fetch_many(keys : List[Hashable], miss_callback : Callable[[Hashable], Any], bulk_miss_callback : Callable[[List[Hashable]], Dict[Hashable, Any]]):
+    '''
+    Returns a dict of each of the given keys to the value produced by the callbacks of a cache, with a single call to the bulk_miss_callback if there is one, otherwise with a call to the miss_callback for each key.
+    Keys for which no value could be produced are left out of the returned dict.
+    '''
+    if (bulk_miss_callback is not None):
+        return dict(bulk_miss_callback(keys))
+
+    values = dict()
+    if (miss_callback is not None):
+        for key in keys:
+            try:
+                values[key] = miss_callback(key)
+            except (KeyError, TypeError): # the key could not be produced, or the callback did not have the right signature
+                pass
+    return values
+
+class LazyValue(ABC):
+    '''
+    A value that is only loaded (e.g. deserialized from a snapshot file, see Snapshot.SnapshotValue) the first time it is read from the cache, so that a cache can be filled with many values without paying to load the ones never read.
+    The size of a lazy value is the number of bytes of its serialization, and is used as its weight by caches with a max bytes.
+    '''
+    def __init__(self, size : int):
+        self.size = size
+
+    @abstractmethod
+    def load(self):
+        '''
+        Returns the loaded value, or raises ValueError if it cannot be loaded (e.g. its serialization is corrupt), in which case the cache drops it and misses the key.
+        '''
+
 
 class Node:
-    def __init__(self, key : Hashable, value : Any, expires : bool = True):
+    def __init__(self, key : Hashable, value : Any, expires : bool = True, weight : int = 0, max_age : float = None, version : int = 0, last_refresh : float = 0.0):
         self.key = key
         self.value = value
+        self.version = version # the version of the value assigned by the origin server, or 0 if unknown
+        self.weight = weight # the number of bytes counted against the max bytes of the cache for this node's value
+        self.max_age = max_age # the time to live of this node, which defaults to the max age of the cache
         self.prev = None
         self.next = None
         self.expires = expires # whether this node expires, should be true for all nodes except the dummy head and tail nodes
-        self._refresh()
+        self.last_refresh = last_refresh # the time of the clock of the cache when the value was set, passed in by the cache so that a Node never reads the clock itself
 
-    def set_value(self, value : Any):
+    def set_value(self, value : Any, now : float):
         self.value= value
-        self._refresh()
-
-    def _refresh(self):
-        self.last_refresh = time.monotonic() # now
+        self.last_refresh = now
 
-    def _get_last_refresh(self):
-        return self.last_refresh if self.expires else time.monotonic()
-
-    def get_time_since_last_refresh(self):
-        return time.monotonic() - self._get_last_refresh()
+    def get_time_since_last_refresh(self, now : float):
+        return now - self.last_refresh if self.expires else 0.0
 
 class LRUCache:
     """
@@ -34,12 +78,32 @@ class LRUCache:
     Each Node holds some value identified by a key, analogous to a cache block holding some data identified by an adress.
 
     The LRUCache has a maximum size representing the maximum number of Nodes that can be placed into the DLL.
+    The LRUCache can optionally have a maximum number of bytes, in which case the value of each Node is weighed (by default by the size of its serialization), and LRU Nodes are evicted until the total weight of the Nodes is within the maximum number of bytes,
+        so that a cache of values of any size (from small ints to large dicts) is bounded by the memory it uses rather than by its number of values alone.
+    The LRUCache can optionally have an AdmissionPolicy, that is told of every access to a key, and decides whether a new Node that would cause an eviction is admitted in place of the LRU Node (otherwise the new Node is rejected).
+        With a TinyLFU policy, a scan through the keyspace is rejected rather than flushing the frequently used Nodes out of the cache.
     The LRUCache has an maximum age representing the maximum time that can elapse since a Node's value was last updated after which reading the value will invalidate the Node (remove it from the cache).
+    A Node can be given its own maximum age (time to live) when it is put in the cache, which then replaces the maximum age of the cache for this Node.
+    The LRUCache can optionally have a stale-while-revalidate window: a Node read less than this window after it expired is still returned right away (a stale hit), while its value is refreshed through the miss_callback by a background thread,
+        so that the latency of the origin server stays off the critical path of the reader. The refreshed value replaces the stale Node at the start of the next operation on the cache, so that only the thread using the cache modifies the DLL,
+        unless the Node was replaced (e.g. by a put, or an update published by the origin server) or removed meanwhile, in which case the refreshed value, which may be older, is dropped.
+    A Node can be given the version of its value, so that the cache can receive the versioned updates published by the origin server (e.g. by an InvalidationBus) for the values put in other caches: a Node is invalidated, or its value replaced, by a newer version,
+        while the updates with a version no newer than the Node's are dropped as stale. The updates are received from any thread, and applied at the start of the next operation on the cache, as refreshes are.
+        The version of an update of a key not held is remembered as a tombstone (for the last MAX_TOMBSTONES such keys), so that a value retrieved by a miss that was in flight when the update was published, which may predate it, is returned without being cached.
+    If a revalidate_callback is supplied, a get that misses on an expired Node asks whether the value changed since the version of the Node rather than retrieving the value again: if it did not, the expired value is kept (as a new Node)
+        and only a not modified flag was transferred, counting the bytes of the value as saved.
     
     Rather than having a daemon thread continuously monitoring the validity of all cache DLL nodes, although this approach would benefit from concurrency we assume the server processor time will be costly,
         so cache nodes are only invalidated when "poked" (i.e. the age of a Node is polled and verified to be below the threshold at each retrieval), which does incur some overhead at each retrieval, but reduces the idle cost.
+    The ages of the Nodes are measured with the clock of the LRUCache, read once per get or put: by default time.monotonic, or a CoarseClock whose time is updated by a ticker thread (so that a hit reads an attribute rather than the system clock), or a ManualClock advanced by tests and simulations (see Clock).
+    Since cold Nodes that are never poked again would otherwise occupy the cache until they are evicted, the LRUCache can optionally be initialized with sweep_expired, in which case the expiry time of every Node is tracked in an ExpiryWheel,
+        and the Nodes that have expired are removed incrementally at the start of each get and put operation (in amortized O(1) time per Node), or whenever the sweep method is called (e.g. by a periodic task on the proxy server).
+        A Node removed by the sweep is no longer held for a revalidation (see set_revalidate_callback), so its key is then retrieved in full: sweep_expired trades the revalidation of expired Nodes for the memory they would occupy.
     
-    The cache performance info (maximum size, current size, number of cache hits, number of cache misses, number of evicitions, number of expiries) is stored as instance variables, and can be retrieved as a named tuple by calling the cache_info method on the given LRUCache instance.
+    When several callers miss on the same key at once, only the first one calls the miss_callback, and the others wait for its value (or its error) instead of sending identical requests to the origin server. These coalesced misses are counted separately.
+
+    The cache performance info (maximum size, current size, number of cache hits, number of cache misses, number of evicitions, number of expiries, number of coalesced misses, current and maximum bytes, number of new Nodes rejected by the admission policy, number of stale hits and of background refreshes) is stored as instance variables, and can be retrieved as a named tuple by calling the cache_info method on the given LRUCache instance.
+    Since these counts are totals since the cache was created, the cache_rates method returns the recent rates per second of hits, misses, evictions and expiries instead, and the time taken by the callbacks to retrieve missed values is kept in a LatencyHistogram (fetch_latency).
     
     Although the cache nodes themselves are stored in the DLL, the LRUCache indexes the DLL with an internal lookup table as a hash map where each item in the dict is a Node's key as the item key and the Node itself (by reference) as the item value.
     By doing this, we get O(1) access time when retrieving a Node by key (i.e. when retrieving a block of cache by its key) because of the O(1) lookup time of the hash map that indexes the DLL that allows us to skip directly to that Node in the DLL instead of traversing (as well as O(1) time when deleting an invalidated item from the hash map),
@@ -47,26 +111,56 @@ class LRUCache:
     
     There is an optional miss_callback that can be supplied to the 
     """
-    def __init__(self, max_size : int = 1000, max_age : int = 86400, miss_callback : Callable[[Hashable], Any] = None):
+    def __init__(self, max_size : int = 1000, max_age : int = 86400, miss_callback : Callable[[Hashable], Any] = None, sweep_expired : bool = False, max_bytes : int = None, weigher : Callable[[Any], int] = serialized_size,
+                 admission_policy : AdmissionPolicy = None, stale_while_revalidate : float = 0, clock : Clock = None):
         if (max_size <=0):
             raise ValueError(max_size)
         if (max_age <= 0):
             raise ValueError(max_age)
+        if (max_bytes is not None and max_bytes <= 0):
+            raise ValueError(max_bytes)
+        if (stale_while_revalidate < 0):
+            raise ValueError(stale_while_revalidate)
         
         self.max_size = max_size # cache capacity
+        self.max_bytes = max_bytes # cache capacity in bytes, or None if the cache is only bounded by its max size
+        self.weigher = weigher # returns the number of bytes of a value, used to weigh every value if the cache has a max bytes, otherwise only the values revalidated as not modified
+        self.curr_bytes = 0
+        self.admission_policy = admission_policy # decides whether a new node is worth evicting the LRU node for, or None to always admit new nodes (plain LRU)
         self.max_age = max_age # cache expiration
+        self.clock = clock if clock is not None else REAL_CLOCK # read once per operation, rather than by each Node
+        self.stale_while_revalidate = stale_while_revalidate # time after a node expires during which it is still served while being refreshed
+        self.refreshing = set() # keys of the stale nodes being refreshed in the background
+        self.refreshed = deque() # refreshes completed by the background threads, of the form (stale node, succeeded, (modified, value, version)), waiting to be applied
+        self.refresh_executor = None # created on the first stale hit
+        self.published = deque() # versioned updates received from the origin server, waiting to be applied
+        self.tombstones = OrderedDict() # of the form {key: version, ...} for the latest updates published for the MAX_TOMBSTONES keys most recently updated
         self.hash_map = {} # lookup table for the cache nodes
         self.head = Node(0, 0, expires=False) # dummy nodes to eliminate edge cases and dealing with None pointers
         self.tail = Node(0, 0, expires=False)
         self.head.next = self.tail # connect the head and tail at the start since the DLL is empty
         self.tail.prev = self.head # as the DLL grows, Nodes are added between the head and tail, that remain as dummy nodes
 
+        self.miss_callback = None
+        self.bulk_miss_callback = None
+        self.revalidate_callback = None
+        self.expired = None # the last Node found expired by a get, kept so that the miss that follows may revalidate it
         if (miss_callback is not None):
-            set_miss_callback(miss_callback)
-        else:
-            self.miss_callback = None
+            self.set_miss_callback(miss_callback)
 
         self.hits, self.misses, self.evictions, self.expiries = 0, 0, 0, 0 # intialize cache performance info
+        self.rejections = 0 # new nodes not admitted by the admission policy
+        self.stale_hits, self.refreshes = 0, 0 # stale nodes served while being refreshed, and refreshes applied
+        self.invalidations, self.stale_updates = 0, 0 # nodes invalidated or replaced by a newer version published by the origin server, and published updates dropped as stale
+        self.revalidations, self.saved_bytes = 0, 0 # expired nodes revalidated as not modified, and the bytes of their values that did not need to be retrieved again (weighed when revalidated if the cache has no max bytes)
+        self.single_flight = SingleFlight() # coalesces concurrent misses on the same key into a single call to the miss_callback, counting the coalesced misses
+        self.fetch_latency = LatencyHistogram() # time taken by the callbacks to retrieve the values missed by get and get_many calls (e.g. from the origin server)
+        self.rate_meter = RateMeter(len(CacheRates._fields), clock=self.clock)
+
+        if (sweep_expired):
+            self.expiry_wheel = ExpiryWheel(max_age / EXPIRY_WHEEL_SLOTS, EXPIRY_WHEEL_SLOTS, self.clock.now())
+        else:
+            self.expiry_wheel = None
 
     def set_miss_callback(self, miss_callback : Callable[[Hashable], Any]):
         """Public method to set the callback function that will be used by the LRUCache instance when a get method call on itself fails (i.e. cache miss).
@@ -76,54 +170,372 @@ class LRUCache:
         Thus if a callback is supplied to the LRUCache instance, the get method call behaves the same to the caller regardless of whether a cache hit or miss occured (albeit slower depending on the speed of the callback supplied).
         This functionality is meant to reduce the overhead incurred by the cache consumer that must catch the KeyError otherwise raised when the key passed to the get method call does not correspond to any Node currently in the cache, then internally call some function to produce the value, then call the set method to place the new value in the cache."""
         if callable(miss_callback):
-            self.miss_callback == miss_callback
+            self.miss_callback = miss_callback
         else:
-            ValueError("callback argument " + str(miss_callback) + " must be callable.")
+            raise ValueError("callback argument " + str(miss_callback) + " must be callable.")
+
+    def set_bulk_miss_callback(self, bulk_miss_callback : Callable[[List[Hashable]], Dict[Hashable, Any]]):
+        """Public method to set the callback function that will be used by the LRUCache instance when a get_many method call on itself misses some of the keys.
+        The bulk_miss_callback parameter is expected to be a callable accepting a list of keys and returning a dict of each of those keys for which a value could be produced to its value, so that all the keys missed by a get_many method call are retrieved in a single call (e.g. a single round trip to the origin server).
+        If no bulk callback is supplied, the keys missed by a get_many method call are passed one at a time to the miss_callback instead."""
+        if callable(bulk_miss_callback):
+            self.bulk_miss_callback = bulk_miss_callback
+        else:
+            raise ValueError("callback argument " + str(bulk_miss_callback) + " must be callable.")
+
+    def set_revalidate_callback(self, revalidate_callback : Callable[[Hashable, int], Tuple[bool, Any, int]]):
+        """Public method to set the callback function that will be used by the LRUCache instance (instead of the miss_callback) when a get method call on itself misses.
+        The revalidate_callback parameter is expected to be a callable accepting a key and the version of the expired value held for the key (or 0 if none), and returning a tuple (modified, value, version):
+            (False, None, version) if the value was not modified since that version, otherwise (True, the current value, its version).
+        The tuple may end with a fourth item, the remaining time to live of the value if it comes from another cache (e.g. a peer), which is then the time to live of the Node rather than the max age (so that the value does not outlive the copy it came from)."""
+        if callable(revalidate_callback):
+            self.revalidate_callback = revalidate_callback
+        else:
+            raise ValueError("callback argument " + str(revalidate_callback) + " must be callable.")
 
     def get(self, key : Hashable):
-        if key in self.hash_map: # if the requested key is in the Cache's hash map, then the Node with that key will be somewhere in the DLL
-            node = self.hash_map[key] # O(1) find the Node object by its key in the hash map
-            self._remove(node) # remove the node from its current position in the DLL, to eventually be reordered as the most recently used item in the DLL (if it has not expired)
+        if (self.expiry_wheel is not None):
+            self.sweep()
 
-            if (node.get_time_since_last_refresh() < self.max_age): # if the node has not yet expired (it was last updated more recently than the max age threshold)
-                self.hits += 1
-                self._add(node) # add the node back to the DLL, but as the most recent item (adjacent to the DLL's tail dummy node)
-                return node.value # note that this does not refresh the timestamps on this node
-            else: # node expired 
-                self.expiries += 1
-                # the node stays removed from the DLL at this stage. depending on whether a callback was supplied to the LRUCache instance, the node's key will be removed from the ahsh map, or the Node will be put back int the DLL 
+        try:
+            return self._get_cached(key)
+        except KeyError:
+            if (self.miss_callback is None): # only if the key passed to the get method call does not correspond to any Node currently in the cache, and there was no callback function supplied to handle cache misses
+                raise
 
-        self.misses += 1 # misses include expiries
-        if (self.miss_callback is not None): # if there was a valid provided callback
+        start = time.perf_counter()
+        tombstone = self.tombstones.get(key) # the latest update of the key published before the miss
+        if (self.revalidate_callback is not None):
+            expired_node = self._pop_expired(key)
             try:
-                node = Node(key, self.read_callback(key)) # timestamps set to now
-                self._add(node) # add this new node as MRU 
-                return node.value
+                result = self.single_flight.do(key, self._revalidator(expired_node))
             except TypeError: # callback did not have the right signature
-                pass
+                raise KeyError(key)
+            finally:
+                self.fetch_latency.record(time.perf_counter() - start)
+            return self._put_revalidated(key, result, expired_node, tombstone)
+
+        try:
+            value = self.single_flight.do(key, self.miss_callback) # if another caller is already retrieving this key, wait for its value (or its error) instead of calling the miss_callback again
+        except TypeError: # callback did not have the right signature
+            raise KeyError(key)
+        finally:
+            self.fetch_latency.record(time.perf_counter() - start)
+        self._put_fetched(key, value, tombstone=tombstone) # add this new node as MRU (timestamps set to now), evicting the LRU node if the cache is full
+        return value
+
+    def get_many(self, keys : Iterable[Hashable]) -> Dict[Hashable, Any]:
+        '''
+        Returns a dict of each of the given keys to its value, retrieving the values of all the keys missed by the cache with a single call to the bulk_miss_callback (see set_bulk_miss_callback), then putting them in the cache.
+        Keys that are neither in the cache nor produced by the callbacks are left out of the returned dict, rather than raising KeyError.
+        '''
+        if (self.expiry_wheel is not None):
+            self.sweep()
+
+        values = dict()
+        missed_keys = []
+        for key in keys:
+            try:
+                values[key] = self._get_cached(key)
+            except KeyError:
+                missed_keys.append(key)
+
+        if (len(missed_keys) > 0):
+            tombstones = {key: self.tombstones.get(key) for key in missed_keys}
+            start = time.perf_counter()
+            fetched_values = fetch_many(missed_keys, self.miss_callback, self.bulk_miss_callback)
+            self.fetch_latency.record(time.perf_counter() - start)
+            for key, value in fetched_values.items():
+                self._put_fetched(key, value, tombstone=tombstones.get(key))
+            values.update(fetched_values)
+        return values
+
+    def peek(self, key : Hashable) -> Tuple[Any, int, float]:
+        '''
+        Returns the value of the valid Node with the given key, its version and its remaining time to live, or raises KeyError if there is no such Node, without moving the Node, counting a hit or miss, or calling the miss_callback.
+        Since it does not modify the cache, it may be called by other threads than the one using the cache (e.g. by the peers of a proxy looking for a key they missed).
+        '''
+        node = self.hash_map.get(key)
+        age = self.clock.now() - node.last_refresh if node is not None else 0
+        if (node is None or age >= node.max_age):
+            raise KeyError(key)
+        return self._load(node), node.version, node.max_age - age # a value that cannot be loaded is left for the get method calls to drop
+
+    def put(self, key : Hashable, value : Any, ttl : float = None, version : int = 0):
+        '''
+        Puts the value in the cache as the MRU Node indexed by the key, expiring after ttl if given, otherwise after the max age of the cache, with the version of the value if it is known.
+        A value whose version is older than an update of the key published meanwhile (e.g. by the put of another proxy completing first) is dropped, and counted as an invalidation.
+        '''
+        if (ttl is not None and ttl <= 0):
+            raise ValueError(ttl)
+        if (self.admission_policy is not None):
+            self.admission_policy.record(key) # only the puts of the caller are recorded, the values put by a miss were recorded by the get that missed
+        self._put_checked(key, value, ttl, version)
+
+    def _put_checked(self, key : Hashable, value : Any, ttl : float = None, version : int = 0):
+        if (self.expiry_wheel is not None):
+            self.sweep()
+        if (len(self.refreshed) > 0):
+            self._apply_refreshes()
+        if (len(self.published) > 0):
+            self._apply_published()
+        if (version != 0 and version < self.tombstones.get(key, 0)):
+            self.invalidations += 1
+            return
 
-        del self.hash_map[node.key] # remove reference from the hash map, the node is not added back to the DLL so remove its indexed reference from the hash map
-        raise KeyError(key) # only if the key passed to the get method call does not correspond to any Node currently in the cache, and there was no callback function supplied to handle cache misses
+        self._put(key, value, ttl if ttl is not None else self.max_age, version)
+
+    def _put(self, key : Hashable, value : Any, max_age : float, version : int = 0):
+        weight = self._weigh(value) if self.max_bytes is not None else 0
+        if (self.admission_policy is not None):
+            if (key not in self.hash_map and self._is_full(weight) and not self.admission_policy.admit(key, self.head.next.key)): # the new node would evict the LRU node, which the policy deems more valuable
+                self.rejections += 1
+                return
 
-    def put(self, key : Hashable, value : Any):
         if (key in self.hash_map): # if the requested key is in the Cache's hash map, then the Node with that key will be somewhere in the DLL
             self._remove(self.hash_map[key]) # to update the cache block by the given key, we need to delete the Node object representing the cache block and create a new Node object and put it in the DLL as MRU
-        node = Node(key, value) # timestamps set to now
+            self._forget(key)
+        node = Node(key, value, weight=weight, max_age=max_age, version=version, last_refresh=self.clock.now()) # timestamps set to now
+        self.curr_bytes += node.weight
         self._add(node) # add to DLL tail (MRU)
         self.hash_map[key] = node # update the references indexed by the key in the hash map (only the value of the item in the hash map changes, the key remains) 
+        if (self.expiry_wheel is not None):
+            self.expiry_wheel.schedule(key, node.last_refresh + node.max_age + self.stale_while_revalidate) # a stale node is only removed once it can no longer be served
 
-        if (len(self.hash_map) > self.max_size): # LRUCache has reached its maximum size
+        while (len(self.hash_map) > self.max_size or (self.max_bytes is not None and self.curr_bytes > self.max_bytes)): # LRUCache has reached its maximum size, or its maximum bytes (in which case several LRU nodes may need to be evicted, including the new node if its value alone weighs more than the maximum bytes)
             self.evictions += 1
             node = self.head.next # LRU node is at the DLL head (adjacent to head dummy node)
             self._remove(node)
-            del self.hash_map[node.key]
+            self._forget(node.key)
+
+    def put_many(self, items : Union[Dict[Hashable, Any], Iterable[Tuple[Hashable, Any]]], ttl : float = None, version : int = 0):
+        '''
+        Puts each of the given items (a dict, or an iterable of key-value pairs) in the cache, in order, as if put was called for each of them.
+        '''
+        for key, value in (items.items() if isinstance(items, dict) else items):
+            self.put(key, value, ttl, version)
+
+    def receive(self, updates : Iterable):
+        '''
+        Receives a batch of versioned updates (each with a key, version, value and invalidate attribute, such as the Update instances of an InvalidationBus) published by the origin server.
+        It may be called from any thread, since the updates are only queued, to be applied at the start of the next operation on the cache.
+        '''
+        self.published.extend(updates)
+
+    def sweep(self):
+        '''
+        Removes every Node that has expired from the cache (only if the LRUCache was initialized with sweep_expired), and counts each of them as an expiry.
+        Returns the number of Nodes removed.
+        '''
+        if (self.expiry_wheel is None):
+            return 0
+
+        expired_keys = self.expiry_wheel.advance(self.clock.now())
+        for key in expired_keys:
+            self._remove(self.hash_map[key])
+            self._forget(key)
+        self.expiries += len(expired_keys)
+        return len(expired_keys)
+
+    def snapshot_items(self):
+        '''
+        Returns a list of (key, value, remaining time to live) tuples for every Node that has not expired, in the order of the DLL from LRU to MRU, e.g. to save a snapshot of the cache.
+        The traversal of the DLL is bounded by the size of the cache, so that it terminates (with a best effort result) even if another thread operates on the cache meanwhile.
+        '''
+        items = []
+        now = self.clock.now()
+        node = self.head.next
+        for _ in range(len(self.hash_map)):
+            if (node is self.tail):
+                break
+            remaining_ttl = node.max_age - (now - node.last_refresh)
+            if (remaining_ttl > 0):
+                items.append((node.key, node.value, remaining_ttl))
+            node = node.next
+        return items
 
     def size(self):
         return len(self.hash_map)
 
     def cache_info(self):
-        CacheInfo = namedtuple('Info', 'hits misses max_age expiries curr_size max_size evictions')
-        return CacheInfo(self.hits, self.misses, self.max_age, self.expiries, self.size(), self.max_size, self.evictions)
+        return CacheInfo(self.hits, self.misses, self.max_age, self.expiries, self.size(), self.max_size, self.evictions, self.single_flight.coalesced, self.curr_bytes, self.max_bytes, self.rejections, self.stale_hits, self.refreshes,
+                         self.invalidations, self.stale_updates, self.revalidations, self.saved_bytes)
+
+    def cache_rates(self):
+        '''
+        Returns the rates per second of hits, misses, evictions and expiries, as moving averages over about the last RATE_WINDOW seconds (see RateMeter) rather than since the cache was created.
+        Stale hits count as hits.
+        '''
+        cache_info = self.cache_info()
+        return CacheRates(*self.rate_meter.update((cache_info.hits + cache_info.stale_hits, cache_info.misses, cache_info.evictions, cache_info.expiries)))
+
+    def _get_cached(self, key : Hashable):
+        '''
+        Returns the value of the valid (not expired) Node with the given key, moved to the DLL tail as MRU, or raises KeyError if there is no such Node (counting the cache miss).
+        '''
+        if (len(self.refreshed) > 0):
+            self._apply_refreshes()
+        if (len(self.published) > 0):
+            self._apply_published()
+        if (self.admission_policy is not None):
+            self.admission_policy.record(key) # every get is recorded once, whether it hits or misses
+
+        if key in self.hash_map: # if the requested key is in the Cache's hash map, then the Node with that key will be somewhere in the DLL
+            node = self.hash_map[key] # O(1) find the Node object by its key in the hash map
+            self._remove(node) # remove the node from its current position in the DLL, to eventually be reordered as the most recently used item in the DLL (if it has not expired)
+
+            age = self.clock.now() - node.last_refresh # the nodes in the hash map all expire, unlike the dummy nodes
+            try:
+                if (age < node.max_age): # if the node has not yet expired (it was last updated more recently than its max age threshold)
+                    value = self._load(node)
+                    self.hits += 1
+                    self._add(node) # add the node back to the DLL, but as the most recent item (adjacent to the DLL's tail dummy node)
+                    return value # note that this does not refresh the timestamps on this node
+                elif (age < node.max_age + self.stale_while_revalidate and self.miss_callback is not None): # the node expired recently enough to be served while it is refreshed
+                    value = self._load(node)
+                    self.stale_hits += 1
+                    self._add(node)
+                    self._refresh_in_background(node)
+                    return value
+                else: # node expired 
+                    self.expiries += 1
+                    if (self.revalidate_callback is not None):
+                        self.expired = node
+                    self._forget(key) # the node stays removed from the DLL, so remove its indexed reference from the hash map. depending on whether a callback was supplied to the LRUCache instance, a new Node may be put back in the DLL by the caller
+            except KeyError: # the lazy value of the node could not be loaded, so the node is dropped and the key missed
+                self._forget(key)
+
+        self.misses += 1 # misses include expiries
+        raise KeyError(key)
+
+    def _load(self, node : Node):
+        '''
+        Returns the value of the node, loading it the first time the node is read if it is a LazyValue, or raises KeyError if it cannot be loaded.
+        '''
+        if (isinstance(node.value, LazyValue)):
+            try:
+                node.value = node.value.load()
+            except ValueError:
+                raise KeyError(node.key)
+        return node.value
+
+    def _pop_expired(self, key : Hashable):
+        '''
+        Returns the Node of the key found expired by the last miss, or None if the last miss was not on an expired Node of this key.
+        '''
+        node, self.expired = self.expired, None
+        return node if (node is not None and node.key == key) else None
+
+    def _revalidator(self, expired_node : Node):
+        '''
+        Returns a function retrieving the value of a key through the revalidate_callback as a tuple (modified, value, version), where the value is the value of the expired node if it was not modified since the version of the node.
+        '''
+        version = expired_node.version if expired_node is not None else 0
+        def revalidate(key : Hashable):
+            result = self.revalidate_callback(key, version)
+            if (not result[0]):
+                try:
+                    result = (False, self._load(expired_node)) + tuple(result[2:]) # with the version (and time to live) returned
+                except KeyError: # the expired value could not be loaded, so the current value is retrieved in full
+                    result = self.revalidate_callback(key, 0)
+            return result
+        return revalidate
+
+    def _put_revalidated(self, key : Hashable, result : Tuple[bool, Any, int], expired_node : Node, tombstone : int = None):
+        modified, value, version = result[:3]
+        ttl = result[3] if len(result) > 3 else None # the remaining time to live of a value from another cache
+        if (modified or expired_node is None): # the expired node is None if this caller waited on the revalidation of another caller
+            self._put_fetched(key, value, ttl, version, tombstone)
+        else:
+            self.revalidations += 1
+            self.saved_bytes += expired_node.weight if self.max_bytes is not None else self._weigh(value) # weighed already if the cache has a max bytes
+            self._put_fetched(key, value, ttl if ttl is not None else expired_node.max_age, version, tombstone) # the revalidated value keeps the time to live of the expired node
+        return value
+
+    def _weigh(self, value : Any) -> int:
+        return value.size if isinstance(value, LazyValue) else self.weigher(value)
+
+    def _put_fetched(self, key : Hashable, value : Any, ttl : float = None, version : int = 0, tombstone : int = None):
+        '''
+        Puts a value retrieved by a miss as the put method does, unless an update of the key newer than the value was published, or any update was published since the miss started (whose tombstone was seen then) if the version of the value is unknown.
+        '''
+        if (len(self.published) > 0):
+            self._apply_published()
+        published_version = self.tombstones.get(key)
+        if ((version < published_version) if (version != 0 and published_version is not None) else (published_version != tombstone)): # a tombstone forgotten meanwhile may have been newer than the value
+            self.invalidations += 1
+            return
+        self._put_checked(key, value, ttl, version)
+
+    def _refresh_in_background(self, node : Node):
+        '''
+        Retrieves a new value for the stale node on a background thread, through the revalidate_callback if there is one (so that the value keeps its version), otherwise through the miss_callback, unless the node is already being refreshed.
+        The result is queued to be applied by the next operation on the cache.
+        '''
+        if (node.key in self.refreshing):
+            return
+        self.refreshing.add(node.key)
+        if (self.refresh_executor is None):
+            self.refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='LRUCache-refresh')
+
+        key = node.key
+        def refresh():
+            try:
+                if (self.revalidate_callback is not None):
+                    result = self.single_flight.do(key, self._revalidator(node))
+                else:
+                    result = (True, self.single_flight.do(key, self.miss_callback), 0)
+                self.refreshed.append((node, True, result))
+            except Exception: # the stale node keeps being served until it can no longer be, and is then retrieved by a regular miss
+                self.refreshed.append((node, False, None))
+        self.refresh_executor.submit(refresh)
+
+    def _apply_refreshes(self):
+        while (len(self.refreshed) > 0):
+            node, succeeded, result = self.refreshed.popleft()
+            self.refreshing.discard(node.key)
+            if (succeeded and self.hash_map.get(node.key) is node): # a node replaced or removed while it was refreshed is not overwritten by the refreshed value
+                self.refreshes += 1
+                _, value, version = result[:3]
+                self._put(node.key, value, result[3] if len(result) > 3 else node.max_age, version) # the refreshed node keeps the time to live of the stale node, unless the value came from another cache
+
+    def _apply_published(self):
+        while (len(self.published) > 0):
+            update = self.published.popleft()
+            self._remember_tombstone(update.key, update.version)
+            node = self.hash_map.get(update.key)
+            if (node is None): # only the keys held by this cache are updated, the others are retrieved on a miss
+                continue
+            if (update.version <= node.version):
+                self.stale_updates += 1
+                continue
+
+            self.invalidations += 1
+            if (update.invalidate):
+                self._remove(node)
+                self._forget(update.key)
+            else:
+                self._put(update.key, update.value, node.max_age, update.version) # the new value keeps the time to live of the node
+
+    def _remember_tombstone(self, key : Hashable, version : int):
+        if (version > self.tombstones.get(key, 0)):
+            self.tombstones[key] = version
+            self.tombstones.move_to_end(key)
+            if (len(self.tombstones) > MAX_TOMBSTONES):
+                self.tombstones.popitem(last=False)
+
+    def _is_full(self, weight : int):
+        '''
+        Returns whether adding a new node of the given weight would evict at least one node.
+        '''
+        if (self.size() == 0):
+            return False
+        return len(self.hash_map) >= self.max_size or (self.max_bytes is not None and self.curr_bytes + weight > self.max_bytes)
+
+    def _forget(self, key):
+        self.curr_bytes -= self.hash_map.pop(key).weight
+        if (self.expiry_wheel is not None):
+            self.expiry_wheel.cancel(key)
 
     def _remove(self, node):
         prev_node = node.prev
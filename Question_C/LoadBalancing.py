@@ -0,0 +1,82 @@
+import heapq
+import itertools
+from typing import Hashable, Iterable, List, Tuple
+
+from utils import distances, MAX_DISTANCE
+
+STRESS_RESCORE_BATCH = 32 # proxies whose stress is scored again by each search for the most stressed proxy, besides the candidates themselves
+
+class StressRanking:
+    '''
+    A max-heap of the proxies by their last known stress, updated incrementally: updating the stress of a proxy pushes a new entry, and the entries superseded by a newer one (or of a removed proxy) are skipped when they reach the top of the heap (lazy deletion).
+    So finding the most stressed proxy costs O(log n) amortized rather than a scan of every proxy, and the heap is rebuilt from the current entries whenever the skipped entries outnumber them.
+    '''
+    def __init__(self):
+        self.heap = [] # entries of the form (-stress, sequence, coordinates), so that the most stressed proxy is at the top
+        self.sequences = dict() # of the form {coordinates: sequence of the current entry of the proxy, ...}
+        self.counter = itertools.count()
+
+    def update(self, coordinates : Hashable, stress : float):
+        sequence = next(self.counter)
+        self.sequences[coordinates] = sequence
+        heapq.heappush(self.heap, (-stress, sequence, coordinates))
+        if (len(self.heap) > 2 * len(self.sequences) + 16):
+            self.heap = [entry for entry in self.heap if self.sequences.get(entry[2]) == entry[1]]
+            heapq.heapify(self.heap)
+
+    def remove(self, coordinates : Hashable):
+        self.sequences.pop(coordinates, None)
+
+    def most_stressed(self) -> Tuple[Hashable, float]:
+        '''
+        Returns the coordinates of the proxy with the highest last known stress and that stress, or raises ValueError if there is no proxy.
+        '''
+        while (len(self.heap) > 0):
+            negated_stress, sequence, coordinates = self.heap[0]
+            if (self.sequences.get(coordinates) == sequence):
+                return coordinates, -negated_stress
+            heapq.heappop(self.heap) # superseded or removed
+        raise ValueError(self.heap)
+
+    def __len__(self):
+        return len(self.sequences)
+
+def greedy_placements(candidates : Iterable[Tuple[float, float]], demand : Iterable[Tuple[Tuple[float, float], float]], existing : Iterable[Tuple[float, float]], k : int) -> List[Tuple[float, float]]:
+    '''
+    Returns up to k of the candidate coordinates (e.g. of the potential servers) at which to place new proxies, chosen greedily to minimize the demand weighted distance from each demand point to its nearest proxy (the facility location, or k-median, objective),
+        given the demand as (coordinates, weight) pairs (e.g. the clients, or the proxies weighted by their request rates) and the coordinates of the existing proxies.
+    Each placement is the candidate that reduces the total weighted distance the most given the placements already chosen, which achieves at least 1 - 1/e (about 63%) of the largest reduction of the total weighted distance possible with k placements, since this reduction is submodular.
+    Fewer than k placements are returned if there are fewer candidates, or if no candidate reduces the distance of any demand point.
+    '''
+    candidates = list(candidates)
+    demand = [(coordinates, weight) for coordinates, weight in demand if weight > 0]
+    if (k <= 0 or len(candidates) == 0 or len(demand) == 0):
+        return []
+
+    demand_coordinates = [coordinates for coordinates, _ in demand]
+    weights = [weight for _, weight in demand]
+    existing = list(existing)
+    if (len(existing) > 0):
+        nearest_distances = [min(row) for row in distances(demand_coordinates, existing)]
+    else:
+        nearest_distances = [MAX_DISTANCE] * len(demand) # no proxy is farther than the antipode, so the first placement is the candidate nearest to the demand
+
+    candidate_distances = distances(candidates, demand_coordinates)
+    placements = []
+    remaining = set(range(len(candidates)))
+    for _ in range(min(k, len(candidates))):
+        best_index, best_gain = None, 0
+        for index in remaining:
+            gain = 0
+            for weight, candidate_distance, nearest_distance in zip(weights, candidate_distances[index], nearest_distances):
+                if (candidate_distance < nearest_distance):
+                    gain += weight * (nearest_distance - candidate_distance)
+            if (gain > best_gain):
+                best_index, best_gain = index, gain
+        if (best_index is None): # no candidate brings any demand nearer to a proxy
+            break
+
+        remaining.remove(best_index)
+        placements.append(candidates[best_index])
+        nearest_distances = [min(nearest_distance, candidate_distance) for nearest_distance, candidate_distance in zip(nearest_distances, candidate_distances[best_index])]
+    return placements
@@ -0,0 +1,168 @@
+import mmap
+import os
+import pickle
+import struct
+import threading
+import zlib
+from typing import Any, Dict, Hashable, Iterable, Tuple, Union
+
+from Database import Database
+
+RECORD_HEADER = struct.Struct('<III') # CRC32 of the pickled key and value, and their lengths
+COMPACTION_RATIO = 2.0 # the log is compacted once it is this many times larger than its live records
+MIN_COMPACTION_BYTES = 2**20 # smaller logs are never compacted
+
+class LogDatabase(Database):
+    '''
+    A database storing the items in a single append-only log file, with an in-memory index of the offset of the latest record of each key (a log-structured hash table, as in Bitcask).
+
+    Every put appends a record (a header with the CRC32 and lengths of the pickled key and value, followed by them) to the end of the log, so that a write is a sequential append whatever the key, and put_many appends all of its records with a single write.
+    Gets look the key up in the index and read the value from a read-only memory map of the log, without a system call per read, and the log is mapped again when a value appended since it was last mapped is read.
+    Each write is flushed to the operating system before it is acknowledged (so a crash of the process loses nothing), and synced to disk if sync is True.
+
+    The index is rebuilt by reading the log when a LogDatabase is created with the same path, stopping at the first torn or corrupt record (e.g. one being appended during a crash), which is truncated.
+    Overwritten values stay in the log until it is compacted: once the log is at least MIN_COMPACTION_BYTES and compaction ratio times larger than the records of the current values, the current records are copied to a new log which replaces it.
+    The database is shared by the threads calling it (e.g. the proxies of the origin server), serialized by a lock.
+    '''
+    def __init__(self, path : str, sync : bool = False, compaction_ratio : float = COMPACTION_RATIO):
+        if (compaction_ratio <= 1):
+            raise ValueError(compaction_ratio)
+        self.path = path
+        self.sync = sync
+        self.compaction_ratio = compaction_ratio
+        self.lock = threading.Lock()
+        self.index = dict() # of the form {key: (offset of the record, length of the pickled key, length of the pickled value), ...}
+        self.size = 0 # bytes of the log
+        self.live_bytes = 0 # bytes of the records in the index
+        self.compactions = 0
+        self.map = None
+
+        self._load()
+        self.file = open(path, 'ab')
+
+    def get(self, key : Hashable):
+        with self.lock:
+            entry = self.index.get(key)
+            if (entry is None):
+                raise KeyError(key)
+            data = self._read_value(*entry)
+        return pickle.loads(data)
+
+    def put(self, key : Hashable, value : Any):
+        self.put_many([(key, value)])
+
+    def get_many(self, keys : Iterable[Hashable]):
+        found = dict()
+        with self.lock:
+            for key in keys:
+                entry = self.index.get(key)
+                if (entry is not None):
+                    found[key] = self._read_value(*entry)
+        return {key: pickle.loads(data) for key, data in found.items()}
+
+    def put_many(self, items : Union[Dict[Hashable, Any], Iterable[Tuple[Hashable, Any]]]):
+        records = []
+        entries = []
+        length = 0 # of the records, so the offset of each record from the end of the log
+        for key, value in (items.items() if isinstance(items, dict) else items):
+            pickled_key, pickled_value = pickle.dumps(key, pickle.HIGHEST_PROTOCOL), pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            records.append(RECORD_HEADER.pack(zlib.crc32(pickled_value, zlib.crc32(pickled_key)), len(pickled_key), len(pickled_value)))
+            records.append(pickled_key)
+            records.append(pickled_value)
+            entries.append((key, length, len(pickled_key), len(pickled_value)))
+            length += RECORD_HEADER.size + len(pickled_key) + len(pickled_value)
+
+        with self.lock:
+            self.file.write(b''.join(records))
+            self.file.flush()
+            if (self.sync):
+                os.fsync(self.file.fileno())
+            for key, offset, key_length, value_length in entries:
+                self._index(key, self.size + offset, key_length, value_length)
+            self.size += length
+
+            if (self.size >= MIN_COMPACTION_BYTES and self.size > self.compaction_ratio * self.live_bytes):
+                self._compact()
+
+    def compact(self):
+        '''
+        Rewrites the log with only the records of the current values.
+        '''
+        with self.lock:
+            self._compact()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+            if (self.map is not None):
+                self.map.close()
+                self.map = None
+
+    def _index(self, key : Hashable, offset : int, key_length : int, value_length : int):
+        previous_entry = self.index.get(key)
+        if (previous_entry is not None):
+            self.live_bytes -= RECORD_HEADER.size + previous_entry[1] + previous_entry[2]
+        self.index[key] = (offset, key_length, value_length)
+        self.live_bytes += RECORD_HEADER.size + key_length + value_length
+
+    def _read_value(self, offset : int, key_length : int, value_length : int) -> bytes:
+        start = offset + RECORD_HEADER.size + key_length
+        if (self.map is None or start + value_length > len(self.map)): # appended since the log was last mapped
+            self._remap()
+        return self.map[start : start + value_length]
+
+    def _remap(self):
+        if (self.map is not None):
+            self.map.close()
+            self.map = None
+        if (self.size > 0): # an empty file cannot be mapped
+            with open(self.path, 'rb') as file:
+                self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _load(self):
+        with open(self.path, 'ab'): # creates the log if it does not exist
+            pass
+        self.size = os.path.getsize(self.path)
+        self._remap()
+
+        offset = 0
+        while (offset + RECORD_HEADER.size <= self.size):
+            crc, key_length, value_length = RECORD_HEADER.unpack_from(self.map, offset)
+            start, end = offset + RECORD_HEADER.size, offset + RECORD_HEADER.size + key_length + value_length
+            if (end > self.size or zlib.crc32(self.map[start:end]) != crc): # torn by a crash while it was appended, so never acknowledged
+                break
+            self._index(pickle.loads(self.map[start : start + key_length]), offset, key_length, value_length)
+            offset = end
+
+        if (offset < self.size):
+            self.map.close()
+            self.map = None
+            os.truncate(self.path, offset)
+            self.size = offset
+            self._remap()
+
+    def _compact(self):
+        compacted_path = self.path + '.compact'
+        index = dict()
+        offset = 0
+        with open(compacted_path, 'wb') as compacted:
+            for key, (record_offset, key_length, value_length) in self.index.items():
+                if (self.map is None or record_offset + RECORD_HEADER.size + key_length + value_length > len(self.map)):
+                    self._remap()
+                record_length = RECORD_HEADER.size + key_length + value_length
+                compacted.write(self.map[record_offset : record_offset + record_length]) # the record is copied as is, with its CRC
+                index[key] = (offset, key_length, value_length)
+                offset += record_length
+            compacted.flush()
+            os.fsync(compacted.fileno())
+
+        self.file.close()
+        if (self.map is not None):
+            self.map.close()
+            self.map = None
+        os.replace(compacted_path, self.path)
+        self.file = open(self.path, 'ab')
+        self.index = index
+        self.size = self.live_bytes = offset
+        self.compactions += 1
+        self._remap()
@@ -0,0 +1,98 @@
+import math
+from bisect import bisect_left
+from collections import namedtuple
+from typing import Dict, Iterable, Tuple
+
+from Clock import Clock, REAL_CLOCK
+
+RATE_WINDOW = 60.0 # seconds, the time constant of the exponentially weighted moving averages of the rates
+LATENCY_BUCKETS = tuple(1e-6 * 2**i for i in range(25)) # upper bounds in seconds of the buckets of the latency histograms, doubling from 1 microsecond to about 17 seconds (the last bucket has no upper bound)
+
+CacheRates = namedtuple('CacheRates', 'hits misses evictions expiries') # per second, with the same fields as the CacheInfo used by the stress score
+LatencyInfo = namedtuple('LatencyInfo', 'count mean p50 p99') # in seconds
+
+class LatencyHistogram:
+    '''
+    Counts latencies in buckets whose upper bounds double (see LATENCY_BUCKETS), so that recording a latency costs a binary search over a few buckets and an increment, however many latencies are recorded.
+    Quantiles are estimated as the upper bound of the bucket holding them, so they are within a factor of 2 of the exact quantile.
+    Latencies recorded by several threads at once may occasionally be lost, since the counts are not locked.
+    '''
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def record(self, seconds : float):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q : float) -> float:
+        rank = q * self.count
+        cumulative_count = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            cumulative_count += count
+            if (cumulative_count >= rank):
+                return bound
+        return math.inf
+
+    def buckets(self) -> Iterable[Tuple[float, int]]:
+        '''
+        Returns the (upper bound, cumulative count) of each bucket, the upper bound of the last bucket being infinite.
+        '''
+        cumulative_count = 0
+        for bound, count in zip(LATENCY_BUCKETS + (math.inf,), self.counts):
+            cumulative_count += count
+            yield bound, cumulative_count
+
+    def info(self):
+        if (self.count == 0):
+            return LatencyInfo(0, 0.0, 0.0, 0.0)
+        return LatencyInfo(self.count, self.sum / self.count, self.quantile(0.5), self.quantile(0.99))
+
+class RateMeter:
+    '''
+    Turns counters that only ever increase (e.g. the hits and misses of a cache) into exponentially weighted moving averages of their rates per second, so that recent load weighs more than the load since the counters started.
+    The rates are only computed when read, from the increase of the counters since the previous read, so counting costs nothing more than incrementing the counters.
+    The weight of the previous rates decays by a factor of e every window seconds (of the given clock, e.g. the clock of the cache), whether the rates are read often or rarely.
+    '''
+    def __init__(self, num_counters : int, window : float = RATE_WINDOW, clock : Clock = None):
+        if (window <= 0):
+            raise ValueError(window)
+        self.window = window
+        self.clock = clock if clock is not None else REAL_CLOCK
+        self.last_totals = (0,) * num_counters # the counters start at 0 when the meter is created
+        self.last_time = self.clock.now()
+        self.rates = None
+
+    def update(self, totals : Tuple[int, ...]) -> Tuple[float, ...]:
+        now = self.clock.now()
+        elapsed = now - self.last_time
+        if (elapsed <= 0):
+            return self.rates if self.rates is not None else (0.0,) * len(totals)
+
+        instant_rates = [(total - last_total) / elapsed for total, last_total in zip(totals, self.last_totals)]
+        if (self.rates is None): # the first rates are the rates since the counters started
+            self.rates = tuple(instant_rates)
+        else:
+            alpha = 1 - math.exp(-elapsed / self.window)
+            self.rates = tuple(rate + alpha * (instant_rate - rate) for rate, instant_rate in zip(self.rates, instant_rates))
+        self.last_totals, self.last_time = tuple(totals), now
+        return self.rates
+
+def format_labels(labels : Dict[str, object]) -> str:
+    if (len(labels) == 0):
+        return ''
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in labels.items()) + '}'
+
+def format_metric(name : str, labels : Dict[str, object], value : float) -> str:
+    return '{}{} {}'.format(name, format_labels(labels), repr(float(value)) if isinstance(value, float) else value)
+
+def format_histogram(name : str, labels : Dict[str, object], histogram : LatencyHistogram) -> Iterable[str]:
+    '''
+    Returns the lines of a histogram in the plain text exposition format (as read by Prometheus): the cumulative count of each bucket, then the sum and count of the latencies.
+    '''
+    for bound, cumulative_count in histogram.buckets():
+        yield format_metric(name + '_bucket', dict(labels, le='+Inf' if math.isinf(bound) else repr(bound)), cumulative_count)
+    yield format_metric(name + '_sum', labels, histogram.sum)
+    yield format_metric(name + '_count', labels, histogram.count)
@@ -1,13 +1,35 @@
-from Proxy import ProxyFactory, Proxy
+import asyncio
+from collections import deque, OrderedDict
+from contextlib import AsyncExitStack, ExitStack
+import threading
+import time
+
+from Proxy import ProxyFactory, Proxy, AsyncProxyFactory
 from LRUCache import LRUCache
-from utils import distance, stress, MAX_DISTANCE, LOWEST_STRESS
+from SpatialIndex import SpatialIndex
+from RoutingTable import RoutingTable, ROUTING_PRECISION, ROUTING_MAX_CELLS
+from WriteBehind import WriteBehindDatabase
+from InvalidationBus import InvalidationBus, MAX_BATCH_SIZE, BATCH_INTERVAL
+from PeerFetch import PEER_FETCH_K, PEER_FETCH_TIMEOUT
+from RegionalCache import RegionalCache, REGION_RADIUS, REGIONAL_SIZE_FACTOR, REGIONAL_AGE_FACTOR, REGIONAL_SHARDS
+from ShardedLRUCache import ShardedLRUCache
+from Metrics import LatencyHistogram, format_metric, format_histogram
+from Clock import Clock
+from LoadBalancing import StressRanking, greedy_placements, STRESS_RESCORE_BATCH
+from utils import distance, stress, nearest_indexes, MAX_DISTANCE
+
+from typing import Hashable, Iterable, List, Tuple, Dict, Any
 
-from typing import Hashable, List, Tuple, Dict, Any
+MAX_VERSIONS = 2**20 # versions of keys kept by the origin server, beyond which the versions of the keys least recently put or retrieved are forgotten
+PUT_LOCK_STRIPES = 64 # locks serializing the puts of the keys hashed to each of them
 
 class Origin:
-    def __init__(self, database, max_size_of_LRUCache : int, max_age_of_LRUCache: int, load_balancing_interval : int):
+    proxy_factory_class = ProxyFactory
+    routing_precision = None # number of geohash digits of the cells of the routing table memoizing the nearest proxy to clients, or None to route every client by a search of the spatial index (see enable_routing_table)
+
+    def __init__(self, database, max_size_of_LRUCache : int, max_age_of_LRUCache: int, load_balancing_interval : int, num_shards_of_LRUCache : int = 1, max_bytes_of_LRUCache : int = None, stale_while_revalidate_of_LRUCache : float = 0, clock_of_LRUCache : Clock = None):
         self.database = database # the repository storing the centralized version of the data that is used by the proxy servers
-        self.proxyFactory = ProxyFactory(max_size_of_LRUCache, max_age_of_LRUCache)
+        self.proxyFactory = self.proxy_factory_class(max_size_of_LRUCache, max_age_of_LRUCache, self, num_shards_of_LRUCache, max_bytes_of_LRUCache, stale_while_revalidate_of_LRUCache, clock_of_LRUCache) # proxies are given a thread-safe ShardedLRUCache if the number of shards is greater than 1
 
         # The following two instance variables are dicts of the form {coordinates: proxy, ...}, where coordinates is a tuple of type Tuple[float, float], and proxy is a Proxy instance
         self.proxies = dict() # a one-to-many association between Origin and Proxy. The association is stored as a dictionary of proxies indexed by their coordinates for O(1) lookup time in some scenarios
@@ -16,15 +38,148 @@ class Origin:
         self.potential_servers = dict() # an abstract dictionary of potential Server instances (kept abstract for simplicity, outside assignment scope) indexed by the physical coordinates of the server
         # used to deploy a Proxy instance onto a physical server on which it will be hosted, either in the context of Admin simply creating a new proxy, or Admin calling the load balance method to automatically add a proxy server to alleviate the load of the most stressed proxy server.
 
+        # spatial indexes of the coordinates of the proxies and of the potential servers, kept up to date as proxies are deployed and reported, so that the nearest ones are found without computing the distance to every one of them
+        self.proxy_index = SpatialIndex()
+        self.potential_server_index = SpatialIndex()
+        self.routing_table = RoutingTable(self.proxy_index, self.routing_precision) if self.routing_precision is not None else None
+
+        self.version_lock = threading.Lock()
+        self.last_version = 0 # the version of the latest put, which is the wall clock time in nanoseconds (or one more than the previous version), so that versions keep increasing across restarts of the origin server
+        self.put_locks = self._create_put_locks() # the puts of a key hold the lock of its stripe from assigning the version to recording it, so that the database and the recorded version always hold the same put
+        self.versions = OrderedDict() # of the form {key: version, ...} for the current version of the value of the MAX_VERSIONS keys most recently put or retrieved through this origin server. a forgotten key is given a new version when next retrieved, so the proxies holding it retrieve it again rather than revalidating it
+        self.bus = None # publishes the versioned updates of every put to the proxies, if push is enabled
+        self.replicate = False # whether the updates published carry the new values, rather than only invalidating the older versions
+
+        self.regions = dict() # of the form {coordinates of the center of the region: RegionalCache, ...} if the regional tier is enabled
+        self.region_index = SpatialIndex()
+        self.region_radius = None # the regional tier is enabled once the radius of the regions is set
+        self.regional_cache_parameters = None
+
+        self.database_latencies = {operation: LatencyHistogram() for operation in ('get', 'put', 'get_many', 'put_many')}
+        self.windowed_stress = False # whether the stress of the proxies is scored from the recent rates of their caches, rather than from their counts since they were created
+        self.stress_ranking = StressRanking() # the proxies by their last known stress
+        self.rescore_queue = deque() # coordinates of the proxies in the order in which their stress is scored again, round robin
+
     def _set_potential_servers(self, potential_servers : Dict[Tuple[float, float], Any]):
         self.potential_servers = potential_servers
+        self.potential_server_index = SpatialIndex(potential_servers.keys())
+
+    def enable_write_behind(self, log_path : str, max_pending : int = 1000, flush_interval : float = 1.0, sync : bool = True):
+        '''
+        Wraps the database in a WriteBehindDatabase, so that puts are acknowledged once appended to the local log at log_path, and written to the database in bulk once max pending keys are pending or every flush interval seconds.
+        Puts are visible to gets as soon as they are acknowledged, and the puts acknowledged before a crash are written to the database when write behind is enabled again with the same log path.
+        '''
+        self.database = WriteBehindDatabase(self.database, log_path, max_pending, flush_interval, sync)
+        return self.database
+
+    def enable_push(self, replicate : bool = False, max_batch_size : int = MAX_BATCH_SIZE, batch_interval : float = BATCH_INTERVAL):
+        '''
+        Creates an InvalidationBus on which every put publishes a versioned update to the LRUCache of every proxy (those already deployed and those deployed later), so that the other proxies stop serving older versions within about a batch interval of the put rather than after their max age.
+        If replicate is True, the updates carry the new values, which replace the older versions held by the proxies, otherwise the older versions are invalidated and the new values retrieved on the next miss.
+        Proxies in other processes can subscribe to the bus through a BusListener (see InvalidationBus).
+        '''
+        self.bus = InvalidationBus(max_batch_size, batch_interval)
+        self.replicate = replicate
+        for proxy in self.proxies.values():
+            self.bus.subscribe(proxy.LRUCache.receive)
+        for region in self.regions.values():
+            self.bus.subscribe(region.LRUCache.receive)
+        return self.bus
+
+    def enable_routing_table(self, precision : int = ROUTING_PRECISION, max_cells : int = ROUTING_MAX_CELLS):
+        '''
+        Routes the clients by a routing table memoizing the nearest proxy to each cell of a geohash grid with the given precision, holding at most max cells cells (see RoutingTable).
+        A client is then routed to the proxy nearest to the center of its cell rather than to itself, which may be the farther of two proxies by at most the size of a cell, in exchange for routing most clients by a dict lookup.
+        '''
+        self.routing_precision = precision
+        self.routing_table = RoutingTable(self.proxy_index, precision, max_cells)
+
+    def enable_peer_fetch(self, k : int = PEER_FETCH_K, timeout : float = PEER_FETCH_TIMEOUT, max_distance : float = MAX_DISTANCE):
+        '''
+        Makes every proxy (those already deployed and those deployed later) ask its k nearest healthy peers within max distance for the keys it misses, waiting at most timeout seconds for them before asking this origin server (see PeerFetcher).
+        '''
+        self.proxyFactory.enable_peer_fetch(k, timeout, max_distance)
+        for proxy in self.proxies.values():
+            self.proxyFactory._set_callbacks(proxy)
+
+    def enable_regional_tier(self, region_radius : float = REGION_RADIUS, max_size_of_RegionalCache : int = None, max_age_of_RegionalCache : int = None, num_shards_of_RegionalCache : int = REGIONAL_SHARDS):
+        '''
+        Groups the proxies (those already deployed and those deployed later) in regions of the given radius, each with a RegionalCache that serves the misses of the proxies of the region before this origin server.
+        A proxy joins the region whose center is nearest to it if it is within the region radius, otherwise a new region centered on the proxy is created.
+        The RegionalCache instances default to a max size and max age larger than those of the caches of the proxies (by REGIONAL_SIZE_FACTOR and REGIONAL_AGE_FACTOR).
+        '''
+        self.region_radius = region_radius
+        self.regional_cache_parameters = dict(
+            max_size=max_size_of_RegionalCache if max_size_of_RegionalCache is not None else REGIONAL_SIZE_FACTOR * self.proxyFactory.max_size_of_LRUCache,
+            max_age=max_age_of_RegionalCache if max_age_of_RegionalCache is not None else REGIONAL_AGE_FACTOR * self.proxyFactory.max_age_of_LRUCache,
+            num_shards=num_shards_of_RegionalCache,
+            clock=self.proxyFactory.clock_of_LRUCache)
+        for proxy in self.proxies.values():
+            self.proxyFactory._set_callbacks(proxy)
+
+    def _get_region(self, proxy):
+        '''
+        Returns the RegionalCache of the region of the proxy, adding the proxy to the region nearest to it within the region radius, or to a new region centered on the proxy.
+        '''
+        if (proxy.region is not None):
+            return proxy.region
+
+        nearest = self.region_index.nearest(proxy.coordinates)
+        if (len(nearest) > 0 and distance(nearest[0], proxy.coordinates) <= self.region_radius):
+            region = self.regions[nearest[0]]
+        else:
+            region = RegionalCache(proxy.coordinates, ShardedLRUCache(**self.regional_cache_parameters), self)
+            self.regions[region.coordinates] = region
+            self.region_index.insert(region.coordinates)
+            if (self.bus is not None):
+                self.bus.subscribe(region.LRUCache.receive)
+
+        region.members.add(proxy.coordinates)
+        proxy.region = region
+        return region
+
+    def enable_windowed_stress(self):
+        '''
+        Makes balance_load score the stress of each proxy from the rates of hits, misses, evictions and expiries of its cache over about the last minute (see LRUCache.cache_rates), rather than from its counts since the proxy was deployed,
+            so that a proxy that was busy long ago but is idle now is no longer deemed the most stressed.
+        '''
+        self.windowed_stress = True
+
+    def export_metrics(self) -> str:
+        '''
+        Returns the metrics of the origin server and of its proxies in the plain text exposition format (as read by Prometheus), each proxy being labelled with its coordinates:
+            the counts and recent rates of the hits, misses, evictions and expiries of the cache of each proxy, its size, the latencies of the requests of its clients and of the retrievals of its missed values,
+            and the latencies of the calls of the origin server to its database.
+        '''
+        lines = []
+        cache_infos = {coordinates: proxy.LRUCache.cache_info() for coordinates, proxy in self.proxies.items()}
+        cache_rates = {coordinates: proxy.LRUCache.cache_rates() for coordinates, proxy in self.proxies.items()}
+        for field in ('hits', 'misses', 'evictions', 'expiries'):
+            lines.append('# TYPE geolru_cache_{}_total counter'.format(field))
+            lines.extend(format_metric('geolru_cache_{}_total'.format(field), {'proxy': '{},{}'.format(*coordinates)}, getattr(cache_info, field)) for coordinates, cache_info in cache_infos.items())
+            lines.append('# TYPE geolru_cache_{}_rate gauge'.format(field))
+            lines.extend(format_metric('geolru_cache_{}_rate'.format(field), {'proxy': '{},{}'.format(*coordinates)}, getattr(rates, field)) for coordinates, rates in cache_rates.items())
+        lines.append('# TYPE geolru_cache_size gauge')
+        lines.extend(format_metric('geolru_cache_size', {'proxy': '{},{}'.format(*coordinates)}, cache_info.curr_size) for coordinates, cache_info in cache_infos.items())
+
+        lines.append('# TYPE geolru_proxy_request_seconds histogram')
+        for coordinates, proxy in self.proxies.items():
+            for operation, histogram in proxy.latencies.items():
+                lines.extend(format_histogram('geolru_proxy_request_seconds', {'proxy': '{},{}'.format(*coordinates), 'operation': operation}, histogram))
+        lines.append('# TYPE geolru_proxy_fetch_seconds histogram')
+        for coordinates, proxy in self.proxies.items():
+            lines.extend(format_histogram('geolru_proxy_fetch_seconds', {'proxy': '{},{}'.format(*coordinates)}, proxy.LRUCache.fetch_latency))
+        lines.append('# TYPE geolru_origin_database_seconds histogram')
+        for operation, histogram in self.database_latencies.items():
+            lines.extend(format_histogram('geolru_origin_database_seconds', {'operation': operation}, histogram))
+        return '\n'.join(lines) + '\n'
 
     def get(self, key : Hashable):
         '''
         Called by a LRUCache instance when a cache miss occurs while its owner Proxy instance is handling a get request it received from a client, in order to retrieve the value by key as argument from the origin server's central database.
         The returned value is forwarded to the requesting client via the Proxy instance assigned to that client (the Proxy instance that owns the LRUCache instance that called this method), and it is put in the calling LRUCache instance as the MRU item.
         '''
-        return self.database.get(key)
+        return self._call_database(self.database.get, key)
 
     def put(self, key : Hashable, value : Any):
         '''
@@ -35,19 +190,104 @@ class Origin:
             at least that updated version of that value (if not an even newer version by a more recent put request by some other arbitrary proxy) will be served to every client requesting that value.
         That is, it is impossible for one proxy to receive a put request to update or create some value (thus updating or creating a value in the central database), then max age time later,
             for any proxy to serve a client a version of that data that is older (i.e. an older version of the data that does not reflect the update made by the first proxy, or a missing value if the first proxy was creating a value) than the version of the value put by the first proxy.
+        If push is enabled, the put is also published to every proxy, so the other proxies stop serving older versions of the value about a batch interval after the put, rather than max age time later.
+        Returns the version of the value, which the proxy keeps with the value in its cache so that the update published for its own put is dropped as stale.
         '''
-        self.database.put(key, value)
+        with self.put_locks[self._put_lock_index(key)]:
+            version = self._next_version()
+            self._call_database(self.database.put, key, value)
+            self._set_versions({key: value}, version) # only once the database holds the new value, so that a revalidation never pairs the old value with the new version
+            self._publish({key: value}, version)
+        return version
 
-    def _get_coordinates_of_nearest_proxy(self, request_coordinates : Tuple[float, float]):
-        least_distance = MAX_DISTANCE
+    def revalidate(self, key : Hashable, version : int):
+        '''
+        Called by a LRUCache instance when a cache miss occurs, with the version of the expired value it holds for the key (or 0 if it holds none), in order to retrieve the value only if it was modified since that version.
+        Returns (False, None, version) without querying the database if the value was not modified since the version, otherwise (True, value, current version).
+        The version of a value retrieved for the first time since the origin server started is assigned then, so values cached before the origin server restarted are retrieved again once.
+        '''
+        current_version = self._version_of(key)
+        if (version == current_version):
+            return False, None, version
+        return True, self._call_database(self.database.get, key), current_version
 
-        for coordinates, proxy in self.proxies.items():
-            distance_request_to_proxy = distance(request_coordinates, coordinates)
-            if (distance_request_to_proxy < least_distance):
-                least_distance = distance_request_to_proxy # update
-                coordinates_of_nearest_proxy = coordinates # keep track of
+    def get_many(self, keys : List[Hashable]):
+        '''
+        Called by a LRUCache instance when a get_many method call on it misses some keys, in order to retrieve the values of all of the missed keys from the origin server's central database in a single bulk lookup.
+        Returns a dict of each of the keys found in the database to its value.
+        '''
+        return self._call_database(self.database.get_many, keys)
+
+    def put_many(self, items : Dict[Hashable, Any]):
+        '''
+        Called by a Proxy instance upon handling a put_many request, in order to put all of the items in the central database in a single bulk write, as with the put method.
+        Returns the version of the values, which is the same for all of the items.
+        '''
+        with ExitStack() as stack:
+            for index in self._put_lock_indexes(items):
+                stack.enter_context(self.put_locks[index])
+            version = self._next_version()
+            self._call_database(self.database.put_many, items)
+            self._set_versions(items, version)
+            self._publish(items, version)
+        return version
 
-        return coordinates_of_nearest_proxy
+    def _create_put_locks(self):
+        return [threading.Lock() for _ in range(PUT_LOCK_STRIPES)]
+
+    def _put_lock_index(self, key : Hashable) -> int:
+        return hash(key) % PUT_LOCK_STRIPES
+
+    def _put_lock_indexes(self, keys : Iterable[Hashable]) -> List[int]:
+        return sorted({self._put_lock_index(key) for key in keys}) # taken in the same order by every put_many, so that they never deadlock
+
+    def _call_database(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.database_latencies[method.__name__].record(time.perf_counter() - start)
+
+    def _next_version(self):
+        with self.version_lock:
+            return self._advance_version()
+
+    def _advance_version(self):
+        self.last_version = max(self.last_version + 1, time.time_ns())
+        return self.last_version
+
+    def _version_of(self, key : Hashable):
+        with self.version_lock:
+            version = self.versions.get(key)
+            if (version is None):
+                version = self._advance_version()
+            self._remember_version(key, version)
+            return version
+
+    def _set_versions(self, items : Dict[Hashable, Any], version : int):
+        with self.version_lock:
+            for key in items:
+                if (self.versions.get(key, 0) < version): # a later put may have completed first
+                    self._remember_version(key, version)
+
+    def _remember_version(self, key : Hashable, version : int):
+        self.versions[key] = version
+        self.versions.move_to_end(key)
+        if (len(self.versions) > MAX_VERSIONS):
+            self.versions.popitem(last=False)
+
+    def _publish(self, items : Dict[Hashable, Any], version : int):
+        if (self.bus is not None):
+            for key, value in items.items():
+                self.bus.publish(key, version, value if self.replicate else None, invalidate=not self.replicate)
+
+    def _get_coordinates_of_nearest_proxy(self, request_coordinates : Tuple[float, float]):
+        if (len(self.proxies) == 0):
+            raise ValueError(self.proxies)
+
+        if (self.routing_table is not None):
+            return self.routing_table.nearest(request_coordinates)
+        return self.proxy_index.nearest(request_coordinates)[0]
     
     def get_nearest_proxy(self, request_coordinates : Tuple[float, float]):
         '''
@@ -55,51 +295,108 @@ class Origin:
         '''
         return self.proxies[self._get_coordinates_of_nearest_proxy(request_coordinates)]
 
-    def _get_coordinates_of_stressed_proxy(self):
-        highest_stress = LOWEST_STRESS
+    def get_nearest_proxy_many(self, coordinates_of_clients : Iterable[Tuple[float, float]]) -> List[Proxy]:
+        '''
+        Called to assign many clients at once (e.g. the wave of clients reconnecting after a proxy failure), returning the list of the nearest proxy to each of the coordinates.
+        The distances from every client to every proxy are compared by nearest_indexes, in a single vectorized pass if NumPy is installed (otherwise by dot products of unit vectors, without trigonometry).
+        '''
+        if (len(self.proxies) == 0):
+            raise ValueError(self.proxies)
+
+        proxies = list(self.proxies.values())
+        return [proxies[index] for index in nearest_indexes(coordinates_of_clients, self.proxies.keys())]
 
-        if (len(self.proxies.keys() == 0)):
+    def routing_info(self):
+        '''
+        Returns the hits, misses and invalidations of the routing table memoizing the nearest proxy to clients, and the number of cells it holds.
+        '''
+        return self.routing_table.info() if self.routing_table is not None else None
+
+    def get_nearest_proxies(self, request_coordinates : Tuple[float, float], k : int):
+        '''
+        Returns a list of the k proxies nearest to the coordinates, from nearest to farthest (or of every proxy if there are fewer than k), e.g. so that a client may fail over to the next nearest proxy.
+        '''
+        return [self.proxies[coordinates] for coordinates in self.proxy_index.nearest(request_coordinates, k)]
+
+    def _get_coordinates_of_stressed_proxy(self):
+        '''
+        Returns the coordinates of the most stressed proxy, from the ranking of the proxies by their last known stress rather than by scoring the stress of every proxy.
+        The stress of the next STRESS_RESCORE_BATCH proxies (round robin) is scored again first, so that the stress of every proxy is at most n / STRESS_RESCORE_BATCH calls old (and current for a network of at most STRESS_RESCORE_BATCH proxies).
+        Then the most stressed proxy of the ranking is scored again until it remains the most stressed (or tied) once its current stress is known, so that a proxy whose stress dropped since it was last scored is never returned.
+        '''
+        if (len(self.proxies) == 0):
             raise ValueError(self.proxies)
 
-        for coordinates, proxy in self.proxies.items():
-            stress_of_proxy = stress(proxy.LRUCache.cache_info())
-            if (stress_of_proxy > highest_stress):
-                highest_stress = stress_of_proxy
-                coordinates_of_stressed_proxy = coordinates
-        
-        return coordinates_of_stressed_proxy
+        for _ in range(min(STRESS_RESCORE_BATCH, len(self.rescore_queue))):
+            coordinates = self.rescore_queue.popleft()
+            if (coordinates in self.proxies): # a reported proxy leaves the queue
+                self._score_stress(coordinates)
+                self.rescore_queue.append(coordinates)
+
+        while True:
+            coordinates, _ = self.stress_ranking.most_stressed()
+            if (self._score_stress(coordinates) >= self.stress_ranking.most_stressed()[1]): # still the most stressed (or tied) with its current stress
+                return coordinates
+
+    def _score_stress(self, coordinates : Tuple[float, float]) -> float:
+        cache = self.proxies[coordinates].LRUCache
+        stress_of_proxy = stress(cache.cache_rates() if self.windowed_stress else cache.cache_info())
+        self.stress_ranking.update(coordinates, stress_of_proxy)
+        return stress_of_proxy
 
     def _get_stressed_proxy(self):
         return self.proxies[self._get_coordinates_of_stressed_proxy()]
 
     def _deploy_proxy(self, proxy):
         server_hosting_proxy = self.potential_servers.pop(proxy.coordinates)
+        self.potential_server_index.remove(proxy.coordinates)
+        self.proxy_index.insert(proxy.coordinates)
+        if (self.bus is not None):
+            self.bus.subscribe(proxy.LRUCache.receive)
+        if (self.routing_table is not None):
+            self.routing_table.add(proxy.coordinates)
+        self.stress_ranking.update(proxy.coordinates, stress(proxy.LRUCache.cache_info()))
+        self.rescore_queue.append(proxy.coordinates)
         # deploy ...
 
     def _add_proxy(self, coordinates : Tuple[float, float]):
         return self.proxyFactory.produce(coordinates)
 
-    def balance_load(self):
+    def balance_load(self, k : int = None, demand : Iterable[Tuple[Tuple[float, float], float]] = None):
         '''
         Called by Admin to add a proxy to the network to balance the load of the most stressed proxy server.
         This is acheived by adding a single proxy at the coordinates of the potential server (from the list of coordinates supplied as argument) that is nearest to the most stressed proxy server, so that the added proxy server may take on some of the most stressed proxy server's load.
+        If k is given, up to k proxies are added at once at the placements proposed by the plan_placements method instead (e.g. under a surge of traffic), and the coordinates of the proxies added are returned.
         '''
+        if (k is not None):
+            placements = self.plan_placements(k, demand)
+            for coordinates in placements:
+                self._add_proxy(coordinates)
+            return placements
+
         coordinates_of_stressed_proxy = self._get_coordinates_of_stressed_proxy()
-        least_distance = MAX_DISTANCE
 
         potential_servers_coordinates = self.potential_servers.keys()
 
         if (len(potential_servers_coordinates) == 0):
             raise ValueError(potential_servers_coordinates)
 
-        for potential_server_coordinates in potential_servers_coordinates:
-            distance_stressed_to_potential = distance(coordinates_of_stressed_proxy, potential_server_coordinates)
-            if (distance_stressed_to_potential < least_distance):
-                least_distance = distance_stressed_to_potential # update
-                coordinates_of_nearest_potential = potential_server_coordinates # keep track of
+        coordinates_of_nearest_potential = self.potential_server_index.nearest(coordinates_of_stressed_proxy)[0]
 
         self._add_proxy(coordinates_of_nearest_potential)
 
+    def plan_placements(self, k : int, demand : Iterable[Tuple[Tuple[float, float], float]] = None) -> List[Tuple[float, float]]:
+        '''
+        Returns the coordinates of up to k potential servers at which to add proxies, chosen greedily so that the demand is served by nearer proxies (see LoadBalancing.greedy_placements), without adding them.
+        The demand is an iterable of (coordinates, weight) pairs, e.g. the coordinates of clients weighted by their number of requests.
+        By default, the demand is the number of clients routed from each cell of the routing table (see RoutingTable.demand), which requires the routing table.
+        '''
+        if (demand is None):
+            if (self.routing_table is None):
+                raise ValueError(demand)
+            demand = self.routing_table.demand()
+        return greedy_placements(self.potential_servers.keys(), demand, self.proxies.keys(), k)
+
     def report_failure(self, failed_coordinates : Tuple[float, float]):
         '''
         Called by client to report a failed proxy server.
@@ -107,4 +404,69 @@ class Origin:
         Reported proxies (presumably having suffered a network failure or crash as detected by one of the proxy's assigned client(s)) are kept in the failed proxies for logging and maintenance purposes.
         '''
         failed_proxy = self.proxies.pop(failed_coordinates)
-        self.failed_proxies[failed_coordinates] = failed_proxy
\ No newline at end of file
+        if (failed_proxy.region is not None):
+            failed_proxy.region.members.discard(failed_coordinates)
+        self.proxy_index.remove(failed_coordinates)
+        if (self.bus is not None):
+            self.bus.unsubscribe(failed_proxy.LRUCache.receive)
+        if (self.routing_table is not None):
+            self.routing_table.remove(failed_coordinates)
+        self.stress_ranking.remove(failed_coordinates)
+        self.failed_proxies[failed_coordinates] = failed_proxy
+
+class AsyncOrigin(Origin):
+    '''
+    An Origin instance for an origin server running on an asyncio event loop, whose get and put methods (and get_many and put_many methods) are coroutines, and whose proxies are AsyncProxy instances.
+    Calls to the database are awaited directly if the database implements them as coroutines, otherwise the blocking calls are run in the default executor of the event loop, so that a slow database query does not stall the other requests handled by the event loop.
+    '''
+    proxy_factory_class = AsyncProxyFactory
+
+    def enable_regional_tier(self, region_radius : float = REGION_RADIUS, max_size_of_RegionalCache : int = None, max_age_of_RegionalCache : int = None, num_shards_of_RegionalCache : int = REGIONAL_SHARDS):
+        raise ValueError("the regional tier is only supported by proxies served by threads") # rejected before the origin server is changed
+
+    async def get(self, key : Hashable):
+        return await self._call_database(self.database.get, key)
+
+    async def put(self, key : Hashable, value : Any):
+        async with self._event_loop_put_locks()[self._put_lock_index(key)]:
+            version = self._next_version()
+            await self._call_database(self.database.put, key, value)
+            self._set_versions({key: value}, version)
+            self._publish({key: value}, version)
+        return version
+
+    async def revalidate(self, key : Hashable, version : int):
+        current_version = self._version_of(key)
+        if (version == current_version):
+            return False, None, version
+        return True, await self._call_database(self.database.get, key), current_version
+
+    async def get_many(self, keys : List[Hashable]):
+        return await self._call_database(self.database.get_many, keys)
+
+    async def put_many(self, items : Dict[Hashable, Any]):
+        async with AsyncExitStack() as stack:
+            for index in self._put_lock_indexes(items):
+                await stack.enter_async_context(self._event_loop_put_locks()[index])
+            version = self._next_version()
+            await self._call_database(self.database.put_many, items)
+            self._set_versions(items, version)
+            self._publish(items, version)
+        return version
+
+    def _create_put_locks(self):
+        return [] # created by the first put, on the event loop serving the origin server (before Python 3.10, a lock is bound to the event loop current when it is created)
+
+    def _event_loop_put_locks(self):
+        if (len(self.put_locks) == 0):
+            self.put_locks.extend(asyncio.Lock() for _ in range(PUT_LOCK_STRIPES))
+        return self.put_locks
+
+    async def _call_database(self, method, *args):
+        start = time.perf_counter()
+        try:
+            if (asyncio.iscoroutinefunction(method)):
+                return await method(*args)
+            return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+        finally:
+            self.database_latencies[method.__name__].record(time.perf_counter() - start)
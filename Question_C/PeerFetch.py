@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Hashable, Tuple
+
+from utils import distance, MAX_DISTANCE
+
+PEER_FETCH_WORKERS = 16 # threads shared by every proxy to ask their peers concurrently
+PEER_FETCH_K = 2 # number of nearest peers asked
+PEER_FETCH_TIMEOUT = 0.05 # seconds to wait for the peers before falling back to the origin server
+
+TierInfo = namedtuple('TierInfo', 'requests hits latency') # latency is the mean time in seconds a request to the tier took
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if (_executor is None):
+            _executor = ThreadPoolExecutor(max_workers=PEER_FETCH_WORKERS, thread_name_prefix='PeerFetch')
+        return _executor
+
+class TierStats:
+    def __init__(self):
+        self.requests, self.hits, self.latency = 0, 0, 0.0 # latency is the total time in seconds
+
+    def record(self, hit : bool, latency : float):
+        self.requests += 1
+        self.hits += hit
+        self.latency += latency
+
+    def info(self):
+        return TierInfo(self.requests, self.hits, self.latency / self.requests if self.requests > 0 else 0.0)
+
+class PeerFetcher:
+    '''
+    The miss and revalidate callbacks of a proxy's LRUCache when peer fetch is enabled, asking the k nearest healthy peers of the proxy for a missed key before asking the origin server.
+
+    The peers are the k proxies nearest to the proxy among the proxies of the origin server (so a proxy reported as failed is no longer asked), within max distance of the proxy (a peer an ocean away is no nearer than the origin server).
+    They are asked concurrently, and the value (with its version, and its remaining time to live in the peer's cache) of the first peer holding a valid versioned value for the key is returned.
+    The value is put in the cache of the proxy with the time to live it has left in the peer's cache, so that a copy of a value never outlives the copy it came from (and two peers cannot keep renewing a key from each other).
+    A value without a version (e.g. one put in the peer's cache directly rather than through the origin server) cannot be compared with the version held by the proxy, so it is ignored, as is the value of a peer holding an older version than the proxy.
+    If none of the peers holds the key, or none answered within the timeout, the upstream of the proxy (the origin server, or the RegionalCache of the proxy's region) is asked as without peer fetch.
+    A peer only looks up its own cache, without calling its own callbacks, so that a miss never cascades through the peers.
+    The get method, the miss callback, only asks the upstream, since a miss callback cannot pass on the remaining time to live of a peer's value: the misses of the proxy are revalidations.
+
+    The number of requests to each tier (the peers and the upstream), the number of them that returned a value (every request to the upstream does), and their mean latency are reported by the tier_info method.
+    '''
+    def __init__(self, proxy, origin, k : int = PEER_FETCH_K, timeout : float = PEER_FETCH_TIMEOUT, max_distance : float = MAX_DISTANCE, upstream = None):
+        self.proxy = proxy
+        self.origin = origin
+        self.upstream = upstream if upstream is not None else origin
+        self.upstream_tier = 'origin' if self.upstream is origin else 'regional'
+        self.k = k
+        self.timeout = timeout
+        self.max_distance = max_distance
+        self.peer_stats = TierStats()
+        self.upstream_stats = TierStats()
+
+    def get(self, key : Hashable):
+        start = time.perf_counter()
+        try:
+            return self.upstream.get(key)
+        finally:
+            self.upstream_stats.record(True, time.perf_counter() - start)
+
+    def revalidate(self, key : Hashable, version : int) -> Tuple[bool, Any, int, float]:
+        peer_result = self._ask_peers(key)
+        if (peer_result is not None):
+            value, peer_version, remaining_ttl = peer_result
+            if (peer_version == version):
+                return False, None, version, remaining_ttl
+            if (peer_version > version): # a peer holding an older version than the expired value is no help
+                return True, value, peer_version, remaining_ttl
+
+        start = time.perf_counter()
+        try:
+            return self.upstream.revalidate(key, version)
+        finally:
+            self.upstream_stats.record(True, time.perf_counter() - start)
+
+    def get_peers(self):
+        '''
+        Returns the list of the k nearest healthy peers of the proxy within max distance, from nearest to farthest.
+        '''
+        peers = []
+        for peer in self.origin.get_nearest_proxies(self.proxy.coordinates, self.k + 1): # the proxy itself is the nearest, unless it was reported
+            if (peer is self.proxy):
+                continue
+            if (distance(self.proxy.coordinates, peer.coordinates) > self.max_distance):
+                break
+            peers.append(peer)
+        return peers[:self.k]
+
+    def tier_info(self):
+        return {'peer': self.peer_stats.info(), self.upstream_tier: self.upstream_stats.info()}
+
+    def _ask_peers(self, key : Hashable):
+        '''
+        Returns the (value, version, remaining time to live) of the first peer holding a valid versioned value for the key, or None if no peer answered with such a value within the timeout.
+        '''
+        peers = self.get_peers()
+        if (len(peers) == 0):
+            return None
+
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        pending = {_get_executor().submit(peer.LRUCache.peek, key) for peer in peers}
+        result = None
+        while (len(pending) > 0 and result is None):
+            done, pending = wait(pending, timeout=max(0, deadline - time.perf_counter()), return_when=FIRST_COMPLETED)
+            if (len(done) == 0): # timed out, the peers still looking up the key are no longer waited on
+                break
+            for future in done:
+                if (future.exception() is None and future.result()[1] != 0): # an unversioned value is as good as no value
+                    result = future.result()
+                    break
+
+        self.peer_stats.record(result is not None, time.perf_counter() - start)
+        return result
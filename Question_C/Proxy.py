@@ -1,31 +1,77 @@
-from typing import Tuple, Hashable, List
+import threading
+import time
+from typing import Tuple, Hashable, List, Any, Dict, Iterable, Union
 from utils import distance, MAX_DISTANCE
 from LRUCache import LRUCache
+from ShardedLRUCache import ShardedLRUCache
+from AsyncLRUCache import AsyncLRUCache
+from Snapshot import save_snapshot, warm_start
+from PeerFetch import PeerFetcher, TierInfo
+from Metrics import LatencyHistogram
+from Clock import Clock
+
+OPERATIONS = ('get', 'put', 'get_many', 'put_many') # requests of the clients, whose latencies are measured by the proxy
 
 class ProxyFactory:
     '''
     At initialization, ProxyFactory instances are provided with the parameters to configure the LRUCache instances that will be given to each proxy and the origin instance that will be given to each proxy.
+    If the number of shards is greater than 1, each proxy is given a thread-safe ShardedLRUCache instance with that many shards instead, so that the proxy may be served by a pool of threads.
+    If the max bytes is given, the LRUCache instances are also bounded by the total size of their values.
+    If the stale-while-revalidate window is given, the LRUCache instances serve values that expired less than this window ago while refreshing them from the origin in the background.
+    If the clock is given, it is shared by the LRUCache instances (e.g. a single CoarseClock for every proxy of the process), which otherwise read time.monotonic.
     '''
-    def __init__(self, max_size_of_LRUCache : int, max_age_of_LRUCache: int, origin):
+    def __init__(self, max_size_of_LRUCache : int, max_age_of_LRUCache: int, origin, num_shards_of_LRUCache : int = 1, max_bytes_of_LRUCache : int = None, stale_while_revalidate_of_LRUCache : float = 0, clock_of_LRUCache : Clock = None):
         self.max_size_of_LRUCache = max_size_of_LRUCache
         self.max_age_of_LRUCache = max_age_of_LRUCache
+        self.max_bytes_of_LRUCache = max_bytes_of_LRUCache
+        self.stale_while_revalidate_of_LRUCache = stale_while_revalidate_of_LRUCache
+        self.num_shards_of_LRUCache = num_shards_of_LRUCache
+        self.clock_of_LRUCache = clock_of_LRUCache
         self.origin = origin
+        self.peer_fetch = None # the parameters of the PeerFetcher of each proxy, if peer fetch is enabled
+
+    def enable_peer_fetch(self, k : int, timeout : float, max_distance : float):
+        '''
+        From then on, the proxies produced miss to their k nearest peers before missing to the origin instance (see PeerFetcher).
+        '''
+        self.peer_fetch = dict(k=k, timeout=timeout, max_distance=max_distance)
+
+    def _create_LRUCache(self):
+        if (self.num_shards_of_LRUCache > 1):
+            return ShardedLRUCache(max_size=self.max_size_of_LRUCache, max_age=self.max_age_of_LRUCache, num_shards=self.num_shards_of_LRUCache, max_bytes=self.max_bytes_of_LRUCache, stale_while_revalidate=self.stale_while_revalidate_of_LRUCache, clock=self.clock_of_LRUCache)
+        return LRUCache(max_size=self.max_size_of_LRUCache, max_age=self.max_age_of_LRUCache, max_bytes=self.max_bytes_of_LRUCache, stale_while_revalidate=self.stale_while_revalidate_of_LRUCache, clock=self.clock_of_LRUCache)
+
+    def _create_proxy(self, coordinates : Tuple[float, float]):
+        return Proxy(coordinates, self._create_LRUCache(), self.origin)
 
     def produce(self, new_coordinates : Tuple[float, float]):
         '''
         Yield a Proxy instance configured to have an LRUCache instance with the parameters given to the factory at initialization and origin instance that was provided to the factory at initialization.
         The returned Proxy instance will be initialized with the coordinated given to this method as arguments, provided a Proxy instance with the same coordinates is not already owned by the origin instance associated with this factory (and its products).
         '''
-        for coordinates, proxy in self.origin.proxies.items():
-            if (new_coordinates == coordinates):
-                raise ValueError(new_coordinates)
+        if (new_coordinates in self.origin.proxies):
+            raise ValueError(new_coordinates)
 
-        proxy = Proxy(new_coordinates, LRUCache(max_size=self.max_size_of_LRUCache, max_age=self.max_age_of_LRUCache), self.origin)
-        proxy.LRUCache.set_miss_callback(self.origin.get)
+        proxy = self._create_proxy(new_coordinates)
+        self._set_callbacks(proxy)
         self.origin.proxies[new_coordinates] = proxy
         self.origin._deploy_proxy(proxy)
         return proxy
 
+    def _set_callbacks(self, proxy):
+        '''
+        Sets the callbacks of the LRUCache of the proxy to its upstream: the RegionalCache of its region if the origin has a regional tier, otherwise the origin itself (asking the peers of the proxy first if peer fetch is enabled).
+        '''
+        upstream = self.origin._get_region(proxy) if self.origin.region_radius is not None else self.origin
+        if (self.peer_fetch is not None):
+            proxy.peer_fetcher = PeerFetcher(proxy, self.origin, upstream=upstream, **self.peer_fetch)
+            proxy.LRUCache.set_miss_callback(proxy.peer_fetcher.get)
+            proxy.LRUCache.set_revalidate_callback(proxy.peer_fetcher.revalidate)
+        else:
+            proxy.LRUCache.set_miss_callback(upstream.get)
+            proxy.LRUCache.set_revalidate_callback(upstream.revalidate) # misses on expired values only retrieve the values modified since
+        proxy.LRUCache.set_bulk_miss_callback(upstream.get_many)
+
 class Proxy:
     '''
     A Proxy instance acts as an intermediary between clients getting and putting data and the central origin server that hosts the central database that provides this data.
@@ -33,6 +79,8 @@ class Proxy:
     It holds an origin instance (provided and set at initialization) representing the origin server that hosts the central databse.
     It has a coordinates attribute representing the coordinates of the server on which the Proxy instance is hosted.
     A Proxy instance holds a reference to its own LRUCache instance and to its origin server (both provided and set at initialization)
+    The contents of its LRUCache can be saved to a snapshot file (once, or periodically by a daemon thread), so that a proxy restarted after a crash can warm start from the snapshot instead of sending every request to the origin server.
+    The latency of every request of the clients is recorded in a LatencyHistogram per operation (the latencies attribute), including the time spent retrieving missed values from the origin server or putting values in it.
     '''
     def __init__(self, coordinates : Tuple[float, float], LRUCache, origin):
         self.coordinates = coordinates
@@ -40,10 +88,138 @@ class Proxy:
         self.origin = origin
 
         self.LRUCache = LRUCache
+
+        self.snapshotter = None # daemon thread saving snapshots periodically, if started
+
+        self.peer_fetcher = None # asks the nearest peers for the keys missed by the LRUCache before the origin, if peer fetch is enabled
+        self.region = None # the RegionalCache between this proxy and the origin, if the origin has a regional tier
+        self.latencies = {operation: LatencyHistogram() for operation in OPERATIONS}
     
     def get(self, key : Hashable):
-        return self.LRUCache.get(key) # get the value from the cache if it is in the cache, otherwise use the miss_callback function provided to the LRUCache instance of this proxy to retrieve the data from the origin repository
+        start = time.perf_counter()
+        try:
+            return self.LRUCache.get(key) # get the value from the cache if it is in the cache, otherwise use the miss_callback function provided to the LRUCache instance of this proxy to retrieve the data from the origin repository
+        finally:
+            self.latencies['get'].record(time.perf_counter() - start)
+
+    def put(self, key : Hashable, value : Any, ttl : float = None):
+        start = time.perf_counter()
+        try:
+            version = self.origin.put(key, value) # propagate the update to this value to the shared repository so that the updated value may be later propagated to other proxies when they handle a cache miss on this value (or when it is published to them)
+            if (self.region is not None): # so that the other proxies of the region do not retrieve the older value from it
+                self.region.invalidate([key], version)
+            self.LRUCache.put(key, value, ttl, version) # the value expires from this proxy's cache after ttl if given, otherwise after the max age of the cache
+        finally:
+            self.latencies['put'].record(time.perf_counter() - start)
+
+    def get_many(self, keys : Iterable[Hashable]):
+        start = time.perf_counter()
+        try:
+            return self.LRUCache.get_many(keys) # get the values in the cache, and retrieve all the others from the origin repository in a single bulk lookup using the bulk_miss_callback function provided to the LRUCache instance of this proxy
+        finally:
+            self.latencies['get_many'].record(time.perf_counter() - start)
+
+    def put_many(self, items : Union[Dict[Hashable, Any], Iterable[Tuple[Hashable, Any]]]):
+        start = time.perf_counter()
+        try:
+            items = dict(items)
+            version = self.origin.put_many(items) # propagate all the updates to the shared repository in a single bulk write
+            if (self.region is not None):
+                self.region.invalidate(items, version)
+            self.LRUCache.put_many(items, version=version)
+        finally:
+            self.latencies['put_many'].record(time.perf_counter() - start)
+
+    def tier_info(self):
+        '''
+        Returns a dict of each tier serving the get requests of this proxy (its own LRUCache, then its peers if peer fetch is enabled, then the origin server) to a TierInfo of the number of requests to the tier, the number of them that returned a value, and their mean latency.
+        The latency of the LRUCache itself is not measured, so it is None.
+        '''
+        cache_info = self.LRUCache.cache_info()
+        tiers = {'local': TierInfo(cache_info.hits + cache_info.stale_hits + cache_info.misses, cache_info.hits + cache_info.stale_hits, None)}
+        if (self.peer_fetcher is not None):
+            tiers.update(self.peer_fetcher.tier_info())
+        return tiers
+
+    def snapshot(self, path : str) -> int:
+        return save_snapshot(self.LRUCache, path) # atomically replaces the previous snapshot at path
+
+    def warm_start(self, path : str, now : float = None) -> int:
+        return warm_start(self.LRUCache, path, now) # restores the entries that did not expire while the proxy was down, with their values loaded lazily
+
+    def start_snapshots(self, path : str, interval : float):
+        '''
+        Starts a daemon thread that saves a snapshot of the LRUCache to path every interval seconds.
+        The snapshot of a thread-safe ShardedLRUCache is consistent, while the snapshot of a LRUCache serving requests meanwhile is a best effort (some entries moved during the snapshot may be left out).
+        '''
+        if (self.snapshotter is not None):
+            raise RuntimeError("snapshots already started")
+
+        def snapshot_periodically():
+            while not self.snapshots_stopped.wait(interval):
+                self.snapshot(path)
+
+        self.snapshots_stopped = threading.Event()
+        self.snapshotter = threading.Thread(target=snapshot_periodically, daemon=True)
+        self.snapshotter.start()
+
+    def stop_snapshots(self):
+        if (self.snapshotter is not None):
+            self.snapshots_stopped.set()
+            self.snapshotter.join()
+            self.snapshotter = None
+
+class AsyncProxy(Proxy):
+    '''
+    A Proxy instance for proxy servers running on an asyncio event loop, whose get and put methods (and get_many and put_many methods) are coroutines.
+    It uses a personal AsyncLRUCache instance whose miss callbacks are the coroutines of an AsyncOrigin instance, so that a cache hit is returned without suspending, and a cache miss or a put only suspends the requesting client while awaiting the origin server.
+    '''
+    async def get(self, key : Hashable):
+        start = time.perf_counter()
+        try:
+            return await self.LRUCache.get(key)
+        finally:
+            self.latencies['get'].record(time.perf_counter() - start)
+
+    async def put(self, key : Hashable, value : Any, ttl : float = None):
+        start = time.perf_counter()
+        try:
+            version = await self.origin.put(key, value)
+            self.LRUCache.put(key, value, ttl, version)
+        finally:
+            self.latencies['put'].record(time.perf_counter() - start)
+
+    async def get_many(self, keys : Iterable[Hashable]):
+        start = time.perf_counter()
+        try:
+            return await self.LRUCache.get_many(keys)
+        finally:
+            self.latencies['get_many'].record(time.perf_counter() - start)
+
+    async def put_many(self, items : Union[Dict[Hashable, Any], Iterable[Tuple[Hashable, Any]]]):
+        start = time.perf_counter()
+        try:
+            items = dict(items)
+            version = await self.origin.put_many(items)
+            self.LRUCache.put_many(items, version=version)
+        finally:
+            self.latencies['put_many'].record(time.perf_counter() - start)
+
+class AsyncProxyFactory(ProxyFactory):
+    '''
+    A ProxyFactory yielding AsyncProxy instances configured with an AsyncLRUCache instance, for an AsyncOrigin instance.
+    The AsyncLRUCache instances are never sharded, since all of their operations run on the single thread of the event loop.
+    '''
+    def _create_LRUCache(self):
+        return AsyncLRUCache(max_size=self.max_size_of_LRUCache, max_age=self.max_age_of_LRUCache, max_bytes=self.max_bytes_of_LRUCache, stale_while_revalidate=self.stale_while_revalidate_of_LRUCache, clock=self.clock_of_LRUCache)
+
+    def _create_proxy(self, coordinates : Tuple[float, float]):
+        return AsyncProxy(coordinates, self._create_LRUCache(), self.origin)
+
+    def enable_peer_fetch(self, k : int, timeout : float, max_distance : float):
+        raise ValueError("peer fetch is only supported by proxies served by threads")
 
-    def put(self, key : Hashable, value : Any):
-        self.LRUCache.set(key, value)
-        self.origin.set(key, value) # propagate the update to this value to the shared repository so that the updated value may be later propagated to other proxies when they handle a cache miss on this value
\ No newline at end of file
+    def _set_callbacks(self, proxy):
+        if (self.origin.region_radius is not None):
+            raise ValueError("the regional tier is only supported by proxies served by threads")
+        super()._set_callbacks(proxy)
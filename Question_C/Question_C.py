@@ -1,13 +1,85 @@
 from LRUCache import LRUCache
+from CompactLRUCache import CompactLRUCache
+from ShardedLRUCache import ShardedLRUCache
+try:
+    from SharedLRUCache import SharedLRUCache
+except ImportError: # multiprocessing.shared_memory is only available from Python 3.8 onwards
+    SharedLRUCache = None
+from Database import Database
+from Origin import Origin, AsyncOrigin
+from AdmissionPolicy import TinyLFU
+from Snapshot import SnapshotValue, save_snapshot, warm_start
+from WriteBehind import WriteBehindDatabase
+from SQLiteDatabase import SQLiteDatabase
+from LogDatabase import LogDatabase, MIN_COMPACTION_BYTES
+from Simulator import simulate
+from Clock import CoarseClock, ManualClock
+from InvalidationBus import Update, BusListener, BusConnection
+from Transport import ProxyServer, OriginServer, TransportClient, ConnectionPool, connect_proxy, RemoteError, VALUE_CODEC
+from Proxy import AsyncProxy
+from AsyncLRUCache import AsyncLRUCache
+import utils
+from utils import distance, distances, nearest_indexes, geohash, geohash_center
 from test_data import valid_max_sizes, valid_max_ages, invalid_max_sizes, invalid_max_ages, valid_keys, valid_values
 
 import time
+import threading
+import asyncio
+import multiprocessing
+import os
+import pickle
+import tempfile
+
+class MockDatabase(Database):
+    '''
+    An in-memory database that counts the queries and writes it receives (a bulk query or write counts as one).
+    '''
+    def __init__(self):
+        self.table = dict()
+        self.queries, self.writes = 0, 0
+
+    def get(self, key):
+        self.queries += 1
+        return self.table[key]
+
+    def put(self, key, value):
+        self.writes += 1
+        self.table[key] = value
+
+    def get_many(self, keys):
+        self.queries += 1
+        return {key: self.table[key] for key in keys if key in self.table}
+
+    def put_many(self, items):
+        self.writes += 1
+        self.table.update(items)
+
+class UnbuildableError(Exception):
+    '''
+    An error whose arguments are not those of its constructor, so that it cannot be built again from them (e.g. by unpickling it).
+    '''
+    def __init__(self, key, reason):
+        super().__init__("{} {}".format(key, reason))
+
+def create_mock_origin(max_size : int, max_age : int, coordinates_of_proxies, origin_class = Origin):
+    origin = origin_class(MockDatabase(), max_size, max_age, 60)
+    origin._set_potential_servers({coordinates: None for coordinates in coordinates_of_proxies})
+    for coordinates in coordinates_of_proxies:
+        origin._add_proxy(coordinates)
+    return origin
+
+def put_through_shared_cache(cache, key):
+    '''
+    Run by another process, to get a value from a SharedLRUCache and put it back under the given key.
+    '''
+    cache.put(key, cache.get('key') + ' from another process')
+    cache.close()
 
 def create_mock_cache(max_size : int, max_age : int):
     return LRUCache(max_size, max_age)
 
-def create_and_fill_mock_cache(max_size : int, max_age : int):
-    cache = LRUCache(max_size, max_age)
+def create_and_fill_mock_cache(max_size : int, max_age : int, clock : ManualClock = None):
+    cache = LRUCache(max_size, max_age, clock=clock)
     for i in range(max_size):
         cache.put(i, 'value{}'.format(i))
     return cache
@@ -91,10 +163,70 @@ def test_IO_LRUCache():
     print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
 
 def test_MRU_LRUCache():
-    pass
+    print("Test name:\ntest MRU LRUCache\n")
+    max_size = 5
+    max_age = 86400
+
+    num_test_cases = 2
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock cache with max size {} and max age {} and filling it to capacity with mock data.".format(max_size, max_age))
+    cache = create_and_fill_mock_cache(max_size, max_age)
+
+    print("Checking whether the data put last is the MRU data", end=' ')
+    try:
+        assert cache.tail.prev.key == max_size - 1
+        assert cache.head.next.key == 0
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the key {} to be the MRU data, and the key 0 the LRU data).".format(max_size - 1))
+
+    print("Checking whether getting the LRU data makes it the MRU data", end=' ')
+    cache.get(0)
+    try:
+        assert cache.tail.prev.key == 0
+        assert cache.head.next.key == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the key 0 to be the MRU data, and the key 1 the LRU data).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
 
 def test_eviction_LRUCache():
-    pass
+    print("Test name:\ntest eviction LRUCache\n")
+    max_size = 5
+    max_age = 86400
+
+    num_test_cases = 1
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock cache with max size {} and max age {} and filling it to capacity with mock data.".format(max_size, max_age))
+    cache = create_and_fill_mock_cache(max_size, max_age)
+
+    print("Checking whether putting new data in a full cache evicts the LRU data only", end=' ')
+    cache.get(0) # the key 1 becomes the LRU data
+    cache.put('new', 'value')
+    try:
+        assert cache.size() == max_size
+        assert cache.cache_info().evictions == 1
+        assert 1 not in cache.hash_map
+        assert all(key in cache.hash_map for key in (0, 2, 3, 4, 'new'))
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the key 1 to be evicted).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
 
 def test_capacity_LRUCache():
     print("Test name:\ntest capacity LRUCache\n")
@@ -137,19 +269,16 @@ def test_expiry_LRUCache():
     num_test_cases = 2
     test_results = {"pass": 0, "fail": 0}
 
-    print("Creating a mock cache with max size {} and max age {} and filling it to capacity with mock data.".format(max_size, max_age))
-    cache = create_and_fill_mock_cache(max_size, max_age)
+    print("Creating a mock cache with max size {} and max age {} on a manual clock and filling it to capacity with mock data.".format(max_size, max_age))
+    clock = ManualClock()
+    cache = create_and_fill_mock_cache(max_size, max_age, clock)
     # cache does not have a miss_callback set
-    start = time.monotonic()
     assert cache.cache_info().max_size == max_size
     assert cache.cache_info().max_age == max_age
     assert cache.size() == max_size
 
-    print("Waiting {} seconds for all data in the cache to expire.\n...".format(max_age))
-    time.sleep(max_age)
-
-    end = time.monotonic()
-    assert (end - start) > max_age
+    print("Advancing the clock {} seconds for all data in the cache to expire.".format(max_age))
+    clock.advance(max_age)
 
     print("Checking whether we are able to get any of the data in the cache after it has expired", end=' ')
     misses = 0
@@ -181,18 +310,2018 @@ def test_expiry_LRUCache():
     assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
     print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
 
-def test():
-    test_create_LRUCache()
-    print('\n')
-    test_IO_LRUCache()
-    print('\n')
-    test_MRU_LRUCache()
-    print('\n')
-    test_eviction_LRUCache()
-    print('\n')
-    test_capacity_LRUCache()
-    print('\n')
-    test_expiry_LRUCache()
+def test_compact_LRUCache():
+    print("Test name:\ntest compact LRUCache\n")
+    max_size = 5
+    max_age = 86400
+
+    num_test_cases = len(valid_keys) + 2
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock cache and a compact mock cache with max size {} and max age {} and filling both to capacity with mock data.".format(max_size, max_age))
+    cache = create_and_fill_mock_cache(max_size, max_age)
+    compact_cache = CompactLRUCache(max_size, max_age)
+    for i in range(max_size):
+        compact_cache.put(i, 'value{}'.format(i))
+
+    for i, (valid_key, valid_value) in enumerate(zip(valid_keys, valid_values)):
+        print("\nTest case {}:\nChecking whether the compact cache holds the same data as the cache after putting the mock data indexed by its key '{}' in both".format(i+1, valid_key), end=' ')
+        cache.put(valid_key, valid_value)
+        compact_cache.put(valid_key, valid_value)
+        if (i % max_size) in cache.hash_map: # touch some of the data to reorder the DLL of both caches the same way
+            cache.get(i % max_size)
+            compact_cache.get(i % max_size)
+        try:
+            assert sorted(map(str, cache.hash_map)) == sorted(map(str, compact_cache.hash_map))
+            assert all(cache.get(key) == compact_cache.get(key) for key in cache.hash_map)
+            print("passed", end=' ')
+            test_results['pass'] += 1
+        except (KeyError, AssertionError):
+            print("failed", end=' ')
+            test_results['fail'] += 1
+        print("(expected both caches to hold the same keys and values).")
+
+    print("\nTest case {}:\nChecking whether the compact cache reports the same cache info as the cache".format(len(valid_keys) + 1), end=' ')
+    try:
+        assert cache.cache_info() == compact_cache.cache_info()
+        assert len(compact_cache.keys) == max_size + 1 # freed slots are reused rather than growing the arrays
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {}).".format(cache.cache_info()))
+
+    print("\nTest case {}:\nChecking whether a snapshot of the compact cache restores the same data in the same order into another compact cache".format(num_test_cases), end=' ')
+    path = os.path.join(tempfile.mkdtemp(), 'snapshot')
+    restored_cache = CompactLRUCache(max_size, max_age)
+    try:
+        assert [item[:2] for item in compact_cache.snapshot_items()] == [item[:2] for item in cache.snapshot_items()]
+        assert save_snapshot(compact_cache, path) == max_size
+        assert warm_start(restored_cache, path) == max_size
+        assert list(restored_cache.hash_map) == list(compact_cache.hash_map)
+        assert all(restored_cache.get(key) == compact_cache.get(key) for key in compact_cache.hash_map) # the lazy values are loaded when first read
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (KeyError, AssertionError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {} entries saved and restored).".format(max_size))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_sweep_LRUCache():
+    print("Test name:\ntest sweep LRUCache\n")
+    max_size = 5
+    max_age = 1
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock cache with max size {} and max age {} on a manual clock that sweeps expired data, and filling it to capacity with mock data.".format(max_size, max_age))
+    clock = ManualClock()
+    cache = LRUCache(max_size, max_age, sweep_expired=True, clock=clock)
+    for i in range(max_size):
+        cache.put(i, 'value{}'.format(i))
+    assert cache.size() == max_size
+
+    print("Advancing the clock {} seconds for all data in the cache to expire.".format(max_age + max_age / 10))
+    clock.advance(max_age + max_age / 10)
+
+    print("Checking whether putting new data in the cache removes all the expired data without getting it", end=' ')
+    cache.put('new', 'value')
+    try:
+        assert cache.size() == 1
+        assert cache.cache_info().expiries == max_size
+        assert cache.cache_info().misses == 0
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the cache to only hold the new data, and to have counted {} expiries).".format(max_size))
+
+    print("Checking whether the new data is still in the cache", end=' ')
+    try:
+        assert cache.get('new') == 'value'
+        assert len(cache.expiry_wheel) == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (KeyError, AssertionError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the new data to be in the cache).")
+
+    print("Checking whether a key swept once expired is retrieved in full by a revalidating cache, rather than revalidated", end=' ')
+    versions_revalidated = []
+    def revalidate(key, version):
+        versions_revalidated.append(version)
+        return (False, None, version) if version == 5 else (True, 'value', 5)
+    revalidations = []
+    for sweep_expired in (False, True):
+        clock = ManualClock()
+        revalidating_cache = LRUCache(max_size, max_age, sweep_expired=sweep_expired, clock=clock)
+        revalidating_cache.set_miss_callback(lambda key: 'value')
+        revalidating_cache.set_revalidate_callback(revalidate)
+        revalidating_cache.put('key', 'value', version=5)
+        clock.advance(max_age * 2)
+        revalidating_cache.get('key')
+        revalidations.append(revalidating_cache.cache_info().revalidations)
+    try:
+        assert versions_revalidated == [5, 0]
+        assert revalidations == [1, 0]
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the version of the expired data to be revalidated only without sweeping, got {}).".format(versions_revalidated))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_sharded_LRUCache():
+    print("Test name:\ntest sharded LRUCache\n")
+    max_size = 64
+    max_age = 86400
+    num_shards = 8
+    num_threads = 8
+    num_requests = 2000
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock sharded cache with max size {}, max age {} and {} shards, that produces a value from the key upon cache miss.".format(max_size, max_age, num_shards))
+    cache = ShardedLRUCache(max_size, max_age, lambda key: 'value{}'.format(key), num_shards=num_shards)
+    errors = []
+
+    def request(thread_index):
+        for i in range(num_requests):
+            key = (thread_index * 7 + i) % (max_size * 2)
+            try:
+                if (i % 4 == 0):
+                    cache.put(key, 'value{}'.format(key))
+                else:
+                    assert cache.get(key) == 'value{}'.format(key)
+            except Exception as e:
+                errors.append(e)
+
+    print("Sending {} requests to the cache from each of {} threads.".format(num_requests, num_threads))
+    threads = [threading.Thread(target=request, args=(thread_index,)) for thread_index in range(num_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print("Checking whether every get request on the cache returned the value of its key", end=' ')
+    try:
+        assert len(errors) == 0
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected no errors, got {}).".format(len(errors)))
+
+    print("Checking whether the size of the cache remained within its max size {}".format(max_size), end=' ')
+    try:
+        assert cache.size() <= max_size
+        assert all(shard.size() == len(shard.hash_map) for shard in cache.shards)
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected size at most {}, got {}).".format(max_size, cache.size()))
+
+    print("Checking whether the cache info combines the cache info of every shard", end=' ')
+    cache_info = cache.cache_info()
+    try:
+        assert cache_info.hits + cache_info.misses == num_threads * num_requests * 3 // 4
+        assert cache_info.max_size == max_size
+        assert cache_info.max_age == max_age
+        assert cache_info.curr_size == cache.size()
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {} hits and misses in total).".format(num_threads * num_requests * 3 // 4))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_bulk_Proxy():
+    print("Test name:\ntest bulk Proxy\n")
+    max_size = len(valid_keys) * 2
+    max_age = 86400
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with a single proxy with a cache of max size {} and max age {}, and a database holding the mock data.".format(max_size, max_age))
+    origin = create_mock_origin(max_size, max_age, [(45.5, -73.6)])
+    proxy = origin.get_nearest_proxy((45.5, -73.6))
+    database = origin.database
+    database.table.update(zip(valid_keys, valid_values))
+
+    print("Checking whether getting all the mock data through the proxy queries the database once", end=' ')
+    try:
+        assert proxy.get_many(valid_keys + ('missing',)) == dict(zip(valid_keys, valid_values))
+        assert database.queries == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the missing key to be left out, and a single bulk query, got {} queries).".format(database.queries))
+
+    print("Checking whether getting all the mock data again is served by the cache", end=' ')
+    try:
+        assert proxy.get_many(valid_keys) == dict(zip(valid_keys, valid_values))
+        assert database.queries == 1
+        assert proxy.LRUCache.cache_info().hits == len(valid_keys)
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {} cache hits and no more queries).".format(len(valid_keys)))
+
+    print("Checking whether putting many items through the proxy writes to the database once", end=' ')
+    proxy.put_many(('new{}'.format(i), i) for i in range(5))
+    try:
+        assert database.writes == 1
+        assert all(database.table['new{}'.format(i)] == i for i in range(5))
+        assert proxy.get_many('new{}'.format(i) for i in range(5)) == {'new{}'.format(i): i for i in range(5)}
+        assert database.queries == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (KeyError, AssertionError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a single bulk write, got {} writes).".format(database.writes))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_coalescing_ShardedLRUCache():
+    print("Test name:\ntest coalescing ShardedLRUCache\n")
+    max_size = 16
+    max_age = 86400
+    num_threads = 8
+
+    num_test_cases = 2
+    test_results = {"pass": 0, "fail": 0}
+
+    calls = []
+    def slow_miss_callback(key):
+        calls.append(key)
+        time.sleep(0.2) # long enough for every thread to miss while the first call is in flight
+        if (key == 'error'):
+            raise ConnectionError(key)
+        return 'value{}'.format(key)
+
+    def get_concurrently(cache, key):
+        results = []
+        barrier = threading.Barrier(num_threads)
+        def request():
+            barrier.wait()
+            try:
+                results.append(cache.get(key))
+            except ConnectionError as e:
+                results.append(e)
+        threads = [threading.Thread(target=request) for _ in range(num_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    print("Creating a mock sharded cache with max size {} and max age {}, with a slow miss callback.".format(max_size, max_age))
+    cache = ShardedLRUCache(max_size, max_age, slow_miss_callback, num_shards=4)
+
+    print("Checking whether {} threads missing on the same key at once call the miss callback once".format(num_threads), end=' ')
+    results = get_concurrently(cache, 'key')
+    try:
+        assert results == ['valuekey'] * num_threads
+        assert calls == ['key']
+        assert cache.cache_info().coalesced == num_threads - 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a single call, got {}, and {} coalesced misses).".format(len(calls), num_threads - 1))
+
+    print("Checking whether the error raised by the miss callback is raised to every thread", end=' ')
+    del calls[:]
+    results = get_concurrently(cache, 'error')
+    try:
+        assert len(results) == num_threads
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert calls == ['error']
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a single call, got {}, and {} errors).".format(len(calls), num_threads))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_async_Proxy():
+    print("Test name:\ntest async Proxy\n")
+    max_size = 16
+    max_age = 86400
+    num_requests = 100
+
+    num_test_cases = 5
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock async origin with a single proxy with a cache of max size {} and max age {}, and a database holding the mock data.".format(max_size, max_age))
+    origin = create_mock_origin(max_size, max_age, [(45.5, -73.6)], AsyncOrigin)
+    proxy = origin.get_nearest_proxy((45.5, -73.6))
+    database = origin.database
+    database.table.update(zip(valid_keys, valid_values))
+
+    async def get_concurrently():
+        return await asyncio.gather(*(proxy.get('abcdef') for _ in range(num_requests)))
+
+    print("Checking whether {} concurrent get requests on the same key through the proxy query the database once".format(num_requests), end=' ')
+    results = asyncio.run(get_concurrently())
+    try:
+        assert results == [dict(zip(valid_keys, valid_values))['abcdef']] * num_requests
+        assert database.queries == 1
+        assert proxy.LRUCache.cache_info().coalesced == num_requests - 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a single query, got {}).".format(database.queries))
+
+    print("Checking whether a get request hitting the cache completes without suspending", end=' ')
+    request = proxy.get('abcdef')
+    try:
+        request.send(None) # runs the coroutine until it either suspends or returns
+        request.close()
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    except StopIteration as stop:
+        assert stop.value == dict(zip(valid_keys, valid_values))['abcdef']
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    print("(expected the coroutine to return the value on its first step).")
+
+    print("Checking whether a put request through the proxy reaches the database", end=' ')
+    asyncio.run(proxy.put('new', 'value'))
+    try:
+        assert database.table['new'] == 'value'
+        assert asyncio.run(proxy.get('new')) == 'value'
+        assert database.queries == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (KeyError, AssertionError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the new data in the database and in the cache).")
+
+    print("Checking whether the callers awaiting a miss retrieve the key themselves once the caller retrieving it is cancelled", end=' ')
+    retrievals = []
+    async def slow_miss_callback(key):
+        retrievals.append(key)
+        await asyncio.sleep(0.05 if len(retrievals) == 1 else 0)
+        return 'value'
+    async def cancel_first_caller():
+        cache = AsyncLRUCache(max_size, max_age, slow_miss_callback)
+        first_caller = asyncio.ensure_future(cache.get('key'))
+        await asyncio.sleep(0) # the first caller starts retrieving the key
+        other_callers = [asyncio.ensure_future(cache.get('key')) for _ in range(3)]
+        await asyncio.sleep(0)
+        first_caller.cancel()
+        return await asyncio.wait_for(asyncio.gather(*other_callers, return_exceptions=True), 5), first_caller.cancelled()
+    try:
+        values, first_caller_cancelled = asyncio.run(cancel_first_caller())
+        assert values == ['value'] * 3
+        assert first_caller_cancelled
+        assert len(retrievals) == 2
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (AssertionError, asyncio.TimeoutError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the value for each of the other callers, retrieved once more).")
+
+    print("Checking whether enabling peer fetch or the regional tier on the async origin is rejected with a ValueError", end=' ')
+    rejections = 0
+    for enable in (origin.enable_peer_fetch, origin.enable_regional_tier):
+        try:
+            enable()
+        except ValueError:
+            rejections += 1
+    try:
+        assert rejections == 2
+        assert origin.region_radius is None
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected 2 rejections, got {}).".format(rejections))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_max_bytes_LRUCache():
+    print("Test name:\ntest max bytes LRUCache\n")
+    max_size = 100
+    max_age = 86400
+    max_bytes = 10
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock cache with max size {}, max age {} and max bytes {}, weighing each value by its length.".format(max_size, max_age, max_bytes))
+    cache = LRUCache(max_size, max_age, max_bytes=max_bytes, weigher=len)
+
+    print("Checking whether putting values weighing more than the max bytes in total evicts the LRU values", end=' ')
+    for key in ('a', 'b', 'c'):
+        cache.put(key, key * 4)
+    try:
+        assert sorted(cache.hash_map) == ['b', 'c']
+        assert cache.cache_info().curr_bytes == 8
+        assert cache.cache_info().max_bytes == max_bytes
+        assert cache.cache_info().evictions == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the cache to hold 8 bytes, got {}).".format(cache.cache_info().curr_bytes))
+
+    print("Checking whether updating a value updates the bytes held by the cache", end=' ')
+    cache.put('b', 'b')
+    try:
+        assert sorted(cache.hash_map) == ['b', 'c']
+        assert cache.cache_info().curr_bytes == 5
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the cache to hold 5 bytes, got {}).".format(cache.cache_info().curr_bytes))
+
+    print("Checking whether a value weighing more than the max bytes on its own is not kept in the cache", end=' ')
+    cache.put('d', 'd' * (max_bytes + 1))
+    try:
+        assert cache.size() == 0
+        assert cache.cache_info().curr_bytes == 0
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the cache to be empty, got size {}).".format(cache.size()))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_admission_LRUCache():
+    print("Test name:\ntest admission LRUCache\n")
+    max_size = 5
+    max_age = 86400
+    scan_length = 50
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock cache with max size {} and max age {} with a TinyLFU admission policy, and filling it to capacity with mock data that is then got several times.".format(max_size, max_age))
+    cache = LRUCache(max_size, max_age, admission_policy=TinyLFU(max_size))
+    for i in range(max_size):
+        cache.put(i, 'value{}'.format(i))
+    for _ in range(3):
+        for i in range(max_size):
+            cache.get(i)
+
+    print("Checking whether a scan of {} new keys leaves the frequently used data in the cache".format(scan_length), end=' ')
+    for i in range(max_size, max_size + scan_length):
+        cache.put(i, 'value{}'.format(i))
+    try:
+        assert sorted(cache.hash_map) == list(range(max_size))
+        assert cache.cache_info().rejections == scan_length
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the {} scanned keys to be rejected).".format(scan_length))
+
+    print("Checking whether a new key used more frequently than the LRU data is admitted", end=' ')
+    for _ in range(5):
+        cache.put('hot', 'value')
+    try:
+        assert 'hot' in cache.hash_map
+        assert cache.size() == max_size
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the new key to be in the cache).")
+
+    print("Checking whether each get is recorded once by the policy, and the values put by its miss and by a published update are not recorded", end=' ')
+    policy = TinyLFU(max_size)
+    cache = LRUCache(max_size, max_age, miss_callback=lambda key: 'value', admission_policy=policy)
+    cache.get('key') # missed, then put by the miss
+    cache.receive([Update('key', 1, 'new value', False)])
+    cache.get('key') # applies the update, then hits
+    try:
+        assert cache.get('key') == 'new value'
+        assert policy.sketch.estimate('key') == 3
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected 3 recorded accesses for 3 gets).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_stale_while_revalidate_LRUCache():
+    print("Test name:\ntest stale while revalidate LRUCache\n")
+    max_size = 5
+    max_age = 86400
+    ttl = 0.2
+    stale_while_revalidate = 5
+
+    num_test_cases = 4
+    test_results = {"pass": 0, "fail": 0}
+
+    versions = {'short': 0}
+    def miss_callback(key):
+        versions[key] += 1
+        return 'version{}'.format(versions[key])
+
+    print("Creating a mock cache with max size {}, max age {} and a stale while revalidate window of {} seconds on a manual clock, holding data with a time to live of {} seconds, and data with the max age of the cache.".format(max_size, max_age, stale_while_revalidate, ttl))
+    clock = ManualClock()
+    cache = LRUCache(max_size, max_age, miss_callback, stale_while_revalidate=stale_while_revalidate, clock=clock)
+    cache.put('short', 'version0', ttl=ttl)
+    cache.put('long', 'value')
+    plain_cache = LRUCache(max_size, max_age, clock=clock)
+    plain_cache.put('short', 'version0', ttl=ttl)
+    plain_cache.put('long', 'value')
+
+    print("Advancing the clock {} seconds for the data with a time to live to expire.".format(ttl))
+    clock.advance(ttl)
+
+    print("Checking whether only the data with a time to live expired in a cache without a stale while revalidate window", end=' ')
+    try:
+        assert plain_cache.get('long') == 'value'
+        try:
+            plain_cache.get('short')
+            assert False
+        except KeyError:
+            pass
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a hit on the data with the max age and a miss on the data with a time to live).")
+
+    print("Checking whether the expired data is served stale right away", end=' ')
+    try:
+        assert cache.get('short') == 'version0'
+        assert cache.cache_info().stale_hits == 1
+        assert cache.cache_info().misses == 0
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a stale hit on the old version of the data).")
+
+    print("Checking whether the data is refreshed in the background by the next operation", end=' ')
+    cache.refresh_executor.shutdown(wait=True) # wait for the background refresh to complete
+    try:
+        assert cache.get('short') == 'version1'
+        assert versions['short'] == 1
+        assert cache.cache_info().refreshes == 1
+        assert cache.hash_map['short'].max_age == ttl # the refreshed data keeps its time to live
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a hit on the refreshed version of the data).")
+
+    print("Checking whether data put while it is refreshed in the background is not overwritten by the refreshed data", end=' ')
+    refresh_started, refresh_released = threading.Event(), threading.Event()
+    def slow_miss_callback(key):
+        refresh_started.set()
+        refresh_released.wait()
+        return 'refreshed'
+    racing_cache = LRUCache(max_size, max_age, slow_miss_callback, stale_while_revalidate=stale_while_revalidate, clock=clock)
+    racing_cache.put('short', 'version0', ttl=ttl)
+    clock.advance(ttl)
+    racing_cache.get('short') # a stale hit, refreshed in the background
+    refresh_started.wait()
+    racing_cache.put('short', 'newer')
+    refresh_released.set()
+    racing_cache.refresh_executor.shutdown(wait=True)
+    try:
+        assert racing_cache.get('short') == 'newer'
+        assert racing_cache.cache_info().refreshes == 0
+        assert len(racing_cache.refreshing) == 0
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the data put, rather than the refreshed data).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_snapshot_Proxy():
+    print("Test name:\ntest snapshot Proxy\n")
+    max_size = len(valid_keys) * 2
+    max_age = 86400
+    ttl = 60
+
+    num_test_cases = 5
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with a single proxy with a cache of max size {} and max age {}, filled with the mock data and with data with a time to live of {} seconds, and saving a snapshot of the cache.".format(max_size, max_age, ttl))
+    coordinates = (45.5, -73.6)
+    origin = create_mock_origin(max_size, max_age, [coordinates])
+    proxy = origin.get_nearest_proxy(coordinates)
+    proxy.put('short', 'value', ttl=ttl)
+    proxy.put_many(zip(valid_keys, valid_values))
+    proxy.get(valid_keys[0]) # the first key becomes the MRU
+    expected_order = list(valid_keys[1:]) + [valid_keys[0]]
+    path = os.path.join(tempfile.mkdtemp(), 'snapshot')
+
+    print("Checking whether the snapshot holds every entry", end=' ')
+    try:
+        assert proxy.snapshot(path) == len(valid_keys) + 1
+        assert not os.path.exists(path + '.tmp')
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {} entries saved).".format(len(valid_keys) + 1))
+
+    print("Restarting the proxy with an empty cache {} seconds later, once the data with a time to live expired.".format(ttl))
+    restarted_at = time.time() + ttl # the wall clock time of the restart, rather than waiting for it
+    restarted_origin = create_mock_origin(max_size, max_age, [coordinates])
+    restarted_proxy = restarted_origin.get_nearest_proxy(coordinates)
+
+    print("Checking whether the warm start restores the unexpired entries in the same recency order, with lazily loaded values", end=' ')
+    try:
+        assert restarted_proxy.warm_start(path, restarted_at) == len(valid_keys)
+        assert list(restarted_proxy.LRUCache.hash_map) == expected_order
+        assert 'short' not in restarted_proxy.LRUCache.hash_map
+        assert all(isinstance(value, SnapshotValue) for _, value, _ in restarted_proxy.LRUCache.snapshot_items())
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {} entries restored, without the expired entry).".format(len(valid_keys)))
+
+    print("Checking whether the restored data is served by the cache", end=' ')
+    try:
+        assert restarted_proxy.get_many(valid_keys) == dict(zip(valid_keys, valid_values))
+        assert restarted_proxy.LRUCache.cache_info().hits == len(valid_keys)
+        assert restarted_origin.database.queries == 0
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {} cache hits and no queries to the database).".format(len(valid_keys)))
+
+    print("Checking whether a value corrupted in the snapshot is missed rather than raised by the cache", end=' ')
+    with open(path, 'r+b') as file:
+        data = file.read()
+        file.seek(data.index(pickle.dumps(valid_values[1], pickle.HIGHEST_PROTOCOL)))
+        file.write(b'\x00') # the index is left intact, so only loading the value finds it corrupt
+    corrupted_origin = create_mock_origin(max_size, max_age, [coordinates])
+    corrupted_origin.database.table.update(zip(valid_keys, valid_values))
+    corrupted_proxy = corrupted_origin.get_nearest_proxy(coordinates)
+    try:
+        assert corrupted_proxy.warm_start(path, restarted_at) == len(valid_keys)
+        assert corrupted_proxy.get(valid_keys[1]) == valid_values[1]
+        assert corrupted_origin.database.queries == 1
+        assert corrupted_proxy.get(valid_keys[1]) == valid_values[1]
+        assert corrupted_origin.database.queries == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (ValueError, AssertionError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the corrupt value to be retrieved from the database once).")
+
+    print("Checking whether an entry whose key is corrupted in the snapshot is skipped by the warm start, which restores the other entries", end=' ')
+    with open(path, 'r+b') as file:
+        data = file.read()
+        file.seek(data.index(pickle.dumps(valid_keys[2], pickle.HIGHEST_PROTOCOL)))
+        file.write(b'\x00')
+    corrupted_origin = create_mock_origin(max_size, max_age, [coordinates])
+    corrupted_proxy = corrupted_origin.get_nearest_proxy(coordinates)
+    try:
+        assert corrupted_proxy.warm_start(path, restarted_at) == len(valid_keys) - 1
+        assert list(corrupted_proxy.LRUCache.hash_map) == [key for key in expected_order if key != valid_keys[2]]
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (pickle.UnpicklingError, ValueError, AssertionError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {} entries restored, without the corrupt entry).".format(len(valid_keys) - 1))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_spatial_Origin():
+    print("Test name:\ntest spatial Origin\n")
+    max_size = 5
+    max_age = 86400
+    coordinates_of_proxies = [(45.5, -73.6), (43.7, -79.4), (49.3, -123.1), (40.7, -74.0), (51.5, -0.1), (48.9, 2.4), (35.7, 139.7), (-33.9, 151.2)]
+    coordinates_of_clients = [(45.4, -75.7), (42.4, -71.1), (50.1, 8.7), (-37.8, 145.0), (37.8, -122.4), (0.0, 0.0)]
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with {} proxies spread around the world, and a potential server near one of them.".format(len(coordinates_of_proxies)))
+    origin = create_mock_origin(max_size, max_age, coordinates_of_proxies)
+    origin._set_potential_servers({(45.6, -73.5): None})
+
+    def nearest_by_scan(client_coordinates, k):
+        return sorted(origin.proxies, key=lambda coordinates: distance(client_coordinates, coordinates))[:k]
+
+    print("Checking whether the nearest proxy and the 3 nearest proxies of clients are the ones found by comparing the distance to every proxy", end=' ')
+    try:
+        for client_coordinates in coordinates_of_clients:
+            assert origin.get_nearest_proxy(client_coordinates).coordinates == nearest_by_scan(client_coordinates, 1)[0]
+            assert [proxy.coordinates for proxy in origin.get_nearest_proxies(client_coordinates, 3)] == nearest_by_scan(client_coordinates, 3)
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the same proxies for each of the {} clients).".format(len(coordinates_of_clients)))
+
+    print("Checking whether clients are no longer assigned a reported proxy", end=' ')
+    origin.report_failure((45.5, -73.6))
+    try:
+        assert origin.get_nearest_proxy((45.4, -75.7)).coordinates == (43.7, -79.4)
+        assert (45.5, -73.6) not in [proxy.coordinates for proxy in origin.get_nearest_proxies((45.4, -75.7), len(coordinates_of_proxies))]
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the next nearest proxy).")
+
+    print("Checking whether balancing the load adds a proxy at the potential server nearest the most stressed proxy", end=' ')
+    for proxy in origin.proxies.values():
+        proxy.put('key', 'value')
+        proxy.get('key')
+    stressed_proxy = origin.get_nearest_proxy((40.7, -74.0))
+    for _ in range(10):
+        stressed_proxy.get('key')
+    origin.balance_load()
+    try:
+        assert origin.get_nearest_proxy((45.4, -75.7)).coordinates == (45.6, -73.5)
+        assert len(origin.potential_servers) == 0
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a new proxy at the potential server).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_bulk_routing_Origin():
+    print("Test name:\ntest bulk routing Origin\n")
+    max_size = 5
+    max_age = 86400
+    coordinates_of_proxies = [(45.5, -73.6), (43.7, -79.4), (49.3, -123.1), (40.7, -74.0), (51.5, -0.1), (48.9, 2.4), (35.7, 139.7), (-33.9, 151.2)]
+    coordinates_of_clients = [(latitude, longitude) for latitude in range(-80, 90, 20) for longitude in range(-170, 180, 20)]
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with {} proxies spread around the world.".format(len(coordinates_of_proxies)))
+    origin = create_mock_origin(max_size, max_age, coordinates_of_proxies)
+
+    print("Checking whether the batched distances are the distances between each pair of coordinates", end=' ')
+    matrix = distances(coordinates_of_clients, coordinates_of_proxies)
+    try:
+        assert len(matrix) == len(coordinates_of_clients)
+        assert all(abs(matrix[i][j] - distance(client_coordinates, proxy_coordinates)) < 0.001 for i, client_coordinates in enumerate(coordinates_of_clients) for j, proxy_coordinates in enumerate(coordinates_of_proxies))
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a {} by {} matrix of distances{}).".format(len(coordinates_of_clients), len(coordinates_of_proxies), "" if utils.numpy is not None else ", computed without NumPy"))
+
+    print("Checking whether the nearest indexes are those of the smallest distance from each client, with and without NumPy", end=' ')
+    expected_indexes = [min(range(len(coordinates_of_proxies)), key=lambda j: distance(client_coordinates, coordinates_of_proxies[j])) for client_coordinates in coordinates_of_clients]
+    numpy_module = utils.numpy
+    try:
+        for module in {numpy_module, None}: # the pure Python fallback is checked even if NumPy is installed
+            utils.numpy = module
+            assert nearest_indexes(coordinates_of_clients, coordinates_of_proxies) == expected_indexes
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    finally:
+        utils.numpy = numpy_module
+    print("(expected the index of the nearest proxy to each of the {} clients).".format(len(coordinates_of_clients)))
+
+    print("Checking whether routing all the clients at once assigns each client its nearest proxy", end=' ')
+    try:
+        proxies = origin.get_nearest_proxy_many(coordinates_of_clients)
+        assert [proxy.coordinates for proxy in proxies] == [origin.get_nearest_proxy(client_coordinates).coordinates for client_coordinates in coordinates_of_clients]
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the nearest proxy of each of the {} clients).".format(len(coordinates_of_clients)))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_routing_table_Origin():
+    print("Test name:\ntest routing table Origin\n")
+    max_size = 5
+    max_age = 86400
+    coordinates_of_proxies = [(45.5, -73.6), (43.7, -79.4), (49.3, -123.1)]
+    coordinates_of_clients = [(45.5 + i / 1000, -73.6 + i / 1000) for i in range(5)] + [(43.7 + i / 1000, -79.4) for i in range(5)] + [(49.3, -123.1 - i / 1000) for i in range(5)]
+
+    num_test_cases = 4
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with {} proxies in different cities, and routing {} clients from these cities to their nearest proxy twice.".format(len(coordinates_of_proxies), len(coordinates_of_clients)))
+    origin = create_mock_origin(max_size, max_age, coordinates_of_proxies)
+    origin.enable_routing_table()
+    for _ in range(2):
+        for client_coordinates in coordinates_of_clients:
+            origin.get_nearest_proxy(client_coordinates)
+    cells = origin.routing_info().curr_size
+
+    print("Checking whether clients from the same cells are routed by the routing table", end=' ')
+    try:
+        assert origin.routing_info().misses == cells
+        assert origin.routing_info().hits == 2 * len(coordinates_of_clients) - cells
+        assert origin.routing_table.hit_rate() > 0.5
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected one miss for each of the {} cells, got a hit rate of {:.2f}).".format(cells, origin.routing_table.hit_rate()))
+
+    print("Checking whether adding a proxy only invalidates the cells that are nearer to it", end=' ')
+    new_coordinates = geohash_center(geohash(coordinates_of_clients[4], origin.routing_precision)) # at the center of the cell of a client
+    origin._set_potential_servers({new_coordinates: None})
+    origin._add_proxy(new_coordinates)
+    try:
+        assert 0 < origin.routing_info().invalidations < cells
+        assert origin.get_nearest_proxy(coordinates_of_clients[-1]).coordinates == (49.3, -123.1)
+        assert origin.get_nearest_proxy(coordinates_of_clients[4]).coordinates == new_coordinates
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {} of the {} cells to be invalidated).".format(origin.routing_info().invalidations, cells))
+
+    print("Checking whether reporting a proxy only invalidates its cells", end=' ')
+    invalidations = origin.routing_info().invalidations
+    cells_of_reported_proxy = len(origin.routing_table.cells_of_proxies[(49.3, -123.1)])
+    origin.report_failure((49.3, -123.1))
+    try:
+        assert origin.routing_info().invalidations == invalidations + cells_of_reported_proxy
+        assert origin.get_nearest_proxy(coordinates_of_clients[-1]).coordinates == (43.7, -79.4)
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the {} cells of the reported proxy to be invalidated).".format(cells_of_reported_proxy))
+
+    print("Checking whether a routing table with a max of 2 cells evicts the least recently routed cells", end=' ')
+    origin.enable_routing_table(max_cells=2)
+    for client_coordinates in (coordinates_of_clients[0], coordinates_of_clients[5], coordinates_of_clients[0], coordinates_of_clients[10]):
+        origin.get_nearest_proxy(client_coordinates)
+    try:
+        assert origin.routing_info().curr_size == 2
+        assert origin.routing_info().evictions == 1
+        assert geohash(coordinates_of_clients[0], origin.routing_precision) in origin.routing_table.cells # routed again before the third cell
+        assert len(origin.routing_table.demand()) == 2
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected 2 cells and 1 eviction, got {} and {}).".format(origin.routing_info().curr_size, origin.routing_info().evictions))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_write_behind_Origin():
+    print("Test name:\ntest write behind Origin\n")
+    max_size = 5
+    max_age = 86400
+    num_puts = 20
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with a single proxy and write behind enabled, and putting {} versions of a hot key and the mock data through the proxy.".format(num_puts))
+    coordinates = (45.5, -73.6)
+    origin = create_mock_origin(max_size, max_age, [coordinates])
+    database = origin.database
+    log_path = os.path.join(tempfile.mkdtemp(), 'log')
+    write_behind = origin.enable_write_behind(log_path, max_pending=1000, flush_interval=60)
+    proxy = origin.get_nearest_proxy(coordinates)
+    for i in range(num_puts):
+        proxy.put('hot', i)
+    proxy.put_many(zip(valid_keys, valid_values))
+
+    print("Checking whether the puts are acknowledged before reaching the database, and visible to gets", end=' ')
+    try:
+        assert database.writes == 0
+        assert origin.get('hot') == num_puts - 1
+        assert origin.get_many(valid_keys) == dict(zip(valid_keys, valid_values))
+        assert write_behind.coalesced == num_puts - 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected no writes to the database, and {} coalesced puts).".format(num_puts - 1))
+
+    print("Checking whether flushing writes the latest value of each key to the database in bulk, and deletes the log", end=' ')
+    write_behind.close()
+    try:
+        assert database.writes == 1
+        assert database.table == dict(zip(valid_keys, valid_values), hot=num_puts - 1)
+        assert write_behind.flushed == len(valid_keys) + 1
+        assert os.listdir(os.path.dirname(log_path)) == []
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a single bulk write, got {}).".format(database.writes))
+
+    print("Checking whether the puts acknowledged before a crash are written to the database after a restart", end=' ')
+    crashed_origin = create_mock_origin(max_size, max_age, [coordinates])
+    crashed_log_path = os.path.join(tempfile.mkdtemp(), 'log')
+    crashed_origin.enable_write_behind(crashed_log_path, flush_interval=60)
+    crashed_origin.get_nearest_proxy(coordinates).put_many(zip(valid_keys, valid_values)) # the origin crashes before flushing
+    recovered_database = MockDatabase()
+    recovered = WriteBehindDatabase(recovered_database, crashed_log_path, flush_interval=60)
+    recovered.flush()
+    try:
+        assert crashed_origin.database.database.writes == 0
+        assert recovered_database.writes == 1
+        assert recovered_database.table == dict(zip(valid_keys, valid_values))
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a single bulk write of the puts replayed from the log).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_push_Origin():
+    print("Test name:\ntest push Origin\n")
+    max_size = 5
+    max_age = 86400
+    coordinates_of_proxies = [(45.5, -73.6), (43.7, -79.4)]
+
+    num_test_cases = 7
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating mock origins with push enabled (one invalidating and one replicating), each with {} proxies caching the same data.".format(len(coordinates_of_proxies)))
+    origins = []
+    for replicate in (False, True):
+        origin = create_mock_origin(max_size, max_age, coordinates_of_proxies)
+        origin.enable_push(replicate=replicate, batch_interval=60) # the batches are delivered by the test
+        origin.database.table['key'] = 'old'
+        for coordinates in coordinates_of_proxies:
+            origin.get_nearest_proxy(coordinates).get('key')
+        origins.append(origin)
+
+    print("Checking whether a put through one proxy invalidates the older version held by the other proxy", end=' ')
+    origin = origins[0]
+    writer, reader = origin.get_nearest_proxy(coordinates_of_proxies[0]), origin.get_nearest_proxy(coordinates_of_proxies[1])
+    writer.put('key', 'new')
+    origin.bus.flush()
+    try:
+        assert reader.get('key') == 'new'
+        assert reader.LRUCache.cache_info().invalidations == 1
+        assert writer.get('key') == 'new'
+        assert writer.LRUCache.cache_info().stale_updates == 1 # the writer already holds the version it put
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the other proxy to retrieve the new version on its next get).")
+
+    print("Checking whether a put through one proxy replicates the new version to the other proxy", end=' ')
+    origin = origins[1]
+    writer, reader = origin.get_nearest_proxy(coordinates_of_proxies[0]), origin.get_nearest_proxy(coordinates_of_proxies[1])
+    writer.put('key', 'new')
+    origin.bus.flush()
+    queries = origin.database.queries
+    try:
+        assert reader.get('key') == 'new'
+        assert origin.database.queries == queries
+        assert reader.LRUCache.cache_info().misses == 1 # the first get
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a hit on the new version without querying the database).")
+
+    print("Checking whether an update older than the version held by a proxy is dropped", end=' ')
+    reader.LRUCache.receive([Update('key', 1, 'older', False)])
+    try:
+        assert reader.get('key') == 'new'
+        assert reader.LRUCache.cache_info().stale_updates == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the new version to be kept).")
+
+    print("Checking whether updates reach a proxy connected through the local socket transport with the authkey of the listener", end=' ')
+    authkey = os.urandom(16)
+    listener = BusListener(origin.bus, ('localhost', 0), authkey)
+    remote_cache = create_mock_cache(max_size, max_age)
+    remote_cache.put('key', 'new')
+    try:
+        BusConnection(listener.address, remote_cache.receive, b'wrong key') # refused, without stopping the listener
+        refused = False
+    except multiprocessing.AuthenticationError:
+        refused = True
+    connection = BusConnection(listener.address, remote_cache.receive, authkey)
+    while (len(listener.connections) == 0):
+        time.sleep(0.001)
+    writer.put('key', 'newer')
+    origin.bus.flush()
+    for _ in range(1000):
+        if (len(remote_cache.published) > 0):
+            break
+        time.sleep(0.001)
+    try:
+        assert refused
+        assert len(listener.connections) == 1
+        assert remote_cache.get('key') == 'newer'
+        assert remote_cache.cache_info().invalidations == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (KeyError, AssertionError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the replicated version, and the connection without the authkey to be refused).")
+    connection.close()
+    listener.close()
+
+    print("Checking whether a compact cache applies the updates it receives", end=' ')
+    compact_cache = CompactLRUCache(max_size, max_age)
+    compact_cache.put(1, 'a', version=1)
+    compact_cache.put(2, 'a', version=1)
+    compact_cache.receive([Update(1, 5, 'b', False), Update(2, 5, None, True), Update(1, 3, 'older', False)])
+    try:
+        assert compact_cache.get(1) == 'b'
+        assert 2 not in compact_cache.hash_map
+        assert len(compact_cache.published) == 0
+        assert (compact_cache.cache_info().invalidations, compact_cache.cache_info().stale_updates) == (2, 1)
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (KeyError, AssertionError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the replicated value, the invalidated key to be gone and the older update to be dropped).")
+
+    print("Checking whether a value retrieved by a miss in flight when an update of its key is published is not cached", end=' ')
+    racing_cache = create_mock_cache(max_size, max_age)
+    def miss_callback(key):
+        racing_cache.receive([Update(key, 5, None, True)]) # published while the older value is retrieved
+        return 'old'
+    racing_cache.set_miss_callback(miss_callback)
+    try:
+        assert racing_cache.get('key') == 'old'
+        assert 'key' not in racing_cache.hash_map
+        racing_cache.set_miss_callback(lambda key: 'new')
+        assert racing_cache.get('key') == 'new'
+        assert 'key' in racing_cache.hash_map
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (KeyError, AssertionError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the older value to be returned without being cached, and the next value to be cached).")
+
+    print("Checking whether a put of a version older than an update published meanwhile is dropped", end=' ')
+    kept_values = []
+    for cache in (create_mock_cache(max_size, max_age), CompactLRUCache(max_size, max_age)):
+        cache.receive([Update('invalidated', 2, None, True), Update('replicated', 2, 'newer', False)])
+        cache.put('invalidated', 'old', version=1)
+        cache.put('replicated', 'old', version=1)
+        cache.put('current', 'value', version=3)
+        kept_values.append({key: cache.peek(key)[0] for key in ('invalidated', 'replicated', 'current') if key in cache.hash_map})
+    try:
+        assert kept_values == [{'current': 'value'}] * 2
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected only the put of a version newer than the updates to be cached, got {}).".format(kept_values))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_revalidation_Proxy():
+    print("Test name:\ntest revalidation Proxy\n")
+    max_size = 5
+    max_age = 86400
+    ttl = 0.1
+    large_value = 'x' * 10000
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating mock origins with a single proxy (with a LRUCache, and with a ShardedLRUCache) on a manual clock, and putting a large value with a time to live of {} seconds through each proxy.".format(ttl))
+    coordinates = (45.5, -73.6)
+    clock = ManualClock()
+    proxies = []
+    for num_shards in (1, 4):
+        origin = Origin(MockDatabase(), max_size, max_age, 60, num_shards_of_LRUCache=num_shards, max_bytes_of_LRUCache=max_size * len(large_value) * 2 if num_shards > 1 else None, clock_of_LRUCache=clock) # the bytes saved are counted whether or not the values are weighed by every put
+        origin._set_potential_servers({coordinates: None})
+        proxy = origin._add_proxy(coordinates)
+        proxy.put('large', large_value, ttl=ttl)
+        proxies.append(proxy)
+
+    print("Advancing the clock {} seconds for the values to expire.".format(ttl))
+    clock.advance(ttl)
+
+    print("Checking whether the expired values are revalidated without querying the database", end=' ')
+    try:
+        for proxy in proxies:
+            assert proxy.get('large') == large_value
+            assert proxy.origin.database.queries == 0
+            assert proxy.LRUCache.cache_info().revalidations == 1
+            assert proxy.LRUCache.cache_info().saved_bytes >= len(large_value)
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a not modified revalidation saving at least {} bytes).".format(len(large_value)))
+
+    print("Checking whether expired values modified since are retrieved again", end=' ')
+    for proxy in proxies:
+        proxy.origin.put('large', 'modified')
+    clock.advance(ttl)
+    try:
+        for proxy in proxies:
+            assert proxy.get('large') == 'modified'
+            assert proxy.origin.database.queries == 1
+            assert proxy.LRUCache.cache_info().revalidations == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the modified values to be retrieved from the database).")
+
+    print("Checking whether the database and the version of a key hold the same put when a slow put of the key is overtaken by another one", end=' ')
+    racing_origin = create_mock_origin(max_size, max_age, [])
+    put_in_table = racing_origin.database.put
+    put_started, put_released = threading.Event(), threading.Event()
+    def put(key, value): # named as the method it replaces, for the metrics of the origin
+        if (value == 'slow'):
+            put_started.set()
+            put_released.wait()
+        put_in_table(key, value)
+    racing_origin.database.put = put
+    slow_versions = []
+    slow_put = threading.Thread(target=lambda: slow_versions.append(racing_origin.put('key', 'slow')))
+    slow_put.start()
+    put_started.wait()
+    fast_versions = []
+    fast_put = threading.Thread(target=lambda: fast_versions.append(racing_origin.put('key', 'fast')))
+    fast_put.start()
+    fast_put.join(0.1) # the second put is held by the lock of the key until the slow put completes
+    put_released.set()
+    slow_put.join()
+    fast_put.join()
+    try:
+        assert racing_origin.database.table['key'] == 'fast'
+        assert slow_versions[0] < fast_versions[0]
+        assert racing_origin.revalidate('key', fast_versions[0]) == (False, None, fast_versions[0])
+        assert racing_origin.revalidate('key', slow_versions[0]) == (True, 'fast', fast_versions[0])
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the value and the version of the last put).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_peer_fetch_Proxy():
+    print("Test name:\ntest peer fetch Proxy\n")
+    max_size = 5
+    max_age = 86400
+    max_distance = 1000000 # metres
+    montreal, toronto, tokyo = (45.5, -73.6), (43.7, -79.4), (35.7, 139.7)
+
+    num_test_cases = 4
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with proxies in Montreal, Toronto and Tokyo, asking their peers within {} metres before the origin, and getting data through the proxy in Montreal.".format(max_distance))
+    origin = create_mock_origin(max_size, max_age, [montreal, toronto, tokyo])
+    origin.enable_peer_fetch(k=2, timeout=1, max_distance=max_distance)
+    database = origin.database
+    database.table.update(key='value', other_key='other value')
+    origin.get_nearest_proxy(montreal).get('key')
+    origin.get_nearest_proxy(montreal).get('other_key')
+
+    print("Checking whether a nearby proxy gets the data from its peer rather than from the origin", end=' ')
+    try:
+        assert origin.get_nearest_proxy(toronto).get('key') == 'value'
+        assert database.queries == 2
+        tiers = origin.get_nearest_proxy(toronto).tier_info()
+        assert tiers['local'] == (1, 0, None)
+        assert (tiers['peer'].requests, tiers['peer'].hits) == (1, 1)
+        assert tiers['origin'].requests == 0
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a peer hit, and no query to the database).")
+
+    print("Checking whether a distant proxy gets the data from the origin", end=' ')
+    try:
+        assert origin.get_nearest_proxy(tokyo).get('key') == 'value'
+        assert database.queries == 3
+        assert origin.get_nearest_proxy(tokyo).peer_fetcher.get_peers() == []
+        assert origin.get_nearest_proxy(tokyo).tier_info()['origin'].requests == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected no peers within {} metres).".format(max_distance))
+
+    print("Checking whether a reported proxy is no longer asked by its peers", end=' ')
+    origin.report_failure(montreal)
+    try:
+        assert origin.get_nearest_proxy(toronto).get('other_key') == 'other value'
+        assert database.queries == 4
+        assert origin.get_nearest_proxy(toronto).peer_fetcher.get_peers() == []
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the data to be retrieved from the origin).")
+
+    print("Checking whether data from a peer keeps the time to live it has left in the peer, and unversioned data of a peer is ignored", end=' ')
+    clock = ManualClock()
+    timed_origin = Origin(MockDatabase(), max_size, max_age, 60, clock_of_LRUCache=clock)
+    timed_origin._set_potential_servers({montreal: None, toronto: None})
+    montreal_proxy, toronto_proxy = timed_origin._add_proxy(montreal), timed_origin._add_proxy(toronto)
+    timed_origin.enable_peer_fetch(k=2, timeout=1, max_distance=max_distance)
+    timed_origin.database.table.update(key='value', unversioned='value')
+    montreal_proxy.get('key')
+    montreal_proxy.LRUCache.put('unversioned', 'unknown version') # e.g. put by a client of the proxy before push was enabled
+    clock.advance(max_age / 2)
+    try:
+        assert toronto_proxy.get('key') == 'value'
+        assert timed_origin.database.queries == 1
+        assert toronto_proxy.LRUCache.peek('key')[2] == max_age / 2
+        assert toronto_proxy.get('unversioned') == 'value'
+        assert timed_origin.database.queries == 2
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a time to live of {} seconds, and the unversioned data to be retrieved from the origin).".format(max_age / 2))
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_regional_Proxy():
+    print("Test name:\ntest regional Proxy\n")
+    max_size = 5
+    max_age = 86400
+    region_radius = 1000000 # metres
+    montreal, toronto, tokyo = (45.5, -73.6), (43.7, -79.4), (35.7, 139.7)
+
+    num_test_cases = 4
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with proxies in Montreal, Toronto and Tokyo grouped in regions of {} metres, and getting data through the proxy in Montreal.".format(region_radius))
+    origin = create_mock_origin(max_size, max_age, [montreal, toronto, tokyo])
+    origin.enable_regional_tier(region_radius)
+    database = origin.database
+    database.table.update(key='value')
+    origin.get_nearest_proxy(montreal).get('key')
+
+    print("Checking whether nearby proxies share a region, and a distant proxy has its own", end=' ')
+    try:
+        assert origin.get_nearest_proxy(montreal).region is origin.get_nearest_proxy(toronto).region
+        assert origin.get_nearest_proxy(montreal).region.members == {montreal, toronto}
+        assert origin.get_nearest_proxy(tokyo).region.members == {tokyo}
+        assert len(origin.regions) == 2
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected 2 regions).")
+
+    print("Checking whether a proxy gets the data missed by its cache from its region rather than from the origin", end=' ')
+    try:
+        assert origin.get_nearest_proxy(toronto).get('key') == 'value'
+        assert database.queries == 1
+        assert origin.get_nearest_proxy(tokyo).get('key') == 'value'
+        assert database.queries == 2
+        assert origin.get_nearest_proxy(toronto).region.LRUCache.cache_info().hits == 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a single query to the database per region).")
+
+    print("Checking whether a put through a proxy is served by the other proxies of its region once the value they hold expires", end=' ')
+    clock = ManualClock()
+    timed_origin = Origin(MockDatabase(), max_size, 60, 60, clock_of_LRUCache=clock)
+    timed_origin._set_potential_servers({montreal: None, toronto: None})
+    writer, sibling = timed_origin._add_proxy(montreal), timed_origin._add_proxy(toronto)
+    timed_origin.enable_regional_tier(region_radius)
+    timed_origin.database.table['key'] = 'value'
+    sibling.get('key')
+    writer.put('key', 'new value')
+    clock.advance(60)
+    try:
+        assert writer.region is sibling.region
+        assert sibling.get('key') == 'new value'
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the new value after the max age of the proxies).")
+
+    print("Checking whether a put invalidates the value held by the regions once pushed", end=' ')
+    bus = origin.enable_push()
+    origin.get_nearest_proxy(montreal).put('key', 'new value')
+    bus.flush()
+    try:
+        assert origin.get_nearest_proxy(tokyo).region.LRUCache.get('key') == 'new value'
+        assert origin.get_nearest_proxy(toronto).get('key') == 'new value'
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the new value).")
+    bus.close()
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_shared_LRUCache():
+    print("Test name:\ntest shared LRUCache\n")
+    if (SharedLRUCache is None):
+        print("Skipped, since the shared cache requires Python 3.8 or later.")
+        return
+    max_size = 5
+    max_age = 60
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a shared cache of size {} on a manual clock starting at the time of the other processes, and attaching another process to it.".format(max_size))
+    context = multiprocessing.get_context('spawn') # the cache is passed to the process by name, rather than inherited
+    clock = ManualClock(time.monotonic()) # only this process reads the manual clock, and the other process time.monotonic
+    cache = SharedLRUCache(max_size, max_age, lock=context.Lock(), clock=clock)
+    cache.put('key', 'value')
+    process = context.Process(target=put_through_shared_cache, args=(cache, 'other_key'))
+    process.start()
+    process.join()
+
+    print("Checking whether a value put by another process is read from the cache, and counted in the info of the whole cache", end=' ')
+    try:
+        assert process.exitcode == 0
+        assert cache.get('other_key') == 'value from another process'
+        assert (cache.cache_info().hits, cache.cache_info().misses, cache.size()) == (2, 0, 2)
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected 2 hits).")
+
+    print("Checking whether filling the cache evicts the entries not read since they were put rather than the ones read", end=' ')
+    for i in range(max_size - 1):
+        cache.put(i, 'value{}'.format(i))
+    cache.get('key')
+    try:
+        assert cache.get(0) == 'value0' # misses the key evicted, without a miss_callback
+    except KeyError:
+        pass
+    try:
+        assert cache.size() == max_size
+        assert cache.cache_info().evictions == 1
+        assert cache.get('key') == 'value'
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except (AssertionError, KeyError):
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected 'key' to be kept).")
+
+    print("Checking whether the entries expire after the max age", end=' ')
+    clock.advance(max_age)
+    try:
+        cache.get('key')
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    except KeyError:
+        if (cache.cache_info().expiries == 1):
+            print("passed", end=' ')
+            test_results['pass'] += 1
+        else:
+            print("failed", end=' ')
+            test_results['fail'] += 1
+    print("(expected a KeyError).")
+    cache.close()
+    cache.unlink()
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_transport_Proxy():
+    print("Test name:\ntest transport Proxy\n")
+    max_size = 50
+    max_age = 86400
+    montreal = (45.5, -73.6)
+
+    num_test_cases = 5
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin served on localhost, and a proxy connected to it by a pool of connections, itself served on localhost.")
+    origin = create_mock_origin(max_size, max_age, [], AsyncOrigin)
+    database = origin.database
+    database.table.update(zip(valid_keys, valid_values))
+    get_from_table = database.get
+    def get(key): # named as the method it replaces, for the metrics of the origin
+        if (key == 'broken'):
+            raise UnbuildableError(key, "cannot be read")
+        return get_from_table(key)
+    database.get = get
+
+    async def run_test_cases():
+        origin_server = OriginServer(origin)
+        host, port = await origin_server.start()
+        pool = ConnectionPool(host, port, size=2)
+        proxy = connect_proxy(AsyncProxy(montreal, AsyncLRUCache(max_size, max_age), None), pool)
+        proxy_server = ProxyServer(proxy)
+        client = await TransportClient(*await proxy_server.start()).connect()
+
+        print("Checking whether concurrent gets pipelined on a single connection return every value, with the requests batched", end=' ')
+        try:
+            values = await asyncio.gather(*(client.get(key) for key in valid_keys))
+            assert values == list(valid_values)
+            assert client.frame_writer.flushes < client.frame_writer.frames
+            assert database.queries == len(set(valid_keys))
+            print("passed", end=' ')
+            test_results['pass'] += 1
+        except AssertionError:
+            print("failed", end=' ')
+            test_results['fail'] += 1
+        print("(expected {} values).".format(len(valid_keys)))
+
+        print("Checking whether a put through the proxy server reaches the database through the origin server", end=' ')
+        await client.put('new', 'value')
+        try:
+            assert database.table['new'] == 'value'
+            assert await client.get_many(['new', 'missing']) == {'new': 'value'}
+            assert database.queries == len(set(valid_keys)) + 1 # the value put is cached by the proxy
+            print("passed", end=' ')
+            test_results['pass'] += 1
+        except AssertionError:
+            print("failed", end=' ')
+            test_results['fail'] += 1
+        print("(expected the value put).")
+
+        print("Checking whether the values round trip through the codec of the proxy server, which rejects pickled payloads rather than unpickling them", end=' ')
+        try:
+            assert VALUE_CODEC.loads(VALUE_CODEC.dumps((valid_keys, valid_values, -2**70, None, True, b'bytes'))) == (valid_keys, valid_values, -2**70, None, True, b'bytes')
+            try:
+                VALUE_CODEC.loads(pickle.dumps(('key',)))
+                assert False
+            except ValueError:
+                pass
+            print("passed", end=' ')
+            test_results['pass'] += 1
+        except AssertionError:
+            print("failed", end=' ')
+            test_results['fail'] += 1
+        print("(expected the same values, then a ValueError).")
+
+        print("Checking whether an error that cannot be built again is raised to the client by name, without breaking the connections", end=' ')
+        try:
+            try:
+                await asyncio.wait_for(client.get('broken'), 5)
+                assert False
+            except RemoteError as e:
+                assert e.type_name == 'UnbuildableError' and e.args[1:] == ("broken cannot be read",)
+            assert await asyncio.wait_for(client.get('new'), 5) == 'value'
+            assert await asyncio.wait_for(pool.get('a'), 5) == valid_values[valid_keys.index('a')]
+            print("passed", end=' ')
+            test_results['pass'] += 1
+        except (AssertionError, asyncio.TimeoutError):
+            print("failed", end=' ')
+            test_results['fail'] += 1
+        print("(expected a RemoteError, then the values).")
+
+        print("Checking whether errors are raised to the client, and the requests in flight fail once the server is closed", end=' ')
+        try:
+            try:
+                await client.get('missing')
+                assert False
+            except KeyError:
+                pass
+            await proxy_server.close()
+            try:
+                await client.get('new')
+                assert False
+            except ConnectionError:
+                pass
+            print("passed", end=' ')
+            test_results['pass'] += 1
+        except AssertionError:
+            print("failed", end=' ')
+            test_results['fail'] += 1
+        print("(expected a KeyError then a ConnectionError).")
+
+        await client.close()
+        await pool.close()
+        await origin_server.close()
+
+    asyncio.run(run_test_cases())
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_metrics_Origin():
+    print("Test name:\ntest metrics Origin\n")
+    max_size = 5
+    max_age = 86400
+    montreal, toronto = (45.5, -73.6), (43.7, -79.4)
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with proxies in Montreal and Toronto, with the proxy in Montreal hitting its cache long ago but missing it now, and the proxy in Toronto mostly hitting its cache now.")
+    origin = create_mock_origin(max_size, max_age, [montreal, toronto])
+    origin.database.table.update(key='value')
+    missing_now, hitting_now = origin.get_nearest_proxy(montreal), origin.get_nearest_proxy(toronto)
+    for _ in range(200):
+        missing_now.get('key')
+    missing_now.LRUCache.cache_rates()
+    missing_now.LRUCache.rate_meter.last_time -= 100 * missing_now.LRUCache.rate_meter.window # as if the rates were last read 100 windows ago
+    for i in range(20):
+        try:
+            missing_now.get('missing{}'.format(i))
+        except KeyError:
+            pass
+    for _ in range(10):
+        hitting_now.get('key')
+    hitting_now.get_many(['key', 'missing'])
+
+    print("Checking whether the rates of a cache only reflect its recent requests, unlike its counts", end=' ')
+    try:
+        assert (missing_now.LRUCache.cache_info().hits, missing_now.LRUCache.cache_info().misses) == (199, 21)
+        assert missing_now.LRUCache.cache_rates().hits < 0.01
+        assert missing_now.LRUCache.cache_rates().misses > 0
+        assert type(hitting_now.LRUCache.cache_info()) is type(missing_now.LRUCache.cache_info())
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a rate of hits of 0 for the proxy in Montreal).")
+
+    print("Checking whether the most stressed proxy is the one hitting its cache now once the stress is windowed", end=' ')
+    try:
+        assert origin._get_coordinates_of_stressed_proxy() == montreal
+        origin.enable_windowed_stress()
+        assert origin._get_coordinates_of_stressed_proxy() == toronto
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the proxy in Toronto).")
+
+    print("Checking whether the exported metrics hold the counts, the request latencies and the database latencies", end=' ')
+    metrics = origin.export_metrics()
+    try:
+        assert 'geolru_cache_hits_total{proxy="45.5,-73.6"} 199\n' in metrics
+        assert 'geolru_proxy_request_seconds_count{proxy="43.7,-79.4",operation="get"} 10\n' in metrics
+        assert 'geolru_proxy_request_seconds_bucket{proxy="43.7,-79.4",operation="get",le="+Inf"} 10\n' in metrics
+        assert 'geolru_proxy_fetch_seconds_count{proxy="45.5,-73.6"} 21\n' in metrics
+        assert 'geolru_origin_database_seconds_count{operation="get"} 22\n' in metrics
+        assert 'geolru_origin_database_seconds_count{operation="get_many"} 1\n' in metrics
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the metrics of both proxies).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_placement_Origin():
+    print("Test name:\ntest placement Origin\n")
+    max_size = 5
+    max_age = 86400
+    montreal, toronto = (45.5, -73.6), (43.7, -79.4)
+    paris, tokyo, sydney = (48.9, 2.4), (35.7, 139.7), (-33.9, 151.2)
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock origin with proxies in Montreal and Toronto, and potential servers in Paris, Tokyo and Sydney.")
+    origin = create_mock_origin(max_size, max_age, [montreal, toronto])
+    origin.enable_routing_table() # so that the clients routed are the demand of the placements
+    origin._set_potential_servers({paris: None, tokyo: None, sydney: None})
+    origin.database.table.update(key='value')
+
+    print("Checking whether the most stressed proxy is found from the ranking, and no longer once its stress dropped", end=' ')
+    montreal_proxy, toronto_proxy = origin.get_nearest_proxy(montreal), origin.get_nearest_proxy(toronto)
+    for _ in range(10):
+        montreal_proxy.get('key')
+    for _ in range(3):
+        toronto_proxy.get('key')
+    try:
+        assert origin._get_coordinates_of_stressed_proxy() == montreal
+        for i in range(10):
+            try:
+                montreal_proxy.get('missing{}'.format(i))
+            except KeyError:
+                pass
+        assert origin._get_coordinates_of_stressed_proxy() == toronto
+        assert len(origin.stress_ranking) == 2
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected the proxy in Montreal, then the proxy in Toronto).")
+
+    print("Checking whether the placements planned for clients routed from Paris and Tokyo are the potential servers there", end=' ')
+    for _ in range(3):
+        origin.get_nearest_proxy((48.8, 2.3))
+    origin.get_nearest_proxy((35.6, 139.8))
+    try:
+        assert origin.plan_placements(1) == [paris]
+        assert origin.plan_placements(3) == [paris, tokyo] # no client is nearer to Sydney than to the other placements
+        assert origin.plan_placements(2, [(sydney, 1)]) == [sydney]
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected Paris then Tokyo).")
+
+    print("Checking whether balancing the load with k placements adds proxies at the planned placements", end=' ')
+    placements = origin.balance_load(k=2)
+    try:
+        assert placements == [paris, tokyo]
+        assert origin.get_nearest_proxy((48.8, 2.3)).coordinates == paris
+        assert origin.get_nearest_proxy((35.6, 139.8)).coordinates == tokyo
+        assert list(origin.potential_servers) == [sydney]
+        assert len(origin.stress_ranking) == 4
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected proxies in Paris and Tokyo).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_storage_Database():
+    print("Test name:\ntest storage Database\n")
+    max_size = 5
+    max_age = 86400
+    directory = tempfile.mkdtemp()
+    databases = {
+        "a SQLite file": lambda: SQLiteDatabase(os.path.join(directory, 'items.sqlite')),
+        "an append-only log": lambda: LogDatabase(os.path.join(directory, 'items.log')),
+    }
+
+    num_test_cases = 2 * len(databases) + 1
+    test_results = {"pass": 0, "fail": 0}
+
+    for name, create_database in databases.items():
+        print("Creating a mock origin storing its items in {}.".format(name))
+        database = create_database()
+        origin = Origin(database, max_size, max_age, 60)
+
+        print("Checking whether the items put through the origin (one at a time and in bulk) are got back, and missing keys are not found", end=' ')
+        origin.put('key', 'value')
+        origin.put_many({i: 'value{}'.format(i) for i in range(1000)})
+        origin.put(1, 'new value1')
+        try:
+            assert origin.get('key') == 'value'
+            assert origin.get_many([1, 2, 'missing']) == {1: 'new value1', 2: 'value2'}
+            assert len(origin.get_many(range(1000))) == 1000
+            try:
+                origin.get('missing')
+                assert False
+            except KeyError:
+                pass
+            print("passed", end=' ')
+            test_results['pass'] += 1
+        except AssertionError:
+            print("failed", end=' ')
+            test_results['fail'] += 1
+        print("(expected the values put last).")
+
+        print("Checking whether the items are still in the database once it is opened again", end=' ')
+        database.close()
+        database = create_database()
+        try:
+            assert database.get_many(['key', 1, 999]) == {'key': 'value', 1: 'new value1', 999: 'value999'}
+            print("passed", end=' ')
+            test_results['pass'] += 1
+        except AssertionError:
+            print("failed", end=' ')
+            test_results['fail'] += 1
+        print("(expected the same values).")
+        database.close()
+
+    print("Checking whether the append-only log is compacted once mostly overwritten, and ignores a torn record", end=' ')
+    log_path = os.path.join(directory, 'compacted.log')
+    database = LogDatabase(log_path)
+    value = 'x' * 1000
+    for _ in range(3):
+        database.put_many({i: value for i in range(MIN_COMPACTION_BYTES // 2000)})
+    database.put('key', 'value')
+    compactions = database.compactions
+    database.close()
+    with open(log_path, 'ab') as log: # as if a put was appended during a crash
+        log.write(b'torn')
+    database = LogDatabase(log_path)
+    try:
+        assert compactions == 1
+        assert os.path.getsize(log_path) < MIN_COMPACTION_BYTES
+        assert database.get('key') == 'value' and database.get(0) == value
+        assert len(database.index) == MIN_COMPACTION_BYTES // 2000 + 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected a single compaction).")
+    database.close()
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_simulation_Origin():
+    print("Test name:\ntest simulation Origin\n")
+    parameters = dict(num_proxies=10, num_clients=200, num_keys=1000, num_requests=5000, request_rate=10)
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Simulating {} requests of {} clients to {} proxies, at {} requests per virtual second.".format(parameters['num_requests'], parameters['num_clients'], parameters['num_proxies'], parameters['request_rate']))
+    report = simulate(**parameters)
+
+    print("Checking whether the simulation runs on the virtual clock, and is repeatable", end=' ')
+    try:
+        assert 400 < report.virtual_seconds < 600
+        assert report.wall_seconds < report.virtual_seconds / 10
+        assert 0 < report.hit_ratio < 1 and report.origin_qps > 0 and 0 < report.p50 <= report.p99
+        assert simulate(**parameters)[4:9] == report[4:9] # the same hit ratio, origin QPS, latencies and failures
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected about 500 virtual seconds in far less wall clock time).")
+
+    print("Checking whether a shorter max age lowers the hit ratio and raises the load of the origin server", end=' ')
+    short_max_age_report = simulate(max_age=5, **parameters)
+    try:
+        assert short_max_age_report.hit_ratio < report.hit_ratio
+        assert short_max_age_report.origin_qps > report.origin_qps
+        assert short_max_age_report.virtual_seconds == report.virtual_seconds
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected more expiries with a max age of 5 virtual seconds).")
+
+    print("Checking whether the clients of failed proxies are assigned other proxies", end=' ')
+    failures_report = simulate(failures=3, **parameters)
+    try:
+        assert failures_report.failures == 3
+        assert failures_report.reassignments > 0
+        assert failures_report.virtual_seconds == report.virtual_seconds
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected 3 failed proxies).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test_clock_LRUCache():
+    print("Test name:\ntest clock LRUCache\n")
+    max_size = 5
+    max_age = 3600
+
+    num_test_cases = 3
+    test_results = {"pass": 0, "fail": 0}
+
+    print("Creating a mock cache with max size {} and max age {} reading a manual clock, and filling it to capacity with mock data.".format(max_size, max_age))
+    clock = ManualClock()
+    cache = LRUCache(max_size, max_age, clock=clock)
+    for i in range(max_size):
+        cache.put(i, 'value{}'.format(i))
+
+    print("Checking whether the data expires once the manual clock is advanced past the max age, without waiting", end=' ')
+    start = time.monotonic()
+    clock.advance(max_age - 1)
+    cache.get(0)
+    cache.put(1, 'new value1')
+    clock.advance(1)
+    misses = 0
+    for i in range(max_size):
+        try:
+            cache.get(i)
+        except KeyError:
+            misses += 1
+    try:
+        assert misses == max_size - 1 # only the data put again is still valid
+        assert cache.get(1) == 'new value1'
+        assert cache.cache_info().expiries == max_size - 1
+        assert time.monotonic() - start < 1
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected {} of the {} keys to have expired).".format(max_size - 1, max_size))
+
+    print("Checking whether the rates of the cache are measured on its clock", end=' ')
+    cache.cache_rates()
+    clock.advance(600)
+    for _ in range(1200):
+        cache.get(1)
+    try:
+        assert abs(cache.cache_rates().hits - 2) < 0.1 # 1200 hits over 600 seconds of the clock (10 windows of the rates), however long they took
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    print("(expected about 2 hits per second).")
+
+    print("Checking whether a coarse clock follows time.monotonic within a few of its ticks", end=' ')
+    coarse_clock = CoarseClock(0.01)
+    first_time = coarse_clock.now()
+    time.sleep(0.1)
+    coarse_cache = LRUCache(max_size, 0.05, clock=coarse_clock)
+    coarse_cache.put('key', 'value')
+    was_cached = coarse_cache.get('key') == 'value'
+    time.sleep(0.1)
+    try:
+        assert coarse_clock.now() > first_time
+        assert 0 <= time.monotonic() - coarse_clock.now() < 0.1
+        assert was_cached
+        try:
+            coarse_cache.get('key')
+            assert False
+        except KeyError:
+            pass
+        print("passed", end=' ')
+        test_results['pass'] += 1
+    except AssertionError:
+        print("failed", end=' ')
+        test_results['fail'] += 1
+    coarse_clock.stop()
+    print("(expected the data put in a cache reading the coarse clock to expire after 0.05 seconds).")
+
+    assert test_results["pass"] + test_results["fail"] == num_test_cases # ensure all tests have been completed
+    print("\nTest results:\n{} completed, {} failed".format(num_test_cases, test_results["fail"])) # display results
+
+def test():
+    test_create_LRUCache()
+    print('\n')
+    test_IO_LRUCache()
+    print('\n')
+    test_MRU_LRUCache()
+    print('\n')
+    test_eviction_LRUCache()
+    print('\n')
+    test_capacity_LRUCache()
+    print('\n')
+    test_expiry_LRUCache()
+    print('\n')
+    test_compact_LRUCache()
+    print('\n')
+    test_sweep_LRUCache()
+    print('\n')
+    test_sharded_LRUCache()
+    print('\n')
+    test_bulk_Proxy()
+    print('\n')
+    test_coalescing_ShardedLRUCache()
+    print('\n')
+    test_async_Proxy()
+    print('\n')
+    test_max_bytes_LRUCache()
+    print('\n')
+    test_admission_LRUCache()
+    print('\n')
+    test_stale_while_revalidate_LRUCache()
+    print('\n')
+    test_snapshot_Proxy()
+    print('\n')
+    test_spatial_Origin()
+    print('\n')
+    test_bulk_routing_Origin()
+    print('\n')
+    test_routing_table_Origin()
+    print('\n')
+    test_write_behind_Origin()
+    print('\n')
+    test_push_Origin()
+    print('\n')
+    test_revalidation_Proxy()
+    print('\n')
+    test_peer_fetch_Proxy()
+    print('\n')
+    test_regional_Proxy()
+    print('\n')
+    test_shared_LRUCache()
+    print('\n')
+    test_transport_Proxy()
+    print('\n')
+    test_metrics_Origin()
+    print('\n')
+    test_placement_Origin()
+    print('\n')
+    test_storage_Database()
+    print('\n')
+    test_simulation_Origin()
+    print('\n')
+    test_clock_LRUCache()
 
 def main():
     test()
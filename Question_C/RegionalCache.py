@@ -0,0 +1,55 @@
+from typing import Any, Hashable, Iterable, List, Tuple
+
+from ShardedLRUCache import ShardedLRUCache
+from InvalidationBus import Update
+
+REGION_RADIUS = 500000 # metres from the center of a region within which a new proxy joins the region
+REGIONAL_SIZE_FACTOR = 10 # a regional cache holds this many times more values than the caches of its proxies, by default
+REGIONAL_AGE_FACTOR = 4 # and keeps them this many times longer
+REGIONAL_SHARDS = 16
+
+class RegionalCache:
+    '''
+    A mid-tier cache between the proxies of a region and the origin server, so that the misses of the proxies of a region are served by a single larger and longer lived cache, and the load on the origin server grows with the number of regions rather than with the number of proxies.
+
+    A region is centered on the coordinates of the first proxy deployed in it, and holds the proxies deployed within the region radius of its center (see Origin.enable_regional_tier).
+    The RegionalCache has the same get, get_many and revalidate methods as the origin server, so that it can replace the origin server as the callbacks of the LRUCache of its proxies.
+    Its own LRUCache is a thread-safe ShardedLRUCache (since it is shared by the proxies of the region), whose misses go to the origin server.
+
+    The values put through a proxy of the region are invalidated in the RegionalCache (see invalidate), so that the other proxies of the region retrieve them from the origin server once the values they hold expire.
+    A value put through a proxy of another region may however already be up to the max age of the RegionalCache old when a proxy retrieves it, so a proxy may serve it for up to the sum of both max ages after it was put (unless push is enabled on the origin server, which updates the RegionalCache as well).
+    '''
+    def __init__(self, coordinates : Tuple[float, float], LRUCache : ShardedLRUCache, origin):
+        self.coordinates = coordinates
+        self.origin = origin
+        self.LRUCache = LRUCache
+        self.members = set() # coordinates of the proxies of the region
+
+        self.LRUCache.set_miss_callback(origin.get)
+        self.LRUCache.set_bulk_miss_callback(origin.get_many)
+        self.LRUCache.set_revalidate_callback(origin.revalidate)
+
+    def get(self, key : Hashable):
+        return self.LRUCache.get(key)
+
+    def get_many(self, keys : List[Hashable]):
+        return self.LRUCache.get_many(keys)
+
+    def invalidate(self, keys : Iterable[Hashable], version : int):
+        '''
+        Invalidates the values of the keys put through a proxy of the region with the given version, as an update published by the origin server would (so that a value older than the version retrieved meanwhile is not cached either).
+        '''
+        self.LRUCache.receive([Update(key, version, None, True) for key in keys])
+
+    def revalidate(self, key : Hashable, version : int) -> Tuple[bool, Any, int]:
+        '''
+        Returns (False, None, version) if the value held by the RegionalCache (retrieving it from the origin server if needed) has the given version, otherwise (True, value, version of the value), as the revalidate method of the origin server.
+        '''
+        value = self.LRUCache.get(key)
+        try:
+            _, current_version, _ = self.LRUCache.peek(key)
+        except KeyError: # the value was evicted already
+            current_version = 0
+        if (version != 0 and current_version == version):
+            return False, None, version
+        return True, value, current_version
@@ -0,0 +1,104 @@
+from collections import namedtuple, OrderedDict
+from typing import Dict, List, Tuple
+
+from SpatialIndex import SpatialIndex
+from utils import distance, geohash, geohash_center
+
+ROUTING_PRECISION = 6 # number of geohash digits of the cells of the routing table, each about 1.2 km by 0.6 km
+ROUTING_MAX_CELLS = 2**16 # cells held by the routing table (and cells whose requests are counted), so that clients from all over the globe do not grow it without bound
+
+RoutingInfo = namedtuple('RoutingInfo', 'hits misses invalidations curr_size evictions')
+
+class RoutingTable:
+    '''
+    A memoized table of the nearest proxy to each cell of a geohash grid, so that the many clients requesting their nearest proxy from the same area (e.g. from the same city) are routed by a dict lookup instead of a search of the spatial index of the proxies.
+
+    The coordinates of a client are quantized to the geohash of the cell containing them, and every client in a cell is routed to the proxy nearest to the center of the cell (so a client in a cell on the boundary between two proxies may be routed to the farther of the two, by at most the size of a cell).
+    A cell missed by the table is routed by a search of the spatial index, and its nearest proxy and the distance to it are stored in the table.
+    The table holds at most max cells cells, evicting the least recently routed cell once full, and the requests are only counted for the max cells cells most recently requested from.
+
+    When a proxy is added or removed, only the cells whose nearest proxy changes are invalidated: the cells of a removed proxy, and the cells nearer to an added proxy than to their current proxy.
+    By the triangle inequality, a cell can only be nearer to an added proxy than to its current proxy if the two proxies are less than twice the distance of the cell apart, so only the cells of the proxies within twice the distance of their farthest cell are checked.
+    '''
+    def __init__(self, proxy_index : SpatialIndex, precision : int = ROUTING_PRECISION, max_cells : int = ROUTING_MAX_CELLS):
+        if (max_cells <= 0):
+            raise ValueError(max_cells)
+        self.proxy_index = proxy_index
+        self.precision = precision
+        self.max_cells = max_cells
+        self.cells = OrderedDict() # of the form {cell: (coordinates of nearest proxy, distance from center of cell to proxy), ...}
+        self.cells_of_proxies : Dict[Tuple[float, float], set] = dict() # of the form {coordinates of proxy: {cell, ...}, ...}
+        self.radii = dict() # of the form {coordinates of proxy: distance to its farthest cell, ...}, which may overestimate the distance once cells are invalidated
+        self.hits, self.misses, self.invalidations, self.evictions = 0, 0, 0, 0
+        self.requests = OrderedDict() # of the form {cell: number of clients routed from the cell, ...}, the demand of the clients by location
+
+    def nearest(self, request_coordinates : Tuple[float, float]) -> Tuple[float, float]:
+        '''
+        Returns the coordinates of the proxy nearest to the cell containing the coordinates.
+        '''
+        cell = geohash(request_coordinates, self.precision)
+        self.requests[cell] = self.requests.get(cell, 0) + 1
+        self.requests.move_to_end(cell)
+        if (len(self.requests) > self.max_cells):
+            self.requests.popitem(last=False)
+
+        route = self.cells.get(cell)
+        if (route is not None):
+            self.hits += 1
+            self.cells.move_to_end(cell)
+            return route[0]
+
+        self.misses += 1
+        center = geohash_center(cell)
+        proxy_coordinates = self.proxy_index.nearest(center)[0]
+        distance_to_proxy = distance(center, proxy_coordinates)
+        self.cells[cell] = (proxy_coordinates, distance_to_proxy)
+        self.cells_of_proxies.setdefault(proxy_coordinates, set()).add(cell)
+        self.radii[proxy_coordinates] = max(self.radii.get(proxy_coordinates, 0), distance_to_proxy)
+        if (len(self.cells) > self.max_cells):
+            self._discard(next(iter(self.cells)))
+            self.evictions += 1
+        return proxy_coordinates
+
+    def add(self, proxy_coordinates : Tuple[float, float]):
+        '''
+        Called once a proxy was added to the spatial index, to invalidate the cells that are nearer to the added proxy than to their current proxy.
+        '''
+        for coordinates, radius in list(self.radii.items()):
+            if (distance(coordinates, proxy_coordinates) >= 2 * radius): # no cell of this proxy can be nearer to the added proxy
+                continue
+            for cell in list(self.cells_of_proxies[coordinates]):
+                if (distance(geohash_center(cell), proxy_coordinates) < self.cells[cell][1]):
+                    self._invalidate(cell)
+
+    def remove(self, proxy_coordinates : Tuple[float, float]):
+        '''
+        Called once a proxy was removed from the spatial index, to invalidate its cells.
+        '''
+        for cell in list(self.cells_of_proxies.get(proxy_coordinates, ())):
+            self._invalidate(cell)
+
+    def demand(self) -> List[Tuple[Tuple[float, float], int]]:
+        '''
+        Returns the (coordinates of the center, number of clients routed) of every cell from which clients were routed, as the demand of the clients by location.
+        '''
+        return [(geohash_center(cell), count) for cell, count in self.requests.items()]
+
+    def info(self):
+        return RoutingInfo(self.hits, self.misses, self.invalidations, len(self.cells), self.evictions)
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def _invalidate(self, cell : str):
+        self._discard(cell)
+        self.invalidations += 1
+
+    def _discard(self, cell : str):
+        proxy_coordinates, _ = self.cells.pop(cell)
+        cells_of_proxy = self.cells_of_proxies[proxy_coordinates]
+        cells_of_proxy.discard(cell)
+        if (len(cells_of_proxy) == 0):
+            del self.cells_of_proxies[proxy_coordinates]
+            del self.radii[proxy_coordinates]
@@ -0,0 +1,100 @@
+import pickle
+import sqlite3
+import threading
+from typing import Any, Dict, Hashable, Iterable, Tuple, Union
+
+from Database import Database
+
+MAX_VARIABLES = 999 # parameters of a single statement, the lowest limit of the SQLite versions in use, so get_many queries at most this many keys at once
+CACHED_STATEMENTS = 256 # prepared statements kept by the connection, enough for the statements of get_many with every number of keys of its last chunk
+
+class SQLiteDatabase(Database):
+    '''
+    A database storing the items in a table of a SQLite file, with the keys and values pickled (so equal keys must pickle to the same bytes, as ints, strs, bytes and tuples of them do).
+
+    The file is in write-ahead logging (WAL) mode with synchronous set to NORMAL, so that a write appends to the log rather than rewriting pages of the file, and is only synced to disk at checkpoints (a crash of the process loses nothing, a crash of the machine may lose the last transactions).
+    Every query is a fixed statement with parameters, prepared once and kept in the statement cache of the connection, so that SQL is not parsed again for every get and put.
+    get_many queries the keys in chunks of at most MAX_VARIABLES keys with a single statement each, and put_many writes all of its items in a single transaction.
+    Single puts are committed in transactions of batch size puts (1 by default, i.e. every put is committed when acknowledged), so that a larger batch size trades the durability of the last puts for fewer commits; the puts of an open transaction are visible to the gets of this database but not to other connections to the file until committed, and are rolled back with a write that fails.
+
+    The connection is shared by the threads calling the database (e.g. the proxies of the origin server), serialized by a lock.
+    '''
+    def __init__(self, path : str, batch_size : int = 1):
+        if (batch_size <= 0):
+            raise ValueError(batch_size)
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.uncommitted = 0 # puts of the open transaction
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=CACHED_STATEMENTS) # transactions are begun and committed explicitly
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS items (key BLOB PRIMARY KEY, value BLOB NOT NULL) WITHOUT ROWID')
+
+    def get(self, key : Hashable):
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM items WHERE key = ?', (self._dumps(key),)).fetchone()
+        if (row is None):
+            raise KeyError(key)
+        return pickle.loads(row[0])
+
+    def put(self, key : Hashable, value : Any):
+        row = (self._dumps(key), self._dumps(value))
+        with self.lock:
+            if (self.uncommitted == 0):
+                self.connection.execute('BEGIN')
+            try:
+                self.connection.execute('INSERT OR REPLACE INTO items (key, value) VALUES (?, ?)', row)
+            except Exception:
+                self._rollback()
+                raise
+            self.uncommitted += 1
+            if (self.uncommitted >= self.batch_size):
+                self._commit()
+
+    def get_many(self, keys : Iterable[Hashable]):
+        keys_by_bytes = {self._dumps(key): key for key in keys}
+        encoded_keys = list(keys_by_bytes)
+        values = dict()
+        with self.lock:
+            for start in range(0, len(encoded_keys), MAX_VARIABLES):
+                chunk = encoded_keys[start : start + MAX_VARIABLES]
+                rows = self.connection.execute('SELECT key, value FROM items WHERE key IN ({})'.format(', '.join('?' * len(chunk))), chunk)
+                for encoded_key, value in rows:
+                    values[keys_by_bytes[encoded_key]] = pickle.loads(value)
+        return values
+
+    def put_many(self, items : Union[Dict[Hashable, Any], Iterable[Tuple[Hashable, Any]]]):
+        rows = [(self._dumps(key), self._dumps(value)) for key, value in (items.items() if isinstance(items, dict) else items)]
+        with self.lock:
+            if (self.uncommitted == 0):
+                self.connection.execute('BEGIN')
+            try:
+                self.connection.executemany('INSERT OR REPLACE INTO items (key, value) VALUES (?, ?)', rows)
+            except Exception:
+                self._rollback()
+                raise
+            self._commit() # the puts batched before are committed with the items
+
+    def commit(self):
+        '''
+        Commits the puts of the open transaction, if any.
+        '''
+        with self.lock:
+            if (self.uncommitted > 0):
+                self._commit()
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def _commit(self):
+        self.connection.execute('COMMIT')
+        self.uncommitted = 0
+
+    def _rollback(self):
+        self.connection.execute('ROLLBACK')
+        self.uncommitted = 0
+
+    def _dumps(self, obj : Any) -> bytes:
+        return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
@@ -0,0 +1,237 @@
+import threading
+import time
+from typing import Callable, Hashable, Any, Dict, Iterable, List, Tuple, Union
+
+from LRUCache import LRUCache, fetch_many
+from utils import serialized_size
+from AdmissionPolicy import AdmissionPolicy
+from SingleFlight import SingleFlight
+from Metrics import LatencyHistogram, RateMeter, CacheRates
+from Clock import Clock
+
+class ShardedLRUCache:
+    """
+    Implementation of a thread-safe Least Recently Used Cache with the same get, put and cache_info interface as the LRUCache, that can be shared by the threads of a thread pool serving a Proxy instance.
+
+    The keyspace is split across a number of shards, where each shard is an independant LRUCache instance (with its own DLL, hash map and cache performance info) guarded by its own lock, and each key is always stored in the shard selected by the hash of the key.
+    Threads operating on keys of different shards never wait on each other, so contention on the locks decreases as the number of shards increases, instead of every operation funneling through a single global lock.
+    The maximum size (and maximum bytes) of the cache is split evenly between the shards, so the LRU order (and evictions) are maintained per shard rather than across the whole cache.
+    Likewise, each shard has its own admission policy, created by calling the admission_policy argument (e.g. the TinyLFU class) with the maximum size of the shard, whereas the clock is shared by every shard.
+
+    When a get method call misses, the miss_callback is called after releasing the lock of the shard, so that a slow retrieval from the origin server does not block other threads operating on the same shard.
+    Stale nodes (see the stale-while-revalidate window of the LRUCache) are refreshed in the background by each shard, and the refreshed values are applied under the lock of the shard by its next operation.
+    Concurrent misses on the same key are coalesced, so that only one thread calls the miss_callback for that key while the others wait for its value (or its error).
+    Likewise, the keys missed by a get_many method call in all of the shards are retrieved with a single call to the bulk_miss_callback once the locks of the shards have been released.
+
+    The cache performance info of the ShardedLRUCache combines the cache performance info of all of its shards.
+    """
+    def __init__(self, max_size : int = 1000, max_age : int = 86400, miss_callback : Callable[[Hashable], Any] = None, num_shards : int = 16, sweep_expired : bool = False, max_bytes : int = None, weigher : Callable[[Any], int] = serialized_size,
+                 admission_policy : Callable[[int], AdmissionPolicy] = None, stale_while_revalidate : float = 0, clock : Clock = None):
+        if (num_shards <= 0):
+            raise ValueError(num_shards)
+        if (max_size < num_shards): # each shard must hold at least one Node
+            raise ValueError(max_size)
+        if (max_bytes is not None and max_bytes < num_shards):
+            raise ValueError(max_bytes)
+
+        self.max_size = max_size
+        self.max_age = max_age
+        self.shards = []
+        for i in range(num_shards):
+            max_size_of_shard = max_size // num_shards + (1 if i < max_size % num_shards else 0)
+            self.shards.append(LRUCache(max_size_of_shard, max_age, sweep_expired=sweep_expired,
+                                        max_bytes=None if max_bytes is None else max_bytes // num_shards + (1 if i < max_bytes % num_shards else 0), weigher=weigher,
+                                        admission_policy=None if admission_policy is None else admission_policy(max_size_of_shard), stale_while_revalidate=stale_while_revalidate, clock=clock))
+        self.locks = [threading.Lock() for _ in range(num_shards)]
+        self.sweeper = None
+        self.single_flight = SingleFlight()
+        self.fetch_latency = LatencyHistogram() # misses are retrieved by the ShardedLRUCache rather than by the shards
+        self.rate_meter = RateMeter(len(CacheRates._fields), clock=clock)
+        for shard in self.shards: # misses and background refreshes of stale nodes are coalesced across all the shards
+            shard.single_flight = self.single_flight
+
+        self.miss_callback = None
+        self.bulk_miss_callback = None
+        self.revalidate_callback = None
+        if (miss_callback is not None):
+            self.set_miss_callback(miss_callback)
+
+    def set_miss_callback(self, miss_callback : Callable[[Hashable], Any]):
+        """Public method to set the callback function that will be used by the ShardedLRUCache instance when a get method call on itself fails (i.e. cache miss), as in the LRUCache."""
+        if callable(miss_callback):
+            self.miss_callback = miss_callback
+            for shard in self.shards: # the shards only call the miss_callback to refresh stale nodes in the background, misses are handled by the ShardedLRUCache outside of the locks
+                shard.set_miss_callback(miss_callback)
+        else:
+            raise ValueError("callback argument " + str(miss_callback) + " must be callable.")
+
+    def set_bulk_miss_callback(self, bulk_miss_callback : Callable[[List[Hashable]], Dict[Hashable, Any]]):
+        """Public method to set the callback function that will be used by the ShardedLRUCache instance when a get_many method call on itself misses some of the keys, as in the LRUCache."""
+        if callable(bulk_miss_callback):
+            self.bulk_miss_callback = bulk_miss_callback
+        else:
+            raise ValueError("callback argument " + str(bulk_miss_callback) + " must be callable.")
+
+    def set_revalidate_callback(self, revalidate_callback : Callable[[Hashable, int], Tuple[bool, Any, int]]):
+        """Public method to set the callback function that will be used by the ShardedLRUCache instance (instead of the miss_callback) when a get method call on itself misses, as in the LRUCache."""
+        if callable(revalidate_callback):
+            self.revalidate_callback = revalidate_callback
+            for shard in self.shards:
+                shard.set_revalidate_callback(revalidate_callback)
+        else:
+            raise ValueError("callback argument " + str(revalidate_callback) + " must be callable.")
+
+    def get(self, key : Hashable):
+        shard_index = self._shard_index(key)
+        shard = self.shards[shard_index]
+        with self.locks[shard_index]:
+            try:
+                shard.sweep()
+                return shard._get_cached(key) # a miss raises KeyError, without calling the miss_callback of the shard
+            except KeyError:
+                if (self.miss_callback is None):
+                    raise
+                expired_node = shard._pop_expired(key)
+                tombstone = shard.tombstones.get(key) # the latest update of the key published before the miss
+
+        start = time.perf_counter()
+        if (self.revalidate_callback is not None):
+            try:
+                result = self.single_flight.do(key, shard._revalidator(expired_node)) # outside of the lock of the shard
+            except TypeError: # callback did not have the right signature
+                raise KeyError(key)
+            finally:
+                self.fetch_latency.record(time.perf_counter() - start)
+            with self.locks[shard_index]:
+                return shard._put_revalidated(key, result, expired_node, tombstone)
+
+        try:
+            value = self.single_flight.do(key, self.miss_callback) # outside of the lock of the shard
+        except TypeError: # callback did not have the right signature
+            raise KeyError(key)
+        finally:
+            self.fetch_latency.record(time.perf_counter() - start)
+
+        with self.locks[shard_index]:
+            shard._put_fetched(key, value, tombstone=tombstone)
+        return value
+
+    def peek(self, key : Hashable) -> Tuple[Any, int, float]:
+        return self.shards[self._shard_index(key)].peek(key) # does not modify the shard, so it needs no lock
+
+    def put(self, key : Hashable, value : Any, ttl : float = None, version : int = 0):
+        shard_index = self._shard_index(key)
+        with self.locks[shard_index]:
+            self.shards[shard_index].put(key, value, ttl, version)
+
+    def get_many(self, keys : Iterable[Hashable]) -> Dict[Hashable, Any]:
+        '''
+        Returns a dict of each of the given keys to its value as in the LRUCache, locking each shard once for all of its keys.
+        '''
+        keys = list(keys) # the keys are iterated twice
+        values = dict()
+        tombstones = dict() # of the form {missed key: the latest update of the key published before the miss, ...}
+        for shard_index, keys_of_shard in self._group_by_shard((key, None) for key in keys).items():
+            with self.locks[shard_index]:
+                self.shards[shard_index].sweep()
+                for key, _ in keys_of_shard:
+                    try:
+                        values[key] = self.shards[shard_index]._get_cached(key)
+                    except KeyError: # missed keys are left out, without calling the callbacks of the shard
+                        tombstones[key] = self.shards[shard_index].tombstones.get(key)
+
+        missed_keys = [key for key in keys if key not in values]
+        if (len(missed_keys) > 0):
+            start = time.perf_counter()
+            fetched_values = fetch_many(missed_keys, self.miss_callback, self.bulk_miss_callback) # outside of the locks of the shards
+            self.fetch_latency.record(time.perf_counter() - start)
+            for shard_index, items_of_shard in self._group_by_shard(fetched_values.items()).items():
+                with self.locks[shard_index]:
+                    for key, value in items_of_shard:
+                        self.shards[shard_index]._put_fetched(key, value, tombstone=tombstones.get(key))
+            values.update(fetched_values)
+        return values
+
+    def put_many(self, items : Union[Dict[Hashable, Any], Iterable[Tuple[Hashable, Any]]], ttl : float = None, version : int = 0):
+        '''
+        Puts each of the given items (a dict, or an iterable of key-value pairs) in the cache, locking each shard once for all of its items.
+        '''
+        for shard_index, items_of_shard in self._group_by_shard(items.items() if isinstance(items, dict) else items).items():
+            with self.locks[shard_index]:
+                self.shards[shard_index].put_many(items_of_shard, ttl, version)
+
+    def receive(self, updates : Iterable):
+        '''
+        Receives a batch of versioned updates published by the origin server, queuing each update in its shard to be applied by the next operation on the shard.
+        '''
+        updates_of_shards = dict()
+        for update in updates:
+            updates_of_shards.setdefault(self._shard_index(update.key), []).append(update)
+        for shard_index, updates_of_shard in updates_of_shards.items():
+            self.shards[shard_index].receive(updates_of_shard)
+
+    def sweep(self):
+        '''
+        Removes every Node that has expired from each shard (only if the ShardedLRUCache was initialized with sweep_expired), locking one shard at a time.
+        Returns the number of Nodes removed.
+        '''
+        removed = 0
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                removed += shard.sweep()
+        return removed
+
+    def start_sweeper(self, interval : float):
+        '''
+        Starts a daemon thread that calls the sweep method every interval seconds, so expired Nodes are removed even from shards that receive no requests.
+        '''
+        if (self.sweeper is not None):
+            raise RuntimeError("sweeper already started")
+
+        def sweep_periodically():
+            while not self.sweeper_stopped.wait(interval):
+                self.sweep()
+
+        self.sweeper_stopped = threading.Event()
+        self.sweeper = threading.Thread(target=sweep_periodically, daemon=True)
+        self.sweeper.start()
+
+    def stop_sweeper(self):
+        if (self.sweeper is not None):
+            self.sweeper_stopped.set()
+            self.sweeper.join()
+            self.sweeper = None
+
+    def snapshot_items(self):
+        '''
+        Returns a list of (key, value, remaining time to live) tuples for every Node that has not expired, locking one shard at a time, in the LRU to MRU order of each shard.
+        '''
+        items = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                items.extend(shard.snapshot_items())
+        return items
+
+    def size(self):
+        return sum(shard.size() for shard in self.shards)
+
+    def cache_info(self):
+        shard_infos = []
+        for shard, lock in zip(self.shards, self.locks):
+            with lock:
+                shard_infos.append(shard.cache_info())
+        cache_info = shard_infos[0]._replace(**{field: sum(getattr(shard_info, field) for shard_info in shard_infos) for field in shard_infos[0]._fields if field not in ('max_age', 'max_bytes')}) # every shard has the same max age
+        cache_info = cache_info._replace(max_bytes=None if cache_info.max_bytes is None else sum(shard_info.max_bytes for shard_info in shard_infos))
+        return cache_info._replace(coalesced=self.single_flight.coalesced) # misses are coalesced across the shards rather than by each shard
+
+    def cache_rates(self):
+        return LRUCache.cache_rates(self) # the rates of the combined cache performance info of the shards
+
+    def _shard_index(self, key : Hashable):
+        return hash(key) % len(self.shards)
+
+    def _group_by_shard(self, items : Iterable[Tuple[Hashable, Any]]):
+        items_by_shard = dict() # of the form {shard_index: [(key, value), ...], ...}
+        for key, value in items:
+            items_by_shard.setdefault(self._shard_index(key), []).append((key, value))
+        return items_by_shard
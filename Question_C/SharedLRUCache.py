@@ -0,0 +1,328 @@
+import hashlib
+import multiprocessing
+import pickle
+import struct
+from array import array
+from multiprocessing import shared_memory
+from typing import Callable, Hashable, Any, Iterable, Tuple
+
+from Clock import Clock
+from LRUCache import LRUCache
+
+MAGIC = b'LRUSHM\x00\x01'
+HEADER = struct.Struct('<8sIIQd') # magic, max size, number of buckets, arena size and max age of the cache, followed by the counters
+COUNTERS = 10 # number of unsigned 64 bit counters after the header
+HITS, MISSES, EVICTIONS, EXPIRIES, CURR_SIZE, HAND, ALLOCATED, FREE, ARENA_TOP, LIVE_BYTES = range(COUNTERS)
+
+EMPTY = -1 # marks an empty bucket of the hash table
+NO_SLOT = 2**64 - 1 # marks the end of the free list, in the unsigned FREE counter
+ARENA_FACTOR = 1024 # bytes of arena per slot, by default
+
+def _align(offset : int):
+    return (offset + 7) & ~7
+
+def _open_shared_memory(name : str):
+    '''
+    Attaches to the block of shared memory with the given name, without tracking it (so that the block is not unlinked when this process exits) where supported (Python 3.13 onwards).
+    Before 3.13, the block is tracked by the resource tracker of this process, which is shared with the creator if this process was started by the creator with multiprocessing, so that the block is only unlinked once the creator unlinked it or exited.
+    '''
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name)
+
+def _hash(key_bytes : bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key_bytes, digest_size=8).digest(), 'little') # the same in every process, unlike the built-in hash of strings
+
+class SharedLRUCache(LRUCache):
+    """
+    Implementation of the Least Recently Used Cache with the same get, put and cache_info interface as the LRUCache, but stored in a block of shared memory that several processes attach to as a single cache,
+        so that the worker processes of a proxy host share one copy of the hot set instead of each holding its own.
+
+    The block of shared memory holds, after a header with the parameters of the cache and its counters (so that cache_info reports on the cache as a whole, across processes):
+        a hash table of buckets, each holding the index of a slot or EMPTY, with linear probing (and backward shift deletion, so that there are no tombstones to clean up),
+        a fixed number of slots (the max size of the cache), held in parallel arrays of the hash of the key, the offset and lengths of the entry in the arena, the expiry time, the version and the referenced bit of each slot,
+        and a byte arena in which the serializations of the key and value of each entry are allocated.
+    Keys and values are serialized with pickle, so keys are compared by their serialization (e.g. 1 and 1.0 are different keys), and a get returns a copy of the value.
+
+    Since a DLL would need every hit to relink nodes shared by every process, the LRU order is approximated with a clock: a hit only sets the referenced bit of the slot, and an eviction advances the clock hand over the slots,
+        clearing the referenced bits it passes, until it finds a slot that was not referenced since the hand last passed it (expired slots found on the way are evicted as expiries).
+    The arena is allocated by bumping its top, and compacted when the free space is scattered between the entries: entries are evicted until their total size leaves room for the new entry, and moved to the start of the arena if the room is not at the top.
+    An entry whose serialization is larger than the whole arena is not cached, and counted as an eviction.
+
+    Every operation holds a multiprocessing.Lock shared by the processes attached to the cache (it is a process-shared semaphore, so a process killed while holding it leaves the cache locked).
+    A cache is attached to in another process either by passing it as an argument of a multiprocessing.Process (it is pickled as its name and lock), or with attach_shared_cache(name, lock).
+    Expiry times are read from the clock of the cache in each process, time.monotonic by default, which is the same clock for every process of a host (so a ManualClock is only meant for a cache used by the process advancing it, e.g. in tests).
+    The miss_callback, the coalescing of concurrent misses and the revalidate_callback are per process; and invalidations received from the origin server are applied right away, since every operation holds the lock.
+    The process that created the cache should unlink it once no process uses it anymore, and every process should close it.
+    """
+    def __init__(self, max_size : int = 1000, max_age : int = 86400, miss_callback : Callable[[Hashable], Any] = None, max_bytes : int = None, name : str = None, lock = None, create : bool = True,
+                 clock : Clock = None):
+        super().__init__(max_size, max_age, miss_callback, clock=clock)
+        del self.head, self.tail, self.hash_map # the DLL and the hash map are replaced by the slots and the hash table in shared memory
+        arena_size = max_bytes if max_bytes is not None else ARENA_FACTOR * max_size
+        num_buckets = 1
+        while (num_buckets < 2 * max_size): # at most half of the buckets are used, so that probe sequences stay short
+            num_buckets *= 2
+
+        size = self._layout(max_size, num_buckets, arena_size)
+        if (create):
+            self.shared_memory = shared_memory.SharedMemory(name, create=True, size=size)
+            self.lock = lock if lock is not None else multiprocessing.Lock()
+        else:
+            self.shared_memory = _open_shared_memory(name)
+            self.lock = lock
+        self.name = self.shared_memory.name
+        self.max_bytes = arena_size
+        self._map(max_size, num_buckets, arena_size)
+
+        if (create):
+            HEADER.pack_into(self.shared_memory.buf, 0, MAGIC, max_size, num_buckets, arena_size, max_age)
+            self.buckets[:] = array('i', [EMPTY]) * num_buckets
+            self.counters[FREE] = NO_SLOT
+
+    def __reduce__(self): # passed to another process as its name and lock, attached to by the receiving process
+        return attach_shared_cache, (self.name, self.lock)
+
+    def peek(self, key : Hashable) -> Tuple[Any, int, float]:
+        key_bytes = pickle.dumps(key, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            slot = self._find(key_bytes, _hash(key_bytes))[1]
+            now = self.clock.now()
+            if (slot == EMPTY or now >= self.expires_at[slot]):
+                raise KeyError(key)
+            return pickle.loads(self._value_bytes(slot)), self.versions[slot], self.expires_at[slot] - now
+
+    def put(self, key : Hashable, value : Any, ttl : float = None, version : int = 0):
+        if (ttl is not None and ttl <= 0):
+            raise ValueError(ttl)
+        key_bytes = pickle.dumps(key, pickle.HIGHEST_PROTOCOL) # serialized before taking the lock
+        value_bytes = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        key_hash = _hash(key_bytes)
+        length = len(key_bytes) + len(value_bytes)
+
+        with self.lock:
+            bucket, slot = self._find(key_bytes, key_hash)
+            if (slot != EMPTY): # the entry is replaced by a new one, in a new slot
+                self._delete(bucket, slot)
+            if (length > self.arena_size):
+                self.counters[EVICTIONS] += 1
+                return
+
+            while (self.counters[CURR_SIZE] >= self.max_size or self.counters[LIVE_BYTES] + length > self.arena_size):
+                self._evict()
+            if (self.counters[ARENA_TOP] + length > self.arena_size): # the free space is scattered between the entries
+                self._compact()
+
+            slot = self._acquire()
+            offset = self.counters[ARENA_TOP]
+            start = self.arena_offset + offset
+            self.shared_memory.buf[start : start + len(key_bytes)] = key_bytes
+            self.shared_memory.buf[start + len(key_bytes) : start + length] = value_bytes
+            self.counters[ARENA_TOP] += length
+            self.counters[LIVE_BYTES] += length
+            self.counters[CURR_SIZE] += 1
+
+            self.hashes[slot] = key_hash
+            self.offsets[slot] = offset
+            self.key_lengths[slot] = len(key_bytes)
+            self.value_lengths[slot] = len(value_bytes)
+            self.expires_at[slot] = self.clock.now() + (ttl if ttl is not None else self.max_age)
+            self.versions[slot] = version
+            self.referenced[slot] = 0
+            self.buckets[self._find(key_bytes, key_hash)[0]] = slot # the empty bucket ending the probe sequence
+
+    def receive(self, updates : Iterable):
+        for update in updates:
+            if (not update.invalidate):
+                try:
+                    _, version, remaining_ttl = self.peek(update.key)
+                except KeyError: # only the keys held by this cache are updated
+                    continue
+                if (update.version > version):
+                    self.put(update.key, update.value, remaining_ttl, update.version) # the new value keeps the time to live of the slot
+                    self.invalidations += 1 # counted by each process, as the coalesced misses
+                continue
+
+            key_bytes = pickle.dumps(update.key, pickle.HIGHEST_PROTOCOL)
+            with self.lock:
+                bucket, slot = self._find(key_bytes, _hash(key_bytes))
+                if (slot == EMPTY):
+                    continue
+                if (update.version <= self.versions[slot]):
+                    self.stale_updates += 1
+                    continue
+                self.invalidations += 1
+                self._delete(bucket, slot)
+
+    def snapshot_items(self):
+        items = []
+        with self.lock:
+            now = self.clock.now()
+            for slot in range(self.counters[ALLOCATED]):
+                if (self.key_lengths[slot] > 0 and self.expires_at[slot] > now):
+                    items.append((pickle.loads(self._key_bytes(slot)), pickle.loads(self._value_bytes(slot)), self.expires_at[slot] - now))
+        return items
+
+    def size(self):
+        return self.counters[CURR_SIZE]
+
+    def cache_info(self):
+        with self.lock: # the counters of the cache as a whole, rather than of this process
+            self.hits, self.misses, self.evictions, self.expiries = (self.counters[HITS], self.counters[MISSES], self.counters[EVICTIONS], self.counters[EXPIRIES])
+            self.curr_bytes = self.counters[LIVE_BYTES]
+        return super().cache_info()
+
+    def close(self):
+        '''
+        Detaches this process from the shared memory, after which the cache can no longer be used by this process.
+        '''
+        for view in (self.counters, self.buckets, self.hashes, self.offsets, self.key_lengths, self.value_lengths, self.expires_at, self.versions, self.referenced):
+            view.release()
+        self.shared_memory.close()
+
+    def unlink(self):
+        '''
+        Destroys the shared memory once every process has closed it, called by the process that created the cache.
+        '''
+        self.shared_memory.unlink()
+
+    def _layout(self, max_size : int, num_buckets : int, arena_size : int) -> int:
+        '''
+        Sets the offset of each part of the block of shared memory, and returns the size of the block.
+        '''
+        self.counters_offset = _align(HEADER.size)
+        self.buckets_offset = self.counters_offset + 8 * COUNTERS
+        offset = _align(self.buckets_offset + 4 * num_buckets)
+        self.slot_offsets = []
+        for item_size in (8, 8, 4, 4, 8, 8, 1): # hashes, offsets, key lengths, value lengths, expiry times, versions and referenced bits
+            self.slot_offsets.append(offset)
+            offset = _align(offset + item_size * max_size)
+        self.arena_offset = offset
+        return offset + arena_size
+
+    def _map(self, max_size : int, num_buckets : int, arena_size : int):
+        buf = self.shared_memory.buf
+        self.max_size, self.num_buckets, self.arena_size = max_size, num_buckets, arena_size
+        self.counters = buf[self.counters_offset : self.buckets_offset].cast('Q')
+        self.buckets = buf[self.buckets_offset : self.buckets_offset + 4 * num_buckets].cast('i')
+        views = []
+        for offset, item_size, format in zip(self.slot_offsets, (8, 8, 4, 4, 8, 8, 1), 'QQIIdQB'):
+            views.append(buf[offset : offset + item_size * max_size].cast(format))
+        self.hashes, self.offsets, self.key_lengths, self.value_lengths, self.expires_at, self.versions, self.referenced = views
+
+    def _get_cached(self, key : Hashable):
+        key_bytes = pickle.dumps(key, pickle.HIGHEST_PROTOCOL)
+        key_hash = _hash(key_bytes)
+        with self.lock:
+            bucket, slot = self._find(key_bytes, key_hash)
+            if (slot != EMPTY):
+                if (self.clock.now() < self.expires_at[slot]):
+                    self.counters[HITS] += 1
+                    self.referenced[slot] = 1 # instead of moving the slot to the MRU end of a DLL
+                    return pickle.loads(self._value_bytes(slot))
+                self.counters[EXPIRIES] += 1
+                self._delete(bucket, slot)
+            self.counters[MISSES] += 1 # misses include expiries
+        raise KeyError(key)
+
+    def _find(self, key_bytes : bytes, key_hash : int):
+        '''
+        Returns the bucket of the hash table holding the slot of the key and the slot, or the empty bucket ending the probe sequence of the key and EMPTY.
+        '''
+        mask = self.num_buckets - 1
+        bucket = key_hash & mask
+        while True:
+            slot = self.buckets[bucket]
+            if (slot == EMPTY or (self.hashes[slot] == key_hash and self._key_bytes(slot) == key_bytes)):
+                return bucket, slot
+            bucket = (bucket + 1) & mask
+
+    def _key_bytes(self, slot : int):
+        start = self.arena_offset + self.offsets[slot]
+        return self.shared_memory.buf[start : start + self.key_lengths[slot]]
+
+    def _value_bytes(self, slot : int):
+        start = self.arena_offset + self.offsets[slot] + self.key_lengths[slot]
+        return self.shared_memory.buf[start : start + self.value_lengths[slot]]
+
+    def _evict(self):
+        '''
+        Advances the clock hand to the first slot not referenced since the hand last passed it (clearing the referenced bits on the way), and evicts it.
+        '''
+        now = self.clock.now()
+        while True:
+            slot = self.counters[HAND]
+            self.counters[HAND] = (slot + 1) % self.max_size
+            if (slot >= self.counters[ALLOCATED] or self.key_lengths[slot] == 0): # free slot
+                continue
+            if (self.expires_at[slot] <= now):
+                self.counters[EXPIRIES] += 1
+            elif (self.referenced[slot]):
+                self.referenced[slot] = 0 # a second chance
+                continue
+            else:
+                self.counters[EVICTIONS] += 1
+            key_bytes = bytes(self._key_bytes(slot))
+            self._delete(self._find(key_bytes, self.hashes[slot])[0], slot)
+            return
+
+    def _delete(self, bucket : int, slot : int):
+        '''
+        Frees the slot and its entry in the arena, and empties its bucket, shifting back the slots of the probe sequences that went through the bucket.
+        '''
+        self.counters[LIVE_BYTES] -= self.key_lengths[slot] + self.value_lengths[slot]
+        self.counters[CURR_SIZE] -= 1
+        self.key_lengths[slot] = 0
+        self.offsets[slot] = self.counters[FREE] # push the slot onto the free list, chained through the offsets
+        self.counters[FREE] = slot
+
+        mask = self.num_buckets - 1
+        next_bucket = bucket
+        while True:
+            next_bucket = (next_bucket + 1) & mask
+            next_slot = self.buckets[next_bucket]
+            if (next_slot == EMPTY):
+                break
+            ideal_bucket = self.hashes[next_slot] & mask
+            if ((bucket < ideal_bucket <= next_bucket) if bucket <= next_bucket else (bucket < ideal_bucket or ideal_bucket <= next_bucket)): # the slot would not be found from its ideal bucket if moved back
+                continue
+            self.buckets[bucket] = next_slot
+            bucket = next_bucket
+        self.buckets[bucket] = EMPTY
+
+    def _acquire(self):
+        if (self.counters[FREE] == NO_SLOT): # no slot to reuse, use the next slot never used
+            self.counters[ALLOCATED] += 1
+            return self.counters[ALLOCATED] - 1
+        slot = self.counters[FREE]
+        self.counters[FREE] = self.offsets[slot] # pop the slot off the free list
+        return slot
+
+    def _compact(self):
+        '''
+        Moves every entry to the start of the arena, in the order of their offsets, so that the free space of the arena is at its top.
+        '''
+        slots = sorted((slot for slot in range(self.counters[ALLOCATED]) if self.key_lengths[slot] > 0), key=lambda slot: self.offsets[slot])
+        buf = self.shared_memory.buf
+        top = 0
+        for slot in slots:
+            length = self.key_lengths[slot] + self.value_lengths[slot]
+            start = self.arena_offset + self.offsets[slot]
+            buf[self.arena_offset + top : self.arena_offset + top + length] = buf[start : start + length] # never moved up, so an overlapping move is safe
+            self.offsets[slot] = top
+            top += length
+        self.counters[ARENA_TOP] = top
+
+def attach_shared_cache(name : str, lock, miss_callback : Callable[[Hashable], Any] = None, clock : Clock = None) -> SharedLRUCache:
+    '''
+    Returns the SharedLRUCache created by another process under the given name, sharing its lock (e.g. inherited by a multiprocessing.Process).
+    '''
+    block = _open_shared_memory(name)
+    try:
+        magic, max_size, num_buckets, arena_size, max_age = HEADER.unpack_from(block.buf, 0)
+    finally:
+        block.close()
+    if (magic != MAGIC):
+        raise ValueError(name)
+    return SharedLRUCache(max_size, max_age, miss_callback, arena_size, name, lock, create=False, clock=clock)
@@ -0,0 +1,142 @@
+import math
+import random
+import time
+from collections import namedtuple, Counter
+from functools import wraps
+from itertools import accumulate
+from typing import List, Tuple
+
+from Clock import ManualClock
+from Database import Database
+from Origin import Origin
+from utils import distance
+
+SIGNAL_SPEED = 2e8 # metres per second, the speed of light in optical fibre, so the round trip time between two locations is twice their distance divided by this speed
+DATABASE_LATENCY = 0.005 # seconds, the time taken by the database to serve a query or write once it reached the origin server
+CLUSTER_SPREAD = 2.0 # degrees, the standard deviation of the latitude and longitude of the clients (and proxies) around the center of their cluster
+ORIGIN_COORDINATES = (39.0, -77.5) # the origin server and its database, in northern Virginia
+ORIGIN_METHODS = ('get', 'get_many', 'revalidate', 'put', 'put_many') # the methods of the origin server called by the proxies, each call being a round trip from the proxy to the origin server
+
+SimulationReport = namedtuple('SimulationReport', 'requests virtual_seconds wall_seconds throughput hit_ratio origin_qps p50 p99 failures reassignments') # throughput in requests simulated per wall clock second, origin QPS in calls to the origin server per virtual second, latency percentiles in virtual seconds
+
+def zipf_keys(num_keys : int, length : int, exponent : float = 1.0, seed : int = 0):
+    '''
+    Returns a list of length keys drawn from range(num_keys) following a Zipf distribution with the given exponent, where key k is drawn with a probability proportional to 1 / (k + 1) ** exponent (i.e. key 0 is the most popular).
+    '''
+    cumulative_weights = list(accumulate(1 / (k + 1) ** exponent for k in range(num_keys)))
+    return random.Random(seed).choices(range(num_keys), cum_weights=cumulative_weights, k=length)
+
+class DictDatabase(Database):
+    def __init__(self, table):
+        self.table = table
+
+    def get(self, key):
+        return self.table[key]
+
+    def put(self, key, value):
+        self.table[key] = value
+
+def round_trip_time(coordinates_1 : Tuple[float, float], coordinates_2 : Tuple[float, float]) -> float:
+    return 2 * distance(coordinates_1, coordinates_2) / SIGNAL_SPEED
+
+def random_coordinates(rng : random.Random) -> Tuple[float, float]:
+    '''
+    Returns coordinates drawn uniformly over the surface of the globe (rather than uniformly over the latitudes, which would crowd the poles).
+    '''
+    return math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180)
+
+def clustered_coordinates(rng : random.Random, centers : List[Tuple[float, float]], num_coordinates : int, spread : float = CLUSTER_SPREAD) -> List[Tuple[float, float]]:
+    '''
+    Returns coordinates scattered around centers drawn from the given centers, e.g. clients around the cities in which most of them live.
+    '''
+    coordinates = []
+    for _ in range(num_coordinates):
+        latitude, longitude = rng.choice(centers)
+        latitude = max(-90.0, min(90.0, rng.gauss(latitude, spread)))
+        longitude = (rng.gauss(longitude, spread) + 180) % 360 - 180
+        coordinates.append((round(latitude, 4), round(longitude, 4)))
+    return coordinates
+
+def percentile(sorted_values : List[float], q : float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] if len(sorted_values) > 0 else 0.0
+
+def simulate(num_proxies : int = 50, num_clients : int = 2000, num_keys : int = 10000, num_requests : int = 100000, request_rate : float = 1000.0, write_ratio : float = 0.05,
+             max_size : int = 500, max_age : float = 60, failures : int = 0, num_clusters : int = 8, exponent : float = 1.0, seed : int = 0) -> SimulationReport:
+    '''
+    Replays a trace of requests from clients clustered around num clusters cities to an origin server with num proxies proxies (also clustered around the cities), and returns the SimulationReport of the run.
+
+    The keys are Zipf distributed, each request is a put with probability write ratio (otherwise a get), and the requests arrive as a Poisson process of request rate requests per virtual second.
+    Each client is assigned its nearest proxy, and keeps it until the proxy fails: failures proxies fail at evenly spaced times of the trace and are reported to the origin server, and their clients are assigned their next nearest proxy by their next request.
+    The caches read the time from a ManualClock advanced by the arrival of each request, so that values expire as they would under real traffic however fast the trace is replayed.
+
+    The latency of a request is modelled as the round trip time between the client and its proxy, plus the round trip time between the proxy and the origin server for each call the proxy made to the origin server (including the revalidations of values not modified, which do not query the database),
+        plus the latency of the database (see DATABASE_LATENCY) for each call the origin server made to the database.
+    The throughput is the number of requests replayed per wall clock second, i.e. the speed of the whole request path in this process.
+    '''
+    rng = random.Random(seed)
+    centers = [random_coordinates(rng) for _ in range(num_clusters)]
+    coordinates_of_proxies = list(dict.fromkeys(clustered_coordinates(rng, centers, num_proxies, 2 * CLUSTER_SPREAD)))
+    coordinates_of_clients = clustered_coordinates(rng, centers, num_clients)
+    keys = zipf_keys(num_keys, num_requests, exponent, seed)
+    failure_indexes = {num_requests * (i + 1) // (failures + 1) for i in range(failures)}
+    failure_rng = random.Random(seed + 1) # the failed proxies are drawn apart, so that the trace is the same with or without failures
+
+    clock = ManualClock()
+    origin = Origin(DictDatabase({key: 'value{}'.format(key) for key in range(num_keys)}), max_size, max_age, 60, clock_of_LRUCache=clock)
+    origin_calls = _count_calls(origin)
+    origin._set_potential_servers({coordinates: None for coordinates in coordinates_of_proxies})
+    for coordinates in coordinates_of_proxies:
+        origin._add_proxy(coordinates)
+    assigned_proxies = origin.get_nearest_proxy_many(coordinates_of_clients)
+
+    latencies = []
+    reassignments = 0
+    start = time.perf_counter()
+    for i, key in enumerate(keys):
+        if (i in failure_indexes and len(origin.proxies) > 1):
+            origin.report_failure(failure_rng.choice(sorted(origin.proxies)))
+
+        clock.advance(rng.expovariate(request_rate))
+        client = rng.randrange(num_clients)
+        proxy = assigned_proxies[client]
+        if (proxy.coordinates in origin.failed_proxies): # the client finds its proxy down, and asks for the next nearest one
+            proxy = assigned_proxies[client] = origin.get_nearest_proxy(coordinates_of_clients[client])
+            reassignments += 1
+
+        calls, database_calls = sum(origin_calls.values()), _count_database_calls(origin)
+        if (rng.random() < write_ratio):
+            proxy.put(key, 'value{} at {}'.format(key, i))
+        else:
+            proxy.get(key)
+        latency = round_trip_time(coordinates_of_clients[client], proxy.coordinates)
+        latency += (sum(origin_calls.values()) - calls) * round_trip_time(proxy.coordinates, ORIGIN_COORDINATES)
+        latency += (_count_database_calls(origin) - database_calls) * DATABASE_LATENCY
+        latencies.append(latency)
+    wall_seconds = time.perf_counter() - start
+
+    hits, misses = 0, 0
+    for proxy in list(origin.proxies.values()) + list(origin.failed_proxies.values()):
+        cache_info = proxy.LRUCache.cache_info()
+        hits, misses = hits + cache_info.hits, misses + cache_info.misses
+    latencies.sort()
+    return SimulationReport(num_requests, clock.time, wall_seconds, num_requests / wall_seconds if wall_seconds > 0 else math.inf, hits / (hits + misses) if hits + misses > 0 else 0.0,
+                            sum(origin_calls.values()) / clock.time if clock.time > 0 else 0.0, percentile(latencies, 0.5), percentile(latencies, 0.99), len(origin.failed_proxies), reassignments)
+
+def _count_calls(origin : Origin) -> Counter:
+    '''
+    Wraps the methods of the origin server called by the proxies (see ORIGIN_METHODS), and returns the Counter of the calls to each of them.
+    Called before any proxy is deployed, since the proxies bind the methods of the origin server as the callbacks of their caches.
+    '''
+    calls = Counter()
+    def counted(name, method):
+        @wraps(method)
+        def call(*args):
+            calls[name] += 1
+            return method(*args)
+        return call
+    for name in ORIGIN_METHODS:
+        setattr(origin, name, counted(name, getattr(origin, name)))
+    return calls
+
+def _count_database_calls(origin : Origin) -> int:
+    return sum(histogram.count for histogram in origin.database_latencies.values())
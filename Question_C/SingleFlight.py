@@ -0,0 +1,59 @@
+import threading
+from typing import Callable, Hashable, Any
+
+class Flight:
+    '''
+    A call in progress on behalf of the first caller for a key, holding the result (or the exception raised) once the call completes.
+    '''
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class SingleFlight:
+    '''
+    Coalesces concurrent calls for the same key, so that only one call per key is in flight at any time.
+
+    The first caller for a key makes the call, and every other caller for the same key that arrives while the call is in flight waits for it to complete instead of making its own call.
+    All of the callers then receive the same value, or the same exception is raised to all of them.
+    The number of callers that waited on another caller's call rather than making their own call is counted as coalesced.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = dict() # of the form {key: flight, ...} for the calls currently in flight
+        self.coalesced = 0
+
+    def do(self, key : Hashable, function : Callable[[Hashable], Any]):
+        '''
+        Returns function(key), calling it only if no call for the key is already in flight, otherwise waiting for the call in flight and returning its value.
+        '''
+        with self.lock:
+            flight = self.flights.get(key)
+            if (flight is not None): # another caller is already calling for this key
+                self.coalesced += 1
+                is_leader = False
+            else:
+                flight = self.flights[key] = Flight()
+                is_leader = True
+
+        if (is_leader):
+            return self._call(key, function, flight)
+        return self._wait(flight)
+
+    def _call(self, key : Hashable, function : Callable[[Hashable], Any], flight : Flight):
+        try:
+            flight.value = function(key)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key] # later callers make a new call
+            flight.done.set()
+
+    def _wait(self, flight : Flight):
+        flight.done.wait()
+        if (flight.error is not None):
+            raise flight.error
+        return flight.value
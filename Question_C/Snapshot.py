@@ -0,0 +1,138 @@
+import mmap
+import os
+import pickle
+import struct
+import time
+import zlib
+from typing import Hashable, Iterator, Tuple
+
+from LRUCache import LazyValue
+
+MAGIC = b'LRUSNAP\x01' # identifies a snapshot file, and the version of its format
+HEADER = struct.Struct('<8sdQQI') # magic, wall clock time the snapshot was saved at, number of entries, offset of the index, CRC32 of the index
+INDEX_ENTRY = struct.Struct('<QIId') # offset of the pickled key, length of the pickled key, length of the pickled value (which follows the key), wall clock time the entry expires at
+
+class SnapshotValue(LazyValue):
+    '''
+    A value of a snapshot file, unpickled from the memory mapped file only when it is first read from the cache.
+    '''
+    def __init__(self, snapshot_map : mmap.mmap, offset : int, size : int):
+        super().__init__(size)
+        self.snapshot_map = snapshot_map
+        self.offset = offset
+
+    @property
+    def data(self) -> bytes:
+        return self.snapshot_map[self.offset : self.offset + self.size]
+
+    def load(self):
+        try:
+            return pickle.loads(self.data)
+        except Exception as e: # only the index of the snapshot is checked, so a corrupt value is only found when it is loaded
+            raise ValueError("the value at offset {} of the snapshot is corrupt".format(self.offset)) from e
+
+class SnapshotReader:
+    '''
+    Reads a snapshot file saved by save_snapshot, which is memory mapped rather than read into memory, so that opening a large snapshot only reads its header.
+
+    Raises a ValueError if the file is not a snapshot, or if its index is corrupt.
+    '''
+    def __init__(self, path : str):
+        with open(path, 'rb') as file:
+            self.snapshot_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) # the mapping stays valid after the file is closed (or replaced by a newer snapshot)
+
+        try:
+            magic, self.saved_at, self.count, self.index_offset, index_crc = HEADER.unpack_from(self.snapshot_map, 0)
+        except struct.error:
+            raise ValueError("{} is not a snapshot file".format(path))
+        index_end = self.index_offset + self.count * INDEX_ENTRY.size
+        if (magic != MAGIC or index_end > len(self.snapshot_map) or zlib.crc32(self.snapshot_map[self.index_offset : index_end]) != index_crc):
+            raise ValueError("{} is not a valid snapshot file".format(path))
+
+    def entries(self, now : float = None) -> Iterator[Tuple[Hashable, SnapshotValue, float]]:
+        '''
+        Yields (key, lazy value, remaining time to live) for every entry of the snapshot that has not expired by now (in wall clock time), in the order they were saved (from LRU to MRU).
+        Only the keys are unpickled, the values are loaded when first read.
+        An entry whose key is corrupt (i.e. cannot be unpickled as a hashable key) is skipped, since only the index of the snapshot is checked.
+        '''
+        if (now is None):
+            now = time.time()
+
+        for i in range(self.count):
+            key_offset, key_length, value_length, expires_at = INDEX_ENTRY.unpack_from(self.snapshot_map, self.index_offset + i * INDEX_ENTRY.size)
+            if (expires_at <= now): # expired while the proxy was down
+                continue
+            try:
+                key = pickle.loads(self.snapshot_map[key_offset : key_offset + key_length])
+                hash(key)
+            except Exception: # a corrupt key may fail to unpickle with any error, or unpickle as an unhashable object
+                continue
+            yield key, SnapshotValue(self.snapshot_map, key_offset + key_length, value_length), expires_at - now
+
+def save_snapshot(cache, path : str) -> int:
+    '''
+    Saves the keys, values, recency order and remaining time to live of every entry of the cache (a LRUCache, ShardedLRUCache or AsyncLRUCache) to the file at path, and returns the number of entries saved.
+
+    The snapshot is first written to a temporary file which is flushed to disk before it atomically replaces the file at path, so that a crash while saving leaves the previous snapshot intact.
+    The file holds a header, then the pickled key and value of each entry from LRU to MRU, then a fixed size index entry for each entry pointing to its key and value, with its expiry time as a wall clock time (so that it can be compared after a restart).
+    Entries whose key or value cannot be pickled are left out of the snapshot.
+    '''
+    now = time.time()
+    temporary_path = path + '.tmp'
+    index = bytearray()
+    offset = HEADER.size
+    with open(temporary_path, 'wb') as file:
+        file.write(bytes(HEADER.size)) # the header is written once the index is known
+
+        for key, value, remaining_ttl in cache.snapshot_items():
+            try:
+                key_data = pickle.dumps(key, pickle.HIGHEST_PROTOCOL)
+                value_data = value.data if isinstance(value, SnapshotValue) else pickle.dumps(value, pickle.HIGHEST_PROTOCOL) # a value never read since the last warm start is copied as is
+            except (pickle.PicklingError, TypeError, AttributeError):
+                continue
+            file.write(key_data)
+            file.write(value_data)
+            index += INDEX_ENTRY.pack(offset, len(key_data), len(value_data), now + remaining_ttl)
+            offset += len(key_data) + len(value_data)
+
+        file.write(index)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, now, len(index) // INDEX_ENTRY.size, offset, zlib.crc32(index)))
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary_path, path)
+    _sync_directory(path)
+    return len(index) // INDEX_ENTRY.size
+
+def warm_start(cache, path : str, now : float = None) -> int:
+    '''
+    Fills the cache (a LRUCache, ShardedLRUCache or AsyncLRUCache) with the entries of the snapshot file at path that have not expired since it was saved, and returns the number of entries restored.
+
+    The entries are put in the cache from LRU to MRU, so that the cache has the same recency order as when the snapshot was saved, with their remaining time to live as their TTL.
+    The values are lazy: they are only unpickled from the memory mapped file when first read, so that a restarted proxy can serve requests without first loading every value.
+    If there is no snapshot file at path, or it is not a valid snapshot, the cache is left empty (a cold start) and 0 is returned, whereas the entries whose key is corrupt are left out of a valid snapshot.
+    The entries are expired as of now, the wall clock time of the restart (time.time() by default, see SnapshotReader.entries).
+    '''
+    try:
+        reader = SnapshotReader(path)
+    except (OSError, ValueError):
+        return 0
+
+    restored = 0
+    for key, value, remaining_ttl in reader.entries(now):
+        cache.put(key, value, ttl=remaining_ttl)
+        restored += 1
+    return restored
+
+def _sync_directory(path : str):
+    try:
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError: # e.g. directories cannot be opened on Windows
+        return
+    try:
+        os.fsync(directory) # so that the rename itself survives a crash
+    except OSError:
+        pass
+    finally:
+        os.close(directory)
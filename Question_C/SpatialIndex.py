@@ -0,0 +1,128 @@
+import heapq
+from typing import Iterable, List, Tuple
+
+from utils import unit_vector
+
+class KDNode:
+    '''
+    A node of the k-d tree, holding indexed coordinates with their point on the unit sphere, and splitting the space of its subtrees on one axis of the point.
+    '''
+    __slots__ = ('coordinates', 'point', 'axis', 'left', 'right', 'deleted')
+
+    def __init__(self, coordinates : Tuple[float, float], point : Tuple[float, float, float], axis : int):
+        self.coordinates = coordinates
+        self.point = point
+        self.axis = axis
+        self.left = None # subtree of the points below this point on the axis
+        self.right = None # subtree of the points at or above this point on the axis
+        self.deleted = False
+
+class SpatialIndex:
+    '''
+    An index of latitude and longitude coordinates (e.g. of the proxies of an origin) answering nearest and k nearest queries in time logarithmic in the number of coordinates indexed (on average), instead of computing the distance to every one of them.
+
+    The coordinates are indexed as points on the unit sphere in a 3 dimensional k-d tree, which splits the points alternately on the x, y and z axes.
+    Since the straight line distance between two points on the unit sphere increases with the Haversine distance between their coordinates, the nearest points are the nearest coordinates, and they are found without trigonometry.
+    A search descends to the leaf nearest the query, then only visits the subtrees on the other side of a split that are nearer than the k nearest points found so far.
+
+    An inserted point is added as a leaf, and a removed point is only marked deleted, so that the index is kept up to date in logarithmic time as proxies are added and removed.
+    Once the deleted points outnumber the indexed points, or the points inserted since the tree was built outnumber the points it was built with, the tree is rebuilt balanced (by splitting on the median point) from the indexed points, so the cost of rebuilding is amortized over those updates.
+    '''
+    def __init__(self, coordinates : Iterable[Tuple[float, float]] = ()):
+        self.nodes = dict() # of the form {coordinates: node, ...} for the indexed coordinates
+        for indexed_coordinates in coordinates:
+            self.nodes[indexed_coordinates] = KDNode(indexed_coordinates, unit_vector(indexed_coordinates), 0)
+        self._rebuild()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, coordinates : Tuple[float, float]):
+        return coordinates in self.nodes
+
+    def insert(self, coordinates : Tuple[float, float]):
+        if (coordinates in self.nodes):
+            return
+
+        node = KDNode(coordinates, unit_vector(coordinates), 0)
+        self.nodes[coordinates] = node
+        if (self.root is None):
+            self.root = node
+        else:
+            parent = self.root
+            while True:
+                child = 'left' if node.point[parent.axis] < parent.point[parent.axis] else 'right'
+                if (getattr(parent, child) is None):
+                    node.axis = (parent.axis + 1) % 3
+                    setattr(parent, child, node)
+                    break
+                parent = getattr(parent, child)
+
+        self.inserted += 1
+        if (self.inserted > self.built):
+            self._rebuild()
+
+    def remove(self, coordinates : Tuple[float, float]):
+        node = self.nodes.pop(coordinates, None)
+        if (node is None):
+            return
+
+        node.deleted = True
+        self.deleted += 1
+        if (self.deleted > len(self.nodes)):
+            self._rebuild()
+
+    def nearest(self, coordinates : Tuple[float, float], k : int = 1) -> List[Tuple[float, float]]:
+        '''
+        Returns a list of the k indexed coordinates nearest to the given coordinates, from nearest to farthest (or every indexed coordinates if fewer than k are indexed).
+        '''
+        if (k <= 0):
+            return []
+
+        query = unit_vector(coordinates)
+        nearest = [] # max heap of the k nearest nodes found so far, as (-squared distance, tiebreaker, node)
+        stack = [self.root] if self.root is not None else []
+        while (len(stack) > 0):
+            node = stack.pop()
+            if (node is None):
+                continue
+            if (isinstance(node, tuple)): # a far subtree, deferred until the near subtree was searched
+                split_distance, node = node
+                if (len(nearest) == k and split_distance >= -nearest[0][0]): # the k nearest points found so far are all nearer than the split
+                    continue
+
+            if (not node.deleted):
+                squared_distance = sum((a - b) * (a - b) for a, b in zip(query, node.point))
+                if (len(nearest) < k):
+                    heapq.heappush(nearest, (-squared_distance, id(node), node))
+                elif (squared_distance < -nearest[0][0]):
+                    heapq.heapreplace(nearest, (-squared_distance, id(node), node))
+
+            difference = query[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if difference < 0 else (node.right, node.left)
+            if (far is not None):
+                stack.append((difference * difference, far))
+            stack.append(near)
+
+        return [node.coordinates for _, _, node in sorted(nearest, reverse=True)]
+
+    def _rebuild(self):
+        self.root = self._build(list(self.nodes.values()), 0)
+        self.built = len(self.nodes)
+        self.inserted = 0
+        self.deleted = 0
+
+    def _build(self, nodes : List[KDNode], axis : int):
+        if (len(nodes) == 0):
+            return None
+
+        nodes.sort(key=lambda node: node.point[axis])
+        median = len(nodes) // 2
+        while (median > 0 and nodes[median - 1].point[axis] == nodes[median].point[axis]): # points equal to the split on the axis go in the right subtree
+            median -= 1
+
+        node = nodes[median]
+        node.axis = axis
+        node.left = self._build(nodes[:median], (axis + 1) % 3)
+        node.right = self._build(nodes[median + 1:], (axis + 1) % 3)
+        return node
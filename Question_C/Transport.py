@@ -0,0 +1,432 @@
+import asyncio
+import builtins
+import pickle
+import struct
+from typing import Any, Dict, Hashable, Iterable, Tuple, Union
+
+FRAME_HEADER = struct.Struct('<IIB') # length of the payload, id of the request, and opcode of a request or status of a response
+MAX_PAYLOAD = 2**26 # bytes, a larger frame is taken as a corrupt stream and closes the connection
+MAX_DEPTH = 32 # of the lists, tuples and dicts nested in a payload of the ValueCodec, so that decoding a hostile payload cannot exhaust the stack
+POOL_SIZE = 4 # connections of a ConnectionPool
+
+GET, GET_MANY, PUT, PUT_MANY, REVALIDATE = range(1, 6) # opcodes of the requests
+OK, ERROR = 0, 1 # statuses of the responses
+METHODS = {GET: 'get', GET_MANY: 'get_many', PUT: 'put', PUT_MANY: 'put_many', REVALIDATE: 'revalidate'}
+
+LENGTH, INT, FLOAT = struct.Struct('<I'), struct.Struct('<q'), struct.Struct('<d') # of the ValueCodec
+
+class RemoteError(Exception):
+    '''
+    An error raised by the target of a CacheServer whose type is not a builtin exception (or cannot be built again from its arguments), raised again by the client with the name of its type and its arguments.
+    '''
+    def __init__(self, type_name : str, *args):
+        super().__init__(type_name, *args)
+        self.type_name = type_name
+
+class PickleCodec:
+    '''
+    Encodes the payloads by pickling them, so that any picklable value can be sent, but decoding a payload may run any code chosen by its sender: only for connections between trusted peers, by setting it as the codec of a CacheServer subclass and of its clients.
+    '''
+    @staticmethod
+    def dumps(obj : Any) -> bytes:
+        return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+    loads = staticmethod(pickle.loads)
+
+class ValueCodec:
+    '''
+    Encodes the payloads in a tagged binary format of None, bools, ints, floats, strs, bytes, and lists, tuples and dicts of them, so that decoding a payload only ever builds these values, whoever sent it (see ProxyServer).
+    Each value is a 1 byte tag, followed by its 8 bytes for an int or a float, or by its length (or number of items) and its bytes (or items) otherwise.
+    A payload that is truncated, has trailing bytes, or nests more than MAX_DEPTH containers raises ValueError, and a value of any other type raises TypeError when encoded.
+    '''
+    @classmethod
+    def dumps(cls, obj : Any) -> bytes:
+        parts = []
+        cls._encode(obj, parts, 0)
+        return b''.join(parts)
+
+    @classmethod
+    def loads(cls, data : bytes) -> Any:
+        data = memoryview(data)
+        try:
+            obj, offset = cls._decode(data, 0, 0)
+        except (struct.error, IndexError, TypeError, UnicodeDecodeError) as e: # truncated, or a list as the key of a dict
+            raise ValueError("corrupt payload") from e
+        if (offset != len(data)):
+            raise ValueError("corrupt payload")
+        return obj
+
+    @classmethod
+    def _encode(cls, obj : Any, parts : list, depth : int):
+        if (obj is None):
+            parts.append(b'N')
+        elif (obj is True or obj is False):
+            parts.append(b'T' if obj else b'F')
+        elif (isinstance(obj, int)):
+            if (-2**63 <= obj < 2**63):
+                parts.append(b'i' + INT.pack(obj))
+            else:
+                cls._encode_bytes(b'I', str(obj).encode('ascii'), parts)
+        elif (isinstance(obj, float)):
+            parts.append(b'f' + FLOAT.pack(obj))
+        elif (isinstance(obj, str)):
+            cls._encode_bytes(b's', obj.encode('utf-8', 'surrogatepass'), parts)
+        elif (isinstance(obj, (bytes, bytearray, memoryview))):
+            cls._encode_bytes(b'b', bytes(obj), parts)
+        elif (isinstance(obj, (list, tuple, dict))):
+            if (depth >= MAX_DEPTH):
+                raise ValueError("nested too deeply")
+            parts.append((b'd' if isinstance(obj, dict) else b't' if isinstance(obj, tuple) else b'l') + LENGTH.pack(len(obj)))
+            for item in (obj.items() if isinstance(obj, dict) else obj):
+                if (isinstance(obj, dict)):
+                    cls._encode(item[0], parts, depth + 1)
+                    cls._encode(item[1], parts, depth + 1)
+                else:
+                    cls._encode(item, parts, depth + 1)
+        else:
+            raise TypeError(type(obj).__name__)
+
+    @staticmethod
+    def _encode_bytes(tag : bytes, data : bytes, parts : list):
+        parts.append(tag + LENGTH.pack(len(data)))
+        parts.append(data)
+
+    @classmethod
+    def _decode(cls, data : memoryview, offset : int, depth : int) -> Tuple[Any, int]:
+        tag = bytes(data[offset : offset + 1])
+        offset += 1
+        if (tag == b'N'):
+            return None, offset
+        if (tag == b'T' or tag == b'F'):
+            return tag == b'T', offset
+        if (tag == b'i'):
+            return INT.unpack_from(data, offset)[0], offset + INT.size
+        if (tag == b'f'):
+            return FLOAT.unpack_from(data, offset)[0], offset + FLOAT.size
+        length, = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        if (tag in (b'I', b's', b'b')):
+            if (offset + length > len(data)):
+                raise ValueError("corrupt payload")
+            raw = bytes(data[offset : offset + length])
+            offset += length
+            if (tag == b'I'):
+                return int(raw.decode('ascii')), offset
+            return (raw.decode('utf-8', 'surrogatepass') if tag == b's' else raw), offset
+        if (tag not in (b'l', b't', b'd') or depth >= MAX_DEPTH or length > len(data) - offset): # each item is at least 1 byte
+            raise ValueError("corrupt payload")
+        if (tag == b'd'):
+            items = dict()
+            for _ in range(length):
+                key, offset = cls._decode(data, offset, depth + 1)
+                items[key], offset = cls._decode(data, offset, depth + 1)
+            return items, offset
+        items = []
+        for _ in range(length):
+            item, offset = cls._decode(data, offset, depth + 1)
+            items.append(item)
+        return (tuple(items) if tag == b't' else items), offset
+
+PICKLE_CODEC, VALUE_CODEC = PickleCodec(), ValueCodec()
+
+def encode_error(error : Exception, codec) -> bytes:
+    '''
+    Returns the payload of the response to a request whose method raised the error: the name of its type and its arguments (or its message, if the codec cannot encode its arguments), rather than the error itself, so that the client never has to build an object of a type chosen by the server.
+    '''
+    type_name, args = (error.type_name, error.args[1:]) if isinstance(error, RemoteError) else (type(error).__name__, error.args) # relayed as raised by the first server
+    try:
+        return codec.dumps((type_name, args))
+    except Exception:
+        return codec.dumps((type_name, (str(error),)))
+
+def decode_error(payload : bytes, codec) -> Exception:
+    '''
+    Returns the error encoded by encode_error: an instance of the builtin exception of that name (e.g. a KeyError for a missing key) if there is one and it can be built from the arguments, otherwise a RemoteError.
+    '''
+    type_name, args = codec.loads(payload)
+    error_type = getattr(builtins, type_name, None) if isinstance(type_name, str) else None
+    if (isinstance(error_type, type) and issubclass(error_type, Exception)):
+        try:
+            return error_type(*args)
+        except Exception:
+            pass
+    return RemoteError(str(type_name), *args)
+
+class FrameWriter:
+    '''
+    Writes frames to a stream, batching the frames written during one step of the event loop into a single write to the socket, so that pipelined requests (or responses) are not sent one system call (and one packet) at a time.
+    The writers of frames await drain once written, so that they wait while the stream is above its high-water mark (e.g. a client not reading its responses) rather than buffering without bound.
+    '''
+    def __init__(self, writer : asyncio.StreamWriter):
+        self.writer = writer
+        self.buffer = []
+        self.frames, self.flushes = 0, 0
+
+    def write(self, request_id : int, code : int, payload : bytes):
+        if (len(self.buffer) == 0):
+            asyncio.get_running_loop().call_soon(self._flush)
+        self.buffer.append(FRAME_HEADER.pack(len(payload), request_id, code))
+        self.buffer.append(payload)
+        self.frames += 1
+
+    def _flush(self):
+        if (self.writer.is_closing()):
+            self.buffer = []
+            return
+        self.writer.write(b''.join(self.buffer))
+        self.buffer = []
+        self.flushes += 1
+
+    async def drain(self):
+        await self.writer.drain() # returns at once unless the frames flushed before are above the high-water mark, so the frames of this step are still batched
+
+async def read_frame(reader : asyncio.StreamReader) -> Tuple[int, int, bytes]:
+    '''
+    Returns the (request id, opcode or status, payload) of the next frame of the stream, or raises asyncio.IncompleteReadError once the stream is closed.
+    '''
+    length, request_id, code = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if (length > MAX_PAYLOAD):
+        raise ConnectionError(length)
+    return request_id, code, await reader.readexactly(length)
+
+class CacheServer:
+    '''
+    Serves the methods of a target (e.g. a Proxy for the clients, or an Origin for the proxies) over TCP, each request and response being a frame of a compact binary protocol: a 9 byte header (the length of the payload, the id of the request, and its opcode or the status of the response), followed by the arguments or the result (or the type and arguments of the error raised, see encode_error) encoded by the codec of the server as the payload.
+    The codec attribute is the VALUE_CODEC by default, so that a client reaching the server can only send values of the ValueCodec rather than arbitrary pickles, and its clients must use the same codec.
+
+    Requests are pipelined: each request read from a connection is handled by its own task, without waiting for the response to the previous one, and the responses are written as soon as they are ready (so possibly out of order, which the id of the request resolves).
+    The methods of the target are awaited directly if they are coroutines (e.g. of an AsyncProxy or AsyncOrigin), otherwise they are run in the default executor of the event loop, so that a blocking call does not stall the other requests.
+    Only the methods of the target listed in the methods attribute are served.
+    '''
+    methods = frozenset(METHODS.values())
+    codec = VALUE_CODEC
+
+    def __init__(self, target, host : str = '127.0.0.1', port : int = 0):
+        self.target = target
+        self.host = host
+        self.port = port # a port of 0 picks a free port, and the address attribute holds the address actually bound once started
+        self.address = None
+        self.server = None
+        self.connections = dict() # of the form {writer: task serving the connection, ...} for the open connections
+        self.requests = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.address = self.server.sockets[0].getsockname()[:2]
+        return self.address
+
+    async def close(self):
+        self.server.close()
+        connections = list(self.connections.items())
+        for writer, _ in connections: # the tasks serving the connections return once their streams are closed
+            writer.close()
+        await asyncio.gather(*(task for _, task in connections), return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def _serve(self, reader : asyncio.StreamReader, writer : asyncio.StreamWriter):
+        self.connections[writer] = asyncio.current_task()
+        frame_writer = FrameWriter(writer)
+        handlers = set() # references to the tasks handling the requests, so they are not garbage collected before completing
+        try:
+            while True:
+                request_id, opcode, payload = await read_frame(reader)
+                self.requests += 1
+                handler = asyncio.create_task(self._handle(frame_writer, request_id, opcode, payload))
+                handlers.add(handler)
+                handler.add_done_callback(handlers.discard)
+        except (asyncio.IncompleteReadError, ConnectionError): # the client (or the server) closed the connection
+            pass
+        finally:
+            for handler in handlers:
+                handler.cancel()
+            writer.close()
+            self.connections.pop(writer, None)
+
+    async def _handle(self, frame_writer : FrameWriter, request_id : int, opcode : int, payload : bytes):
+        try:
+            name = METHODS.get(opcode)
+            if (name not in self.methods):
+                raise ValueError(opcode)
+            result = await self._call(getattr(self.target, name), *self.codec.loads(payload))
+            frame_writer.write(request_id, OK, self.codec.dumps(result))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e: # raised again by the client
+            frame_writer.write(request_id, ERROR, encode_error(e, self.codec))
+        try:
+            await frame_writer.drain()
+        except ConnectionError: # the client is gone, and the connection is closed by _serve
+            pass
+
+    async def _call(self, method, *args):
+        if (asyncio.iscoroutinefunction(method)):
+            return await method(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+class ProxyServer(CacheServer):
+    '''
+    A CacheServer serving the get and put methods (and get_many and put_many methods) of a Proxy or AsyncProxy to its clients.
+    Since the methods of a Proxy are run by the threads of the executor, a Proxy served this way must have a ShardedLRUCache (i.e. a number of shards greater than 1), whereas an AsyncProxy is only ever run by the thread of the event loop.
+    The payloads are encoded by the VALUE_CODEC, since the clients are not trusted, so the keys and values served must be values of the ValueCodec.
+    '''
+    methods = frozenset(('get', 'get_many', 'put', 'put_many'))
+
+class OriginServer(CacheServer):
+    '''
+    A CacheServer serving the get, put and revalidate methods (and get_many and put_many methods) of an Origin or AsyncOrigin to its proxies.
+    The payloads are encoded by the VALUE_CODEC as well, since every value put through a ProxyServer is already a value of the ValueCodec, and the results of revalidate are tuples of such values.
+    '''
+    methods = frozenset(('get', 'get_many', 'put', 'put_many', 'revalidate'))
+
+class TransportClient:
+    '''
+    A connection to a CacheServer, whose get, put and revalidate methods (and get_many and put_many methods) are coroutines sending the request and awaiting its response.
+    Requests are pipelined: any number of coroutines may send requests on the connection concurrently, each awaiting the response with the id of its request, and the requests sent during one step of the event loop are written to the socket together.
+    An error raised by the method of the target is raised again by the coroutine (see decode_error), and every pending request raises ConnectionError if the connection is lost.
+    The codec must be the codec of the server, the VALUE_CODEC by default.
+    '''
+    def __init__(self, host : str, port : int, codec = VALUE_CODEC):
+        self.host = host
+        self.port = port
+        self.codec = codec
+        self.reader, self.writer, self.frame_writer = None, None, None
+        self.receiver = None
+        self.pending = dict() # of the form {request id: future of the response, ...}
+        self.next_id = 0
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.frame_writer = FrameWriter(self.writer)
+        self.receiver = asyncio.create_task(self._receive())
+        return self
+
+    async def close(self):
+        self.writer.close()
+        self.receiver.cancel()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    async def call(self, opcode : int, *args):
+        if (self.receiver.done()):
+            raise ConnectionError((self.host, self.port))
+        request_id = self.next_id
+        self.next_id = (self.next_id + 1) % 2**32
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            self.frame_writer.write(request_id, opcode, self.codec.dumps(args))
+            await self.frame_writer.drain()
+            return await future
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def get(self, key : Hashable):
+        return await self.call(GET, key)
+
+    async def get_many(self, keys : Iterable[Hashable]):
+        return await self.call(GET_MANY, list(keys))
+
+    async def put(self, key : Hashable, value : Any, *args):
+        return await self.call(PUT, key, value, *args)
+
+    async def put_many(self, items : Union[Dict[Hashable, Any], Iterable[Tuple[Hashable, Any]]]):
+        return await self.call(PUT_MANY, dict(items))
+
+    async def revalidate(self, key : Hashable, version : int):
+        return await self.call(REVALIDATE, key, version)
+
+    async def _receive(self):
+        error = "connection closed"
+        try:
+            while True:
+                request_id, status, payload = await read_frame(self.reader)
+                future = self.pending.get(request_id)
+                if (future is None or future.done()): # the caller was cancelled meanwhile
+                    continue
+                try:
+                    if (status == OK):
+                        future.set_result(self.codec.loads(payload))
+                    else:
+                        future.set_exception(decode_error(payload, self.codec))
+                except Exception as e: # only this response is lost, the frames after it are still whole
+                    future.set_exception(e)
+        except Exception as e:
+            error = e
+        finally: # whatever stopped the receiver (including its cancellation), no response will come
+            for future in self.pending.values():
+                if (not future.done()):
+                    future.set_exception(ConnectionError(error))
+
+    def in_flight(self):
+        return len(self.pending)
+
+class ConnectionPool:
+    '''
+    A pool of pipelined TransportClient connections to a CacheServer, with the same coroutines as a TransportClient, sending each request on the connection with the fewest requests in flight.
+    The connections are opened on the first requests (up to the size of the pool), and a lost connection is replaced by the next request that would use it.
+    A ConnectionPool to an OriginServer can replace an AsyncOrigin as the origin of an AsyncProxy running in another process (see connect_proxy).
+    '''
+    def __init__(self, host : str, port : int, size : int = POOL_SIZE, codec = VALUE_CODEC):
+        if (size <= 0):
+            raise ValueError(size)
+        self.host = host
+        self.port = port
+        self.size = size
+        self.codec = codec
+        self.clients = []
+        self.connecting = None # the connection being opened, awaited by the requests sent meanwhile rather than opening more
+
+    async def call(self, opcode : int, *args):
+        return await (await self._get_client()).call(opcode, *args)
+
+    async def get(self, key : Hashable):
+        return await self.call(GET, key)
+
+    async def get_many(self, keys : Iterable[Hashable]):
+        return await self.call(GET_MANY, list(keys))
+
+    async def put(self, key : Hashable, value : Any, *args):
+        return await self.call(PUT, key, value, *args)
+
+    async def put_many(self, items : Union[Dict[Hashable, Any], Iterable[Tuple[Hashable, Any]]]):
+        return await self.call(PUT_MANY, dict(items))
+
+    async def revalidate(self, key : Hashable, version : int):
+        return await self.call(REVALIDATE, key, version)
+
+    async def close(self):
+        clients, self.clients = self.clients, []
+        for client in clients:
+            await client.close()
+
+    async def _get_client(self) -> TransportClient:
+        self.clients = [client for client in self.clients if not client.receiver.done()] # drop the lost connections
+        idle_client = min(self.clients, key=TransportClient.in_flight, default=None)
+        if (idle_client is not None and (idle_client.in_flight() == 0 or len(self.clients) >= self.size)):
+            return idle_client
+
+        if (self.connecting is None):
+            self.connecting = asyncio.ensure_future(TransportClient(self.host, self.port, self.codec).connect())
+            try:
+                client = await self.connecting
+                self.clients.append(client)
+                return client
+            finally:
+                self.connecting = None
+        try:
+            return await asyncio.shield(self.connecting)
+        except (OSError, asyncio.CancelledError):
+            if (idle_client is None):
+                raise
+            return idle_client
+
+def connect_proxy(proxy, pool : ConnectionPool):
+    '''
+    Makes the ConnectionPool to an OriginServer the origin of the AsyncProxy, and sets the callbacks of its AsyncLRUCache to the pool, as an AsyncProxyFactory does with an AsyncOrigin in the same process.
+    '''
+    proxy.origin = pool
+    proxy.LRUCache.set_miss_callback(pool.get)
+    proxy.LRUCache.set_bulk_miss_callback(pool.get_many)
+    proxy.LRUCache.set_revalidate_callback(pool.revalidate)
+    return proxy
@@ -0,0 +1,180 @@
+import glob
+import os
+import pickle
+import struct
+import threading
+import zlib
+from typing import Any, Dict, Hashable, Iterable, Tuple, Union
+
+from Database import Database
+
+RECORD_HEADER = struct.Struct('<II') # length and CRC32 of the pickled list of items of a record of the log
+
+class WriteBehindDatabase(Database):
+    '''
+    A database that acknowledges puts as soon as they are appended to a local log, and writes them behind to the wrapped database in bulk, so that the latency of a put is the latency of a local append rather than of the database.
+
+    Only the latest value put for each key is kept pending, so that repeated puts of a hot key between two flushes reach the wrapped database as a single write (these puts are counted as coalesced).
+    The pending items are flushed to the wrapped database with a single put_many call by a daemon thread, once max pending keys are pending or every flush interval seconds, whichever comes first.
+    Gets are served from the pending items (and from the items being flushed) before querying the wrapped database, so a put is visible to every get as soon as it is acknowledged.
+
+    Each put is appended to the log (and synced to disk if sync is True) before it is acknowledged, so that a crash does not lose acknowledged puts: the log is replayed and flushed when a WriteBehindDatabase is created with the same log path.
+    The log is split in segments (files named log_path.0, log_path.1, ...), a new segment is started by every flush, and the segments are deleted once all of their items were written to the wrapped database.
+    If a flush fails, its items are pending again (unless they were put again meanwhile) and their segments are kept until a later flush succeeds.
+    '''
+    def __init__(self, database : Database, log_path : str, max_pending : int = 1000, flush_interval : float = 1.0, sync : bool = True):
+        self.database = database
+        self.log_path = log_path
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.sync = sync
+
+        self.lock = threading.Lock() # guards the pending items, the items being flushed and the log
+        self.flush_lock = threading.Lock() # only one flush at a time
+        self.pending = dict() # of the form {key: latest value, ...} for the keys put since the last flush
+        self.flushing = dict() # the items of the flush in progress, still served by gets until they are in the wrapped database
+        self.sealed_segments = [] # paths of the segments of the log whose items are not all in the wrapped database yet
+        self.coalesced, self.flushes, self.flushed = 0, 0, 0
+
+        self.sequence = 0
+        for sequence, path in self._find_segments(): # recover the puts acknowledged before a crash
+            self._replay(path)
+            self.sealed_segments.append(path)
+            self.sequence = sequence + 1
+        self.log = open(self._segment_path(self.sequence), 'ab')
+
+        self.flush_requested = threading.Event()
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+        if (len(self.pending) > 0):
+            self.flush_requested.set()
+
+    def get(self, key : Hashable):
+        with self.lock:
+            for items in (self.pending, self.flushing):
+                if (key in items):
+                    return items[key]
+        return self.database.get(key)
+
+    def put(self, key : Hashable, value : Any):
+        self.put_many([(key, value)])
+
+    def get_many(self, keys : Iterable[Hashable]):
+        values = dict()
+        missed_keys = []
+        with self.lock:
+            for key in keys:
+                if (key in self.pending):
+                    values[key] = self.pending[key]
+                elif (key in self.flushing):
+                    values[key] = self.flushing[key]
+                else:
+                    missed_keys.append(key)
+
+        if (len(missed_keys) > 0):
+            values.update(self.database.get_many(missed_keys))
+        return values
+
+    def put_many(self, items : Union[Dict[Hashable, Any], Iterable[Tuple[Hashable, Any]]]):
+        items = list(items.items() if isinstance(items, dict) else items)
+        record = pickle.dumps(items, pickle.HIGHEST_PROTOCOL)
+
+        with self.lock:
+            self.log.write(RECORD_HEADER.pack(len(record), zlib.crc32(record)) + record)
+            self.log.flush()
+            if (self.sync):
+                os.fsync(self.log.fileno())
+
+            for key, value in items:
+                if (key in self.pending):
+                    self.coalesced += 1
+                self.pending[key] = value
+            is_full = len(self.pending) >= self.max_pending
+
+        if (is_full):
+            self.flush_requested.set()
+
+    def flush(self) -> int:
+        '''
+        Writes the pending items to the wrapped database with a single put_many call, and returns the number of items written.
+        '''
+        with self.flush_lock:
+            with self.lock:
+                if (len(self.pending) == 0):
+                    return 0
+                self.flushing, self.pending = self.pending, dict()
+                self.log.close() # later puts go to a new segment, so the segments of this flush can be deleted once it succeeds
+                self.sealed_segments.append(self._segment_path(self.sequence))
+                self.sequence += 1
+                self.log = open(self._segment_path(self.sequence), 'ab')
+                segments = list(self.sealed_segments)
+
+            try:
+                self.database.put_many(self.flushing)
+            except Exception:
+                with self.lock:
+                    for key, value in self.flushing.items():
+                        self.pending.setdefault(key, value) # a newer value put meanwhile is kept
+                    self.flushing = dict()
+                raise
+
+            with self.lock:
+                num_flushed = len(self.flushing)
+                self.flushing = dict()
+                self.sealed_segments = self.sealed_segments[len(segments):]
+            for path in segments:
+                os.remove(path)
+
+            self.flushes += 1
+            self.flushed += num_flushed
+            return num_flushed
+
+    def close(self):
+        '''
+        Stops the daemon thread, flushes the pending items and closes the log.
+        '''
+        self.closed.set()
+        self.flush_requested.set()
+        self.flusher.join()
+        self.flush()
+        with self.lock:
+            is_empty = self.log.tell() == 0
+            self.log.close()
+            if (is_empty): # no put since the last flush
+                os.remove(self._segment_path(self.sequence))
+
+    def _flush_periodically(self):
+        while not self.closed.is_set():
+            self.flush_requested.wait(self.flush_interval)
+            self.flush_requested.clear()
+            if (self.closed.is_set()):
+                break
+            try:
+                self.flush()
+            except Exception: # the items are pending again, and the flush is retried after the next interval
+                pass
+
+    def _segment_path(self, sequence : int):
+        return '{}.{}'.format(self.log_path, sequence)
+
+    def _find_segments(self):
+        segments = []
+        for path in glob.glob(glob.escape(self.log_path) + '.*'):
+            suffix = path[len(self.log_path) + 1:]
+            if (suffix.isdigit()):
+                segments.append((int(suffix), path))
+        return sorted(segments)
+
+    def _replay(self, path : str):
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        offset = 0
+        while (offset + RECORD_HEADER.size <= len(data)):
+            length, crc = RECORD_HEADER.unpack_from(data, offset)
+            record = data[offset + RECORD_HEADER.size : offset + RECORD_HEADER.size + length]
+            if (len(record) < length or zlib.crc32(record) != crc): # a record torn by a crash while it was appended was never acknowledged
+                break
+            self.pending.update(pickle.loads(record))
+            offset += RECORD_HEADER.size + length
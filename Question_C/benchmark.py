@@ -0,0 +1,226 @@
+from LRUCache import LRUCache
+from CompactLRUCache import CompactLRUCache
+from AdmissionPolicy import TinyLFU
+from AsyncLRUCache import AsyncLRUCache
+from Origin import Origin, AsyncOrigin
+from Proxy import AsyncProxy
+from SQLiteDatabase import SQLiteDatabase
+from LogDatabase import LogDatabase
+from Clock import Clock, CoarseClock, ManualClock
+from Simulator import zipf_keys, DictDatabase, simulate
+from Transport import ProxyServer, OriginServer, TransportClient, ConnectionPool, connect_proxy, POOL_SIZE
+
+import asyncio
+import gc
+import os
+import time
+import random
+import tempfile
+import tracemalloc
+
+def scan_trace(num_keys : int, length : int, scan_length : int, scan_interval : int, seed : int = 0):
+    '''
+    Returns a trace of Zipf distributed keys, interrupted every scan_interval requests by a scan of scan_length keys that are each requested once (e.g. a batch job reading through the keyspace).
+    '''
+    trace = []
+    for i, key in enumerate(zipf_keys(num_keys, length, seed=seed)):
+        if (i % scan_interval == 0):
+            trace.extend(('scan', i, j) for j in range(scan_length))
+        trace.append(key)
+    return trace
+
+def hit_rate(cache, trace):
+    '''
+    Returns the hit rate of the cache replaying the trace, counting only the requests that are not part of a scan (since scanned keys always miss).
+    '''
+    cache.set_miss_callback(lambda key: key)
+    hits, requests = 0, 0
+    for key in trace:
+        hits_before = cache.hits
+        cache.get(key)
+        if (not isinstance(key, tuple)): # scanned keys are tuples
+            hits += cache.hits - hits_before
+            requests += 1
+    return hits / requests
+
+def bytes_per_entry(cache_class, num_entries : int):
+    '''
+    Returns the average number of bytes allocated by a cache of the given class to hold each of num_entries entries.
+    The keys and values are allocated before tracing starts, so that only the memory used by the cache structure itself (nodes or slots, hash map, timestamps) is measured.
+    '''
+    keys = list(range(num_entries))
+    values = list(range(num_entries))
+    gc.collect()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    cache = cache_class(max_size=num_entries, max_age=86400)
+    for key, value in zip(keys, values):
+        cache.put(key, value)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert cache.size() == num_entries
+    return (after - before) / num_entries
+
+def benchmark_memory(num_entries : int = 1000000):
+    print("Benchmark name:\nbytes per entry at {} entries\n".format(num_entries))
+    for cache_class in (LRUCache, CompactLRUCache):
+        print("{:<16} {:>8.1f} bytes per entry".format(cache_class.__name__, bytes_per_entry(cache_class, num_entries)))
+
+def benchmark_hit_rates(max_size : int = 1000, num_keys : int = 100000, length : int = 500000):
+    print("Benchmark name:\nhit rates of a cache of max size {} replaying traces of {} Zipf distributed keys (excluding scanned keys)\n".format(max_size, length))
+    traces = {
+        "zipf": zipf_keys(num_keys, length),
+        "zipf with scans": scan_trace(num_keys, length, scan_length=max_size * 5, scan_interval=length // 20),
+    }
+    policies = {
+        "LRU": lambda: None,
+        "TinyLFU": lambda: TinyLFU(max_size),
+    }
+    print("{:<16}".format("trace") + "".join("{:>10}".format(name) for name in policies))
+    for trace_name, trace in traces.items():
+        hit_rates = [hit_rate(LRUCache(max_size, 86400, admission_policy=create_policy()), trace) for create_policy in policies.values()]
+        print("{:<16}".format(trace_name) + "".join("{:>10.3f}".format(rate) for rate in hit_rates))
+
+async def request_latencies(client, keys, concurrency : int):
+    '''
+    Returns the latency in seconds of each get of the keys through the client, with concurrency requests in flight at once (each of concurrency tasks getting its share of the keys in turn).
+    '''
+    latencies = []
+    async def get_in_turn(keys):
+        for key in keys:
+            start = time.perf_counter()
+            await client.get(key)
+            latencies.append(time.perf_counter() - start)
+    await asyncio.gather(*(get_in_turn(keys[i::concurrency]) for i in range(concurrency)))
+    return latencies
+
+async def measure_transport(num_requests : int, num_keys : int, concurrencies):
+    '''
+    Prints the latencies and throughput of gets through a ProxyServer whose AsyncProxy is connected to an OriginServer by a ConnectionPool, from a single pipelined connection and from a pool of connections.
+    The clients and both servers share a single event loop (and a single core), so the throughput is that of the whole chain rather than of a server alone.
+    '''
+    origin = AsyncOrigin(DictDatabase({key: 'value{}'.format(key) for key in range(num_keys)}), num_keys, 86400, 60)
+    origin_server = OriginServer(origin)
+    pool = ConnectionPool(*await origin_server.start())
+    proxy = connect_proxy(AsyncProxy((45.5, -73.6), AsyncLRUCache(num_keys, 86400), None), pool)
+    proxy_server = ProxyServer(proxy)
+    host, port = await proxy_server.start()
+    keys = [i % num_keys for i in range(num_requests)]
+
+    print("{:<24}{:>12}{:>12}{:>12}{:>14}".format("client", "in flight", "mean (us)", "p99 (us)", "requests/s"))
+    for name, client in (("connection", await TransportClient(host, port).connect()), ("pool of {}".format(POOL_SIZE), ConnectionPool(host, port, POOL_SIZE))):
+        await request_latencies(client, keys[:num_keys], max(concurrencies)) # every key is cached by the proxy, so that only the transport is measured
+        for concurrency in concurrencies:
+            start = time.perf_counter()
+            latencies = sorted(await request_latencies(client, keys, concurrency))
+            elapsed = time.perf_counter() - start
+            print("{:<24}{:>12}{:>12.0f}{:>12.0f}{:>14.0f}".format(name, concurrency, 1e6 * sum(latencies) / len(latencies), 1e6 * latencies[int(0.99 * len(latencies))], num_requests / elapsed))
+        await client.close()
+
+    await proxy_server.close()
+    await pool.close()
+    await origin_server.close()
+
+def benchmark_transport(num_requests : int = 20000, num_keys : int = 1000, concurrencies = (1, 16, 256)):
+    print("Benchmark name:\nlatency and throughput of {} gets (cache hits) from a proxy server on localhost\n".format(num_requests))
+    asyncio.run(measure_transport(num_requests, num_keys, concurrencies))
+
+def database_throughputs(origin, keys, batch_size : int):
+    '''
+    Returns the throughput in operations (keys) per second of puts, put_many calls, gets and get_many calls of the keys through the origin, the bulk calls being of batch size keys each.
+    '''
+    batches = [keys[i : i + batch_size] for i in range(0, len(keys), batch_size)]
+    operations = (
+        lambda: [origin.put(key, 'value{}'.format(key)) for key in keys],
+        lambda: [origin.put_many({key: 'value{}'.format(key) for key in batch}) for batch in batches],
+        lambda: [origin.get(key) for key in keys],
+        lambda: [origin.get_many(batch) for batch in batches],
+    )
+    throughputs = []
+    for operation in operations:
+        start = time.perf_counter()
+        operation()
+        throughputs.append(len(keys) / (time.perf_counter() - start))
+    return throughputs
+
+def benchmark_databases(num_keys : int = 10000, batch_size : int = 100):
+    print("Benchmark name:\nthroughput of the database backends through an origin server, for {} keys put, and then got in random order (bulk calls of {} keys)\n".format(num_keys, batch_size))
+    keys = list(range(num_keys))
+    random.Random(0).shuffle(keys)
+    with tempfile.TemporaryDirectory() as directory:
+        databases = {
+            "dict": lambda: DictDatabase(dict()),
+            "SQLite": lambda: SQLiteDatabase(os.path.join(directory, 'items.sqlite')),
+            "SQLite (batches)": lambda: SQLiteDatabase(os.path.join(directory, 'batched_items.sqlite'), batch_size),
+            "append-only log": lambda: LogDatabase(os.path.join(directory, 'items.log')),
+        }
+        print("{:<20}".format("database (keys/s)") + "".join("{:>12}".format(name) for name in ("put", "put_many", "get", "get_many")))
+        for name, create_database in databases.items():
+            database = create_database()
+            throughputs = database_throughputs(Origin(database, num_keys, 86400, 60), keys, batch_size)
+            print("{:<20}".format(name) + "".join("{:>12.0f}".format(throughput) for throughput in throughputs))
+            if (hasattr(database, 'close')):
+                database.close()
+
+def benchmark_simulation(num_requests : int = 100000):
+    print("Benchmark name:\nsimulation of {} requests of clustered clients to 50 proxies, on a virtual clock\n".format(num_requests))
+    scenarios = {
+        "baseline": dict(),
+        "short max age": dict(max_age=5),
+        "10 failures": dict(failures=10),
+        "writes": dict(write_ratio=0.3),
+    }
+    print("{:<16}{:>12}{:>12}{:>12}{:>12}{:>12}{:>12}{:>14}".format("scenario", "virtual (s)", "wall (s)", "requests/s", "hit ratio", "origin QPS", "p50 (ms)", "p99 (ms)"))
+    for name, parameters in scenarios.items():
+        report = simulate(num_requests=num_requests, **parameters)
+        print("{:<16}{:>12.0f}{:>12.2f}{:>12.0f}{:>12.3f}{:>12.1f}{:>12.1f}{:>14.1f}".format(name, report.virtual_seconds, report.wall_seconds, report.throughput, report.hit_ratio, report.origin_qps, 1e3 * report.p50, 1e3 * report.p99))
+
+def clock_throughputs(clock : Clock, num_operations : int, max_size : int):
+    '''
+    Returns the throughput in operations per second of gets (all hits) and of puts (all updates of cached keys) on a LRUCache reading the given clock.
+    '''
+    cache = LRUCache(max_size, 86400, clock=clock)
+    keys = [i % max_size for i in range(num_operations)]
+    for key in range(max_size):
+        cache.put(key, key)
+    throughputs = []
+    for operation in (cache.get, lambda key: cache.put(key, key)):
+        start = time.perf_counter()
+        for key in keys:
+            operation(key)
+        throughputs.append(num_operations / (time.perf_counter() - start))
+    return throughputs
+
+def benchmark_clocks(num_operations : int = 1000000, max_size : int = 1000):
+    print("Benchmark name:\nthroughput of {} gets and puts on a cache of max size {} with each clock\n".format(num_operations, max_size))
+    coarse_clock = CoarseClock()
+    clocks = {
+        "time.monotonic": Clock(),
+        "coarse": coarse_clock,
+        "manual": ManualClock(),
+    }
+    print("{:<20}{:>14}{:>14}".format("clock (ops/s)", "get", "put"))
+    for name, clock in clocks.items():
+        print("{:<20}".format(name) + "".join("{:>14.0f}".format(throughput) for throughput in clock_throughputs(clock, num_operations, max_size)))
+    coarse_clock.stop()
+
+def benchmark():
+    benchmark_memory()
+    print('\n')
+    benchmark_hit_rates()
+    print('\n')
+    benchmark_transport()
+    print('\n')
+    benchmark_databases()
+    print('\n')
+    benchmark_simulation()
+    print('\n')
+    benchmark_clocks()
+
+def main():
+    benchmark()
+
+if __name__=="__main__":
+    main()
@@ -1,10 +1,19 @@
 import math
+import pickle
+import sys
 from collections import namedtuple
 
+try:
+     import numpy
+except ImportError: # the batched distance functions fall back to pure Python
+     numpy = None
+
 EARTH_RADIUS = 6378137 # metres
 EARTH_CIRCUMFERENCE  = 40075000 # metres
 MAX_DISTANCE = EARTH_CIRCUMFERENCE / 2 # metres
 LOWEST_STRESS = -1
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz' # the base 32 digits of a geohash, each encoding 5 bits
+BATCH_SIZE = 1 << 20 # number of pairs of coordinates whose distances NumPy computes at once, bounding the memory used by the batched distance functions
 
 def radian(coordinate):
     return (math.pi * coordinate) / 180
@@ -26,6 +35,104 @@ def distance(coordinates_1, coordinates_2):
 
      return round(distance, 5)
 
+def unit_vector(coordinates):
+     '''
+     This function returns the point on the unit sphere (as x, y, z) at a pair of latitude and longitude coordinates.
+     The straight line distance between two such points increases with the Haversine distance between their coordinates, so the nearest of several coordinates can be found by comparing straight line distances, without trigonometry.
+     '''
+     latitude, longitude = radian(coordinates[0]), radian(coordinates[1])
+     return (math.cos(latitude) * math.cos(longitude), math.cos(latitude) * math.sin(longitude), math.sin(latitude))
+
+def distances(coordinates_list_1, coordinates_list_2):
+     '''
+     This function returns the matrix (as a list of lists) of the distances between each pair of latitude and longitude coordinates of the two lists, so that distances(coordinates_list_1, coordinates_list_2)[i][j] is distance(coordinates_list_1[i], coordinates_list_2[j]) (up to the rounding of its last decimal).
+     If NumPy is installed, the distances are computed with the Haversine Formula on whole arrays of coordinates at once, otherwise each pair only costs a dot product of the unit vectors of the coordinates (computed once per coordinates) rather than several trigonometric functions.
+     '''
+     coordinates_list_2 = list(coordinates_list_2)
+     if (numpy is not None):
+          return [row for batch in _numpy_distances(coordinates_list_1, coordinates_list_2) for row in batch.tolist()]
+
+     unit_vectors_2 = [unit_vector(coordinates) for coordinates in coordinates_list_2]
+     return [[_chord_to_distance(unit_vector_1, unit_vector_2) for unit_vector_2 in unit_vectors_2] for unit_vector_1 in map(unit_vector, coordinates_list_1)]
+
+def nearest_indexes(coordinates_list_1, coordinates_list_2):
+     '''
+     This function returns the list of the indexes in the second list of the coordinates nearest to each coordinates of the first list (e.g. the nearest proxy to each of many clients), computing the distances in batches as the distances function does.
+     '''
+     coordinates_list_2 = list(coordinates_list_2)
+     if (len(coordinates_list_2) == 0):
+          raise ValueError(coordinates_list_2)
+
+     if (numpy is not None):
+          return [index for batch in _numpy_distances(coordinates_list_1, coordinates_list_2) for index in batch.argmin(axis=1).tolist()]
+
+     unit_vectors_2 = [unit_vector(coordinates) for coordinates in coordinates_list_2]
+     indexes = []
+     for x, y, z in map(unit_vector, coordinates_list_1):
+          similarities = [x * x_2 + y * y_2 + z * z_2 for x_2, y_2, z_2 in unit_vectors_2] # the nearest unit vector has the largest dot product
+          indexes.append(similarities.index(max(similarities)))
+     return indexes
+
+def _numpy_distances(coordinates_list_1, coordinates_list_2):
+     '''
+     This function yields the matrix of distances of the distances function in batches of rows (as NumPy arrays), so that at most BATCH_SIZE distances are held in memory at once.
+     '''
+     latitudes_2, longitudes_2 = numpy.radians(numpy.asarray(coordinates_list_2, dtype=float).reshape(-1, 2)).T
+     cos_latitudes_2 = numpy.cos(latitudes_2)
+     coordinates_1 = numpy.radians(numpy.asarray(list(coordinates_list_1), dtype=float).reshape(-1, 2))
+     rows_per_batch = max(1, BATCH_SIZE // max(1, len(latitudes_2)))
+
+     for start in range(0, len(coordinates_1), rows_per_batch):
+          batch = coordinates_1[start : start + rows_per_batch]
+          latitudes_1, longitudes_1 = batch[:, 0:1], batch[:, 1:2] # columns, broadcast against the rows of the second list
+          a = numpy.sin((latitudes_2 - latitudes_1) / 2) ** 2 + numpy.cos(latitudes_1) * cos_latitudes_2 * numpy.sin((longitudes_2 - longitudes_1) / 2) ** 2
+          yield numpy.round(EARTH_RADIUS * 2 * numpy.arctan2(numpy.sqrt(a), numpy.sqrt(1 - a)), 5)
+
+def _chord_to_distance(unit_vector_1, unit_vector_2):
+     '''
+     This function returns the Haversine distance between the coordinates of two unit vectors from the straight line (chord) distance between them, which is 2 * sin(c / 2) for the central angle c of the Haversine Formula.
+     '''
+     chord = math.sqrt(sum((a - b) * (a - b) for a, b in zip(unit_vector_1, unit_vector_2)))
+     return round(EARTH_RADIUS * 2 * math.asin(min(1, chord / 2)), 5)
+
+def geohash(coordinates, precision):
+     '''
+     This function returns the geohash (https://en.wikipedia.org/wiki/Geohash) of a pair of latitude and longitude coordinates with precision digits, which names the cell of a grid over the Earth that contains the coordinates.
+     Each digit halves the cell 5 times, alternately on longitude and on latitude, so that nearby coordinates share a prefix (e.g. 6 digits name a cell of about 1.2 km by 0.6 km).
+     '''
+     ranges = [[-180.0, 180.0], [-90.0, 90.0]] # longitude is halved first
+     values = (coordinates[1], coordinates[0])
+     digits = []
+     bit = 0
+     for _ in range(precision):
+          digit = 0
+          for _ in range(5):
+               low, high = ranges[bit]
+               middle = (low + high) / 2
+               if (values[bit] >= middle):
+                    digit = (digit << 1) | 1
+                    ranges[bit][0] = middle
+               else:
+                    digit = digit << 1
+                    ranges[bit][1] = middle
+               bit ^= 1
+          digits.append(GEOHASH_ALPHABET[digit])
+     return ''.join(digits)
+
+def geohash_center(cell):
+     '''
+     This function returns the latitude and longitude coordinates of the center of the cell named by a geohash.
+     '''
+     ranges = [[-180.0, 180.0], [-90.0, 90.0]]
+     bit = 0
+     for character in cell:
+          digit = GEOHASH_ALPHABET.index(character)
+          for shift in range(4, -1, -1):
+               middle = (ranges[bit][0] + ranges[bit][1]) / 2
+               ranges[bit][0 if (digit >> shift) & 1 else 1] = middle
+               bit ^= 1
+     return ((ranges[1][0] + ranges[1][1]) / 2, (ranges[0][0] + ranges[0][1]) / 2)
+
 def stress(cache_info):
      '''
      This function returns a float between -1 and 1 representing the stress score based on the NamedTuple passed as cache info.
@@ -33,5 +140,20 @@ def stress(cache_info):
      The stress score depends on the number of hits, misses, evictions and expiries.
      A cache info with more hits and evictions, and fewer misses and expiries is more highly stressed than its counterpart with fewer hits and evictions, and more misses and expiries.
      The stress score is used to calculate which proxy would benefit most from having an additional proxy deployed nearby to takeover some of its assigned clients.
+     The cache info may also be the recent rates of hits, misses, evictions and expiries of the cache (see LRUCache.cache_rates), so that the stress score reflects the current load of the cache rather than its load since it was created.
+     A cache that served no requests (e.g. over the window of the rates) scores 0.
+     '''
+     total = cache_info.hits + cache_info.evictions + cache_info.expiries + cache_info.misses
+     if (total == 0):
+          return 0.0
+     return ((cache_info.hits + cache_info.evictions) - (cache_info.expiries + cache_info.misses)) / total
+
+def serialized_size(value):
+     '''
+     This function returns an estimate of the number of bytes of a value as the size of its serialization (the number of bytes that would be transmitted or stored for the value), or the size of the object in memory if the value cannot be serialized.
+     It is the default weigher of the LRUCache, used to bound the cache by the total size of its values.
      '''
-     return ((cache_info.hits + cache_info.evictions) - (cache_info.expiries + cache_info.misses)) / (cache_info.hits + cache_info.evictions + cache_info.expiries + cache_info.misses)
\ No newline at end of file
+     try:
+          return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+     except (pickle.PicklingError, TypeError, AttributeError):
+          return sys.getsizeof(value)